@@ -0,0 +1,79 @@
+"""track cashbox and time on payments; running cash balance on cashboxes
+
+Revision ID: 20261017_cashbox_payments
+Revises: 20261017_updated_at_indexes
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20261017_cashbox_payments'
+down_revision = '20261017_updated_at_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('sale_payments', sa.Column('cashbox_id', sa.Integer(), sa.ForeignKey('cashboxes.id'), nullable=True))
+    op.add_column(
+        'sale_payments',
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    op.add_column('customer_payments', sa.Column('cashbox_id', sa.Integer(), sa.ForeignKey('cashboxes.id'), nullable=True))
+    op.add_column(
+        'cashboxes',
+        sa.Column('cash_balance', sa.Numeric(12, 2), nullable=False, server_default='0'),
+    )
+    op.create_index('ix_sale_payments_cashbox_id', 'sale_payments', ['cashbox_id'])
+    op.create_index('ix_customer_payments_cashbox_id', 'customer_payments', ['cashbox_id'])
+    op.create_index('ix_financial_entries_cashbox_id', 'financial_entries', ['cashbox_id'])
+
+    # existing payments: time of their sale, and the cashbox whose session covered that time
+    # (the attribution the cashbox report used to make on every read)
+    op.execute(
+        """
+        UPDATE sale_payments SET created_at = (SELECT s.created_at FROM sales s WHERE s.id = sale_payments.sale_id)
+        """
+    )
+    for table in ('sale_payments', 'customer_payments'):
+        op.execute(
+            f"""
+            UPDATE {table} SET cashbox_id = (
+                SELECT c.id FROM cashboxes c
+                WHERE {table}.created_at >= COALESCE(c.opened_at, c.created_at)
+                  AND (c.closed_at IS NULL OR {table}.created_at <= c.closed_at)
+                ORDER BY COALESCE(c.opened_at, c.created_at) DESC, c.id DESC
+                LIMIT 1
+            )
+            """
+        )
+    op.execute(
+        """
+        UPDATE cashboxes SET cash_balance = initial_amount
+            + COALESCE((
+                SELECT SUM(p.amount) FROM sale_payments p JOIN sales s ON s.id = p.sale_id
+                WHERE p.cashbox_id = cashboxes.id AND p.method = 'dinheiro' AND s.status = 'completed'
+                  AND p.created_at >= COALESCE(cashboxes.opened_at, cashboxes.created_at)
+            ), 0)
+            + COALESCE((
+                SELECT SUM(cp.amount) FROM customer_payments cp
+                WHERE cp.cashbox_id = cashboxes.id AND cp.method = 'dinheiro'
+                  AND cp.created_at >= COALESCE(cashboxes.opened_at, cashboxes.created_at)
+            ), 0)
+            + COALESCE((
+                SELECT SUM(CASE WHEN f.type = 'despesa' THEN -f.amount ELSE f.amount END) FROM financial_entries f
+                WHERE f.cashbox_id = cashboxes.id
+                  AND f.created_at >= COALESCE(cashboxes.opened_at, cashboxes.created_at)
+            ), 0)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_financial_entries_cashbox_id', table_name='financial_entries')
+    op.drop_index('ix_customer_payments_cashbox_id', table_name='customer_payments')
+    op.drop_index('ix_sale_payments_cashbox_id', table_name='sale_payments')
+    op.drop_column('cashboxes', 'cash_balance')
+    op.drop_column('customer_payments', 'cashbox_id')
+    op.drop_column('sale_payments', 'created_at')
+    op.drop_column('sale_payments', 'cashbox_id')
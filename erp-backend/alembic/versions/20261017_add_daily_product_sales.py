@@ -0,0 +1,43 @@
+"""add daily_product_sales rollup for product reports
+
+Revision ID: 20261017_daily_product_sales
+Revises: 20261017_sale_idempotency
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20261017_daily_product_sales'
+down_revision = '20261017_sale_idempotency'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'daily_product_sales',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('product_id', sa.Integer(), sa.ForeignKey('products.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('revenue', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('cost', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('day', 'product_id'),
+    )
+    op.create_index('ix_daily_product_sales_product_id', 'daily_product_sales', ['product_id'])
+    # backfill from the completed sales already recorded
+    op.execute(
+        """
+        INSERT INTO daily_product_sales (day, product_id, quantity, revenue, cost)
+        SELECT date(s.created_at), si.product_id, SUM(si.quantity), SUM(si.line_total), SUM(si.quantity * p.cost_price)
+        FROM sale_items si
+        JOIN sales s ON s.id = si.sale_id
+        JOIN products p ON p.id = si.product_id
+        WHERE s.status = 'completed'
+        GROUP BY date(s.created_at), si.product_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_daily_product_sales_product_id', table_name='daily_product_sales')
+    op.drop_table('daily_product_sales')
@@ -0,0 +1,40 @@
+"""add fiado ledger columns to sales
+
+Revision ID: 20261017_fiado_ledger
+Revises: 20250929_store_name
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20261017_fiado_ledger'
+down_revision = '20250929_store_name'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('sales', sa.Column('fiado_total', sa.Numeric(12, 2), nullable=False, server_default='0'))
+    op.add_column('sales', sa.Column('fiado_allocated', sa.Numeric(12, 2), nullable=False, server_default='0'))
+    op.create_index('ix_sales_customer_id', 'sales', ['customer_id'])
+
+    # backfill the ledger from the raw payment / allocation rows
+    op.execute(
+        """
+        UPDATE sales SET
+            fiado_total = COALESCE((
+                SELECT SUM(sp.amount) FROM sale_payments sp
+                WHERE sp.sale_id = sales.id AND sp.method = 'fiado'
+            ), 0),
+            fiado_allocated = COALESCE((
+                SELECT SUM(a.amount) FROM customer_payment_allocations a
+                WHERE a.sale_id = sales.id
+            ), 0)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sales_customer_id', table_name='sales')
+    op.drop_column('sales', 'fiado_allocated')
+    op.drop_column('sales', 'fiado_total')
@@ -0,0 +1,27 @@
+"""add composite indexes for keyset pagination
+
+Revision ID: 20261017_keyset_indexes
+Revises: 20261017_fiado_ledger
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20261017_keyset_indexes'
+down_revision = '20261017_fiado_ledger'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_sales_created_at_id', 'sales', ['created_at', 'id'])
+    op.create_index('ix_products_name_id', 'products', ['name', 'id'])
+    op.create_index('ix_customers_name_id', 'customers', ['name', 'id'])
+    op.create_index('ix_financial_entries_date_id', 'financial_entries', ['date', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_financial_entries_date_id', table_name='financial_entries')
+    op.drop_index('ix_customers_name_id', table_name='customers')
+    op.drop_index('ix_products_name_id', table_name='products')
+    op.drop_index('ix_sales_created_at_id', table_name='sales')
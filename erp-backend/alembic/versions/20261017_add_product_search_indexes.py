@@ -0,0 +1,30 @@
+"""add trigram / prefix search indexes on products
+
+Revision ID: 20261017_product_search
+Revises: 20261017_keyset_indexes
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20261017_product_search'
+down_revision = '20261017_keyset_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # substring search on name: name ILIKE '%term%' and similarity() ranking
+    op.execute("CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)")
+    # prefix search on sku: lower(sku) LIKE 'term%'
+    op.execute("CREATE INDEX IF NOT EXISTS ix_products_sku_lower_pattern ON products (lower(sku) text_pattern_ops)")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("DROP INDEX IF EXISTS ix_products_sku_lower_pattern")
+    op.execute("DROP INDEX IF EXISTS ix_products_name_trgm")
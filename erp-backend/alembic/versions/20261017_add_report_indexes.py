@@ -0,0 +1,36 @@
+"""add foreign key and covering indexes used by the sales reports
+
+Revision ID: 20261017_report_indexes
+Revises: 20261017_daily_product_sales
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20261017_report_indexes'
+down_revision = '20261017_daily_product_sales'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # foreign keys on the sale children: loading a sale's items/payments and ON DELETE CASCADE
+    op.create_index('ix_sale_items_sale_id', 'sale_items', ['sale_id'])
+    op.create_index('ix_sale_payments_sale_id', 'sale_payments', ['sale_id'])
+    op.create_index('ix_customer_payment_allocations_sale_id', 'customer_payment_allocations', ['sale_id'])
+    # also serves lookups by product_id alone (leading column)
+    op.create_index(
+        'ix_sale_items_product_id_sale_id',
+        'sale_items',
+        ['product_id', 'sale_id'],
+        postgresql_include=['quantity', 'line_total'],
+    )
+    op.create_index('ix_sales_status_created_at', 'sales', ['status', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sales_status_created_at', table_name='sales')
+    op.drop_index('ix_sale_items_product_id_sale_id', table_name='sale_items')
+    op.drop_index('ix_customer_payment_allocations_sale_id', table_name='customer_payment_allocations')
+    op.drop_index('ix_sale_payments_sale_id', table_name='sale_payments')
+    op.drop_index('ix_sale_items_sale_id', table_name='sale_items')
@@ -0,0 +1,23 @@
+"""add idempotency_key to sales for offline POS replays
+
+Revision ID: 20261017_sale_idempotency
+Revises: 20261017_product_search
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20261017_sale_idempotency'
+down_revision = '20261017_product_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('sales', sa.Column('idempotency_key', sa.String(length=100), nullable=True))
+    op.create_index('ix_sales_idempotency_key', 'sales', ['idempotency_key'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_sales_idempotency_key', table_name='sales')
+    op.drop_column('sales', 'idempotency_key')
@@ -0,0 +1,39 @@
+"""store the product cost on sale items; daily_product_sales cost is computed from it
+
+Revision ID: 20261017_sale_item_unit_cost
+Revises: 20261017_cashbox_payments
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20261017_sale_item_unit_cost'
+down_revision = '20261017_cashbox_payments'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('sale_items', sa.Column('unit_cost', sa.Numeric(10, 2), nullable=False, server_default='0'))
+    # existing items: the current product cost, the value the rollup was built with
+    op.execute(
+        """
+        UPDATE sale_items SET unit_cost = COALESCE((SELECT p.cost_price FROM products p WHERE p.id = sale_items.product_id), 0)
+        """
+    )
+    # cost changes made the rollup drift; recompute it from the stored unit costs
+    op.execute(
+        """
+        UPDATE daily_product_sales SET cost = COALESCE((
+            SELECT SUM(si.quantity * si.unit_cost)
+            FROM sale_items si JOIN sales s ON s.id = si.sale_id
+            WHERE si.product_id = daily_product_sales.product_id
+              AND s.status = 'completed'
+              AND date(s.created_at) = daily_product_sales.day
+        ), 0)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('sale_items', 'unit_cost')
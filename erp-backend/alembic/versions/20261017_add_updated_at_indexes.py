@@ -0,0 +1,26 @@
+"""index updated_at on products, sales and financial_entries for change watermarks
+
+Revision ID: 20261017_updated_at_indexes
+Revises: 20261017_report_indexes
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20261017_updated_at_indexes'
+down_revision = '20261017_report_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # max(updated_at) becomes an index-only lookup (erp-reports result cache)
+    op.create_index('ix_products_updated_at', 'products', ['updated_at'])
+    op.create_index('ix_sales_updated_at', 'sales', ['updated_at'])
+    op.create_index('ix_financial_entries_updated_at', 'financial_entries', ['updated_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_financial_entries_updated_at', table_name='financial_entries')
+    op.drop_index('ix_sales_updated_at', table_name='sales')
+    op.drop_index('ix_products_updated_at', table_name='products')
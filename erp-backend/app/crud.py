@@ -1,17 +1,29 @@
 ﻿from __future__ import annotations
 
 from decimal import Decimal
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 from typing import List, Optional
 
 from sqlalchemy.orm import Session, selectinload
-from sqlalchemy import func
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy import DateTime, Integer, String, and_, bindparam, case, cast, func, insert, literal, or_, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
 
+from app.services import cashbox_events, metrics
 from app.services.image_processing import remove_product_photos
 
 from app import models, schemas
+from app.pagination import keyset_page
 from sqlalchemy.exc import IntegrityError
 
+# keyset (cursor) pagination sort keys; each is backed by a composite index
+PRODUCT_PAGE_KEY = (models.Product.name, models.Product.id)
+CUSTOMER_PAGE_KEY = (models.Customer.name, models.Customer.id)
+SALE_PAGE_KEY = (models.Sale.created_at, models.Sale.id)
+FINANCIAL_ENTRY_PAGE_KEY = (models.FinancialEntry.date, models.FinancialEntry.id)
+CATEGORY_PAGE_KEY = (models.Category.name, models.Category.id)
+
 
 # Produtos
 
@@ -23,7 +35,6 @@ def append_product_photos(
     db_product.photos = existing
     db.add(db_product)
     db.commit()
-    db.refresh(db_product)
     return db_product
 
 
@@ -40,7 +51,6 @@ def remove_product_photo(db: Session, db_product: models.Product, public_path: s
         remove_product_photos([public_path])
         db.add(db_product)
         db.commit()
-        db.refresh(db_product)
     return db_product
 
 
@@ -48,62 +58,151 @@ def create_product(db: Session, product_in: schemas.ProductCreate) -> models.Pro
     data = product_in.model_dump()
     # compute margin = sale_price - cost_price
     try:
-        data['margin'] = float(data.get('sale_price', 0) or 0) - float(data.get('cost_price', 0) or 0)
+        data['margin'] = Decimal(str(data.get('sale_price') or 0)) - Decimal(str(data.get('cost_price') or 0))
     except Exception:
         data['margin'] = 0
     db_product = models.Product(**data)
     db.add(db_product)
     db.commit()
-    db.refresh(db_product)
     return db_product
 
 
+# columns written by the catalogue import; margin is derived from the prices in SQL
+PRODUCT_IMPORT_FIELDS = (
+    "name", "sku", "category", "supplier", "cost_price", "sale_price",
+    "stock", "min_stock", "photos", "extra_attributes",
+)
+
+
+def _upsert_insert(db: Session):
+    """The dialect's insert() construct, which offers on_conflict_do_update."""
+    dialect_name = db.get_bind().dialect.name
+    if dialect_name == "postgresql":
+        return postgresql.insert
+    if dialect_name == "sqlite":
+        return sqlite.insert
+    raise ValueError(f"Upsert nao suportado para {dialect_name}.")
+
+
+def upsert_products(db: Session, products_in: List[schemas.ProductCreate]) -> int:
+    """Insert or update products by SKU with INSERT ... ON CONFLICT (sku) DO UPDATE, without committing.
+
+    On conflict only the fields present in the input row are overwritten (a price-only row keeps the
+    stored stock), and margin is recomputed in SQL from the resulting prices. Rows are grouped by the
+    set of fields they carry and each group runs as one executemany. Returns the number of rows written.
+    """
+    dialect_insert = _upsert_insert(db)
+
+    # last occurrence of a SKU wins, like it would when importing row by row
+    latest: dict[str, schemas.ProductCreate] = {}
+    for product_in in products_in:
+        latest.pop(product_in.sku, None)
+        latest[product_in.sku] = product_in
+
+    groups: dict[frozenset, List[dict]] = {}
+    for product_in in latest.values():
+        fields = frozenset(product_in.model_fields_set & set(PRODUCT_IMPORT_FIELDS)) | {"sku"}
+        data = product_in.model_dump(include=set(PRODUCT_IMPORT_FIELDS))
+        groups.setdefault(fields, []).append({f"b_{k}": v for k, v in data.items()})
+
+    table = models.Product.__table__
+    for fields, rows in groups.items():
+        values = {name: bindparam(f"b_{name}", type_=table.c[name].type) for name in PRODUCT_IMPORT_FIELDS}
+        values["margin"] = values["sale_price"] - values["cost_price"]
+        stmt = dialect_insert(table).values(**values)
+        excluded = stmt.excluded
+        sale_price = excluded.sale_price if "sale_price" in fields else table.c.sale_price
+        cost_price = excluded.cost_price if "cost_price" in fields else table.c.cost_price
+        updates = {name: excluded[name] for name in fields if name != "sku"}
+        updates["margin"] = sale_price - cost_price
+        updates["updated_at"] = func.now()
+        db.execute(stmt.on_conflict_do_update(index_elements=[table.c.sku], set_=updates), rows)
+    return len(latest)
+
+
 def list_products(
     db: Session,
     skip: int = 0,
     limit: int = 100,
     sku: str | None = None,
     name: str | None = None,
+    cursor: str | None = None,
 ) -> List[models.Product]:
-    q = db.query(models.Product)
+    """List products; passing `cursor` (even empty) switches from offset to keyset pagination."""
+    q = db.query(models.Product).filter(*product_list_filters(sku, name))
+    if cursor is not None:
+        return keyset_page(q, PRODUCT_PAGE_KEY, cursor, limit).all()
+    return q.offset(skip).limit(limit).all()
+
+
+def product_list_filters(sku: str | None = None, name: str | None = None) -> list:
+    """WHERE clauses shared by the sync and async product listings."""
+    filters = []
     if sku:
         # case-insensitive prefix match on SKU (starts with)
         sku_val = sku.strip()
         if sku_val:
-            q = q.filter(models.Product.sku.ilike(f"{sku_val}%"))
+            filters.append(models.Product.sku.ilike(f"{sku_val}%"))
     if name:
         # case-insensitive partial match on name
-        q = q.filter(models.Product.name.ilike(f"%{name}%"))
-    return q.offset(skip).limit(limit).all()
+        filters.append(models.Product.name.ilike(f"%{name}%"))
+    return filters
 
 
-def list_products_report(
-    db: Session,
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_products(db: Session, q: str, limit: int = 20, rank: bool = True) -> list:
+    """Lightweight product lookup for the POS search box.
+
+    Matches a substring of the name (served by the pg_trgm GIN index) or a prefix of the SKU
+    (served by the lower(sku) text_pattern_ops index) and returns only id/name/sku/sale_price/stock.
+    With `rank`, SKU prefix hits come first, then names by trigram similarity on Postgres.
+    """
+    stmt = product_search_statement(q, limit, rank, db.get_bind().dialect.name)
+    if stmt is None:
+        return []
+    return db.execute(stmt).all()
+
+
+def product_search_statement(q: str, limit: int, rank: bool, dialect_name: str):
+    """SELECT behind search_products, or None for a blank term."""
+    term = (q or "").strip()
+    if not term:
+        return None
+    escaped = _like_escape(term)
+    name_match = models.Product.name.ilike(f"%{escaped}%", escape="\\")
+    sku_match = func.lower(models.Product.sku).like(f"{escaped.lower()}%", escape="\\")
+    stmt = select(
+        models.Product.id,
+        models.Product.name,
+        models.Product.sku,
+        models.Product.sale_price,
+        models.Product.stock,
+    ).where(or_(name_match, sku_match))
+    if rank:
+        order = [case((sku_match, 0), else_=1)]
+        if dialect_name == "postgresql":
+            order.append(func.similarity(models.Product.name, term).desc())
+        stmt = stmt.order_by(*order, models.Product.name.asc(), models.Product.id.asc())
+    return stmt.limit(limit)
+
+
+def products_report_filters(
     from_date: str | None = None,
     to_date: str | None = None,
-    skip: int = 0,
-    limit: int = 100,
     sku: str | None = None,
     name: str | None = None,
     category: str | None = None,
-) -> dict:
-    """Return a report dict containing filtered products and aggregated totals.
-
-    from_date and to_date should be ISO date strings (YYYY-MM-DD) or None.
-    """
-    q = db.query(models.Product)
-    # apply sku/name filters early
-    if sku:
-        sku_val = sku.strip()
-        if sku_val:
-            q = q.filter(models.Product.sku.ilike(f"{sku_val}%"))
-    if name:
-        q = q.filter(models.Product.name.ilike(f"%{name}%"))
+) -> list:
+    """WHERE clauses of the products report, shared by the paged report and its export."""
+    filters = product_list_filters(sku, name)
     if category:
         # case-insensitive prefix match on category (starts with)
         cat_val = category.strip()
         if cat_val:
-            q = q.filter(models.Product.category.ilike(f"{cat_val}%"))
+            filters.append(models.Product.category.ilike(f"{cat_val}%"))
     # parse date strings to datetimes to avoid comparing timestamps with strings
     fd = None
     td = None
@@ -122,14 +221,39 @@ def list_products_report(
         td = None
 
     if fd:
-        q = q.filter(models.Product.created_at >= fd)
+        filters.append(models.Product.created_at >= fd)
     if td:
-        q = q.filter(models.Product.created_at <= td)
+        filters.append(models.Product.created_at <= td)
+    return filters
+
+
+def list_products_report(
+    db: Session,
+    from_date: str | None = None,
+    to_date: str | None = None,
+    skip: int = 0,
+    limit: int = 100,
+    sku: str | None = None,
+    name: str | None = None,
+    category: str | None = None,
+) -> dict:
+    """Return a report dict containing filtered products and aggregated totals.
 
-    total_products = q.count()
+    from_date and to_date should be ISO date strings (YYYY-MM-DD) or None.
+    """
+    q = db.query(models.Product).filter(
+        *products_report_filters(from_date=from_date, to_date=to_date, sku=sku, name=name, category=category)
+    )
 
-    # fetch all matching products for totals (note: may be large in big DBs)
-    all_products = q.order_by(models.Product.created_at.desc()).all()
+    # totals for every matching product come from one aggregate query
+    stock_col = func.coalesce(models.Product.stock, 0)
+    total_products, total_cost, total_sale = q.with_entities(
+        func.count(models.Product.id),
+        func.coalesce(func.sum(models.Product.cost_price * stock_col), 0),
+        func.coalesce(func.sum(models.Product.sale_price * stock_col), 0),
+    ).one()
+    total_cost = Decimal(total_cost or 0)
+    total_sale = Decimal(total_sale or 0)
 
     # helper to resolve stock similarly to frontend heuristics
     def _resolve_stock(product: models.Product) -> int:
@@ -155,32 +279,26 @@ def list_products_report(
                     continue
         return 0
 
-    from decimal import Decimal
-
-    total_cost = Decimal("0")
-    total_sale = Decimal("0")
-    # compute total sold per product (sum of line_total from completed sales)
-    sold_map: dict[int, Decimal] = {}
-    for p in all_products:
-        stock = _resolve_stock(p)
-        total_cost += Decimal(p.cost_price or 0) * stock
-        total_sale += Decimal(p.sale_price or 0) * stock
-
-    # gather total sold values
-    sale_items = (
-        db.query(models.SaleItem.product_id, models.SaleItem.line_total)
-        .join(models.Sale)
-        .filter(models.Sale.status == models.SaleStatus.COMPLETED)
-        .all()
-    )
-    for prod_id, line_total in sale_items:
-        sold_map.setdefault(prod_id, Decimal("0"))
-        sold_map[prod_id] += Decimal(line_total or 0)
-
     products_page = (
         q.order_by(models.Product.created_at.desc()).offset(skip).limit(limit).all()
     )
 
+    # total sold per product (sum of line_total from completed sales), only for the page
+    sold_map: dict[int, Decimal] = {}
+    page_ids = [p.id for p in products_page]
+    if page_ids:
+        sold_rows = (
+            db.query(models.SaleItem.product_id, func.sum(models.SaleItem.line_total))
+            .join(models.Sale)
+            .filter(
+                models.Sale.status == models.SaleStatus.COMPLETED,
+                models.SaleItem.product_id.in_(page_ids),
+            )
+            .group_by(models.SaleItem.product_id)
+            .all()
+        )
+        sold_map = {prod_id: Decimal(total or 0) for prod_id, total in sold_rows}
+
     # attach total_sold to each product in page
     products_out = []
     for prod in products_page:
@@ -216,12 +334,113 @@ def list_products_report(
     }
 
 
+# Exportacao
+# Flat SELECTs streamed by the /export endpoints; every statement yields plain rows (no ORM objects)
+# so a server-side cursor can walk millions of them in constant memory.
+
+def _date_range_filters(column, from_date: str | None, to_date: str | None) -> list:
+    """Half-open [from_date, to_date + 1 day) filter on a timestamp column; bad dates raise ValueError."""
+    filters = []
+    try:
+        if from_date:
+            filters.append(column >= datetime.fromisoformat(from_date))
+        if to_date:
+            filters.append(column < datetime.fromisoformat(to_date) + timedelta(days=1))
+    except ValueError as exc:
+        raise ValueError("Data invalida; use AAAA-MM-DD.") from exc
+    return filters
+
+
+def products_export_statement(sku: str | None = None, name: str | None = None):
+    p = models.Product
+    return (
+        select(
+            p.id, p.sku, p.name, p.category, p.supplier, p.cost_price, p.sale_price, p.margin,
+            p.stock, p.min_stock, p.created_at, p.updated_at,
+        )
+        .where(*product_list_filters(sku, name))
+        .order_by(p.name, p.id)
+    )
+
+
+def customers_export_statement():
+    c = models.Customer
+    return select(c.id, c.name, c.email, c.phone, c.notes, c.created_at).order_by(c.name, c.id)
+
+
+def sales_export_statement(
+    from_date: str | None = None, to_date: str | None = None, status: str | None = None
+):
+    s, c = models.Sale, models.Customer
+    fiado_pending = case((s.fiado_total > s.fiado_allocated, s.fiado_total - s.fiado_allocated), else_=0)
+    stmt = (
+        select(
+            s.id, s.created_at, s.status, s.customer_id, c.name.label("customer_name"),
+            s.total_amount, s.fiado_total, fiado_pending.label("fiado_pending"), s.notes,
+        )
+        .outerjoin(c, c.id == s.customer_id)
+        .where(*_date_range_filters(s.created_at, from_date, to_date))
+        .order_by(s.created_at.desc(), s.id.desc())
+    )
+    if status:
+        stmt = stmt.where(s.status == models.SaleStatus(status))
+    return stmt
+
+
+def financial_entries_export_statement(
+    from_date: str | None = None, to_date: str | None = None, type: str | None = None
+):
+    f = models.FinancialEntry
+    stmt = (
+        select(f.id, f.date, f.type, f.category, f.amount, f.notes, f.cashbox_id)
+        .where(*_date_range_filters(f.date, from_date, to_date))
+        .order_by(f.date.desc(), f.id.desc())
+    )
+    if type:
+        stmt = stmt.where(f.type == models.EntryType(type))
+    return stmt
+
+
+def products_report_export_statement(
+    from_date: str | None = None,
+    to_date: str | None = None,
+    sku: str | None = None,
+    name: str | None = None,
+    category: str | None = None,
+):
+    p = models.Product
+    sold = (
+        select(
+            models.SaleItem.product_id.label("product_id"),
+            func.sum(models.SaleItem.quantity).label("quantity_sold"),
+            func.sum(models.SaleItem.line_total).label("total_sold"),
+        )
+        .join(models.Sale, models.Sale.id == models.SaleItem.sale_id)
+        .where(models.Sale.status == models.SaleStatus.COMPLETED)
+        .group_by(models.SaleItem.product_id)
+        .subquery()
+    )
+    stock = func.coalesce(p.stock, 0)
+    return (
+        select(
+            p.id, p.sku, p.name, p.category, p.supplier, p.cost_price, p.sale_price, p.margin, stock.label("stock"),
+            (p.cost_price * stock).label("stock_cost"),
+            (p.sale_price * stock).label("stock_sale_value"),
+            func.coalesce(sold.c.quantity_sold, 0).label("quantity_sold"),
+            func.coalesce(sold.c.total_sold, 0).label("total_sold"),
+            p.created_at,
+        )
+        .outerjoin(sold, sold.c.product_id == p.id)
+        .where(*products_report_filters(from_date=from_date, to_date=to_date, sku=sku, name=name, category=category))
+        .order_by(p.created_at.desc(), p.id.desc())
+    )
+
+
 # Tenancy / User helpers
 def create_tenant(db: Session, name: str, slug: str) -> models.Tenant:
     t = models.Tenant(name=name, slug=slug)
     db.add(t)
     db.commit()
-    db.refresh(t)
     return t
 
 
@@ -260,7 +479,6 @@ def create_registration(db: Session, registration_in: dict) -> models.Registrati
     )
     db.add(reg)
     db.commit()
-    db.refresh(reg)
     return reg
 
 
@@ -285,7 +503,6 @@ def create_user(db: Session, email: str, password_hash: str, tenant_id: int, ful
         db.rollback()
         # Normalize duplicate email / constraint violation to a ValueError
         raise ValueError("Email already registered") from exc
-    db.refresh(u)
     return u
 
 
@@ -315,14 +532,13 @@ def update_product(
             setattr(db_product, field, value)
     # ensure margin is updated when prices change
     try:
-        cost = float(getattr(db_product, 'cost_price', 0) or 0)
-        sale = float(getattr(db_product, 'sale_price', 0) or 0)
+        cost = Decimal(str(getattr(db_product, 'cost_price', 0) or 0))
+        sale = Decimal(str(getattr(db_product, 'sale_price', 0) or 0))
         db_product.margin = sale - cost
     except Exception:
         db_product.margin = 0
     db.add(db_product)
     db.commit()
-    db.refresh(db_product)
     return db_product
 
 
@@ -345,18 +561,16 @@ def create_customer(db: Session, customer_in: schemas.CustomerCreate) -> models.
     db_customer = models.Customer(**data)
     db.add(db_customer)
     db.commit()
-    db.refresh(db_customer)
     return db_customer
 
 
-def list_customers(db: Session, skip: int = 0, limit: int = 100) -> List[models.Customer]:
-    return (
-        db.query(models.Customer)
-        .order_by(models.Customer.name.asc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+def list_customers(
+    db: Session, skip: int = 0, limit: int = 100, cursor: str | None = None
+) -> List[models.Customer]:
+    q = db.query(models.Customer)
+    if cursor is not None:
+        return keyset_page(q, CUSTOMER_PAGE_KEY, cursor, limit).all()
+    return q.order_by(models.Customer.name.asc()).offset(skip).limit(limit).all()
 
 
 def get_customer(db: Session, customer_id: int) -> Optional[models.Customer]:
@@ -378,7 +592,6 @@ def update_customer(
         setattr(db_customer, field, value)
     db.add(db_customer)
     db.commit()
-    db.refresh(db_customer)
     return db_customer
 
 
@@ -390,6 +603,7 @@ def delete_customer(db: Session, db_customer: models.Customer) -> None:
 # Vendas
 
 def create_sale(db: Session, sale_in: schemas.SaleCreate) -> models.Sale:
+    cashbox_id = resolve_cashbox_id(db, sale_in.cashbox_id)
     sale = models.Sale(
         customer_id=sale_in.customer_id,
         notes=sale_in.notes,
@@ -397,9 +611,10 @@ def create_sale(db: Session, sale_in: schemas.SaleCreate) -> models.Sale:
     )
     db.add(sale)
 
+    products = _get_products_by_id(db, [item_in.product_id for item_in in sale_in.items])
     total_amount = Decimal("0")
     for item_in in sale_in.items:
-        product = db.get(models.Product, item_in.product_id)
+        product = products.get(item_in.product_id)
         if not product:
             raise ValueError(f"Produto {item_in.product_id} nao encontrado.")
         if item_in.quantity > product.stock:
@@ -415,21 +630,26 @@ def create_sale(db: Session, sale_in: schemas.SaleCreate) -> models.Sale:
             quantity=item_in.quantity,
             unit_price=unit_price,
             line_total=line_total,
+            unit_cost=product.cost_price,
         )
+        # serialized with the item; keeps the response from lazy loading each product
+        sale_item.product = product
         sale.items.append(sale_item)
         total_amount += line_total
 
-    total_payments = _attach_payments(sale, sale_in.payments)
+    total_payments = _attach_payments(sale, sale_in.payments, cashbox_id)
     _validate_payment_totals(total_amount, total_payments)
     sale.total_amount = total_amount
 
+    reserve_stock(db, _sale_quantities(sale.items))
+    sale._stock_reserved = True
+    db.flush()
+    apply_sales_rollup(db, [sale.id], 1)
+    move_cashbox_balances(db, _cash_deltas(_payment_rows(sale.payments)), "sale")
+    if sale.customer_id:
+        sale.customer = db.get(models.Customer, sale.customer_id)
     db.commit()
-    db.refresh(
-        sale,
-        attribute_names=["items", "payments", "customer"],
-    )
-    # Acessa relacionamentos para carregamento antes do fechamento da sessao
-    _ensure_loaded(sale)
+    metrics.sales_created.inc(source="pos")
     # attach pending fiado for serialization
     try:
         sale.total_fiado_pending = get_sale_fiado_remaining(db, sale)
@@ -438,19 +658,22 @@ def create_sale(db: Session, sale_in: schemas.SaleCreate) -> models.Sale:
     return sale
 
 
-def list_sales(db: Session, skip: int = 0, limit: int = 100) -> List[models.Sale]:
-    sales = (
-        db.query(models.Sale)
-        .options(
-            selectinload(models.Sale.items).selectinload(models.SaleItem.product),
-            selectinload(models.Sale.payments),
-            selectinload(models.Sale.customer),
-        )
-        .order_by(models.Sale.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+# relationships serialized by schemas.Sale, loaded up front (one SELECT ... IN per relationship)
+SALE_LOAD_OPTIONS = (
+    selectinload(models.Sale.items).selectinload(models.SaleItem.product),
+    selectinload(models.Sale.payments),
+    selectinload(models.Sale.customer),
+)
+
+
+def list_sales(
+    db: Session, skip: int = 0, limit: int = 100, cursor: str | None = None
+) -> List[models.Sale]:
+    q = db.query(models.Sale).options(*SALE_LOAD_OPTIONS)
+    if cursor is not None:
+        sales = keyset_page(q, SALE_PAGE_KEY, cursor, limit, descending=True).all()
+    else:
+        sales = q.order_by(models.Sale.created_at.desc()).offset(skip).limit(limit).all()
     # attach pending fiado per sale for serialization
     for s in sales:
         try:
@@ -463,11 +686,7 @@ def list_sales(db: Session, skip: int = 0, limit: int = 100) -> List[models.Sale
 def get_sale(db: Session, sale_id: int) -> Optional[models.Sale]:
     sale = (
         db.query(models.Sale)
-        .options(
-            selectinload(models.Sale.items).selectinload(models.SaleItem.product),
-            selectinload(models.Sale.payments),
-            selectinload(models.Sale.customer),
-        )
+        .options(*SALE_LOAD_OPTIONS)
         .filter(models.Sale.id == sale_id)
         .first()
     )
@@ -480,25 +699,45 @@ def get_sale(db: Session, sale_id: int) -> Optional[models.Sale]:
 
 
 def get_sale_fiado_remaining(db: Session, sale: models.Sale) -> float:
-    """Compute remaining fiado for a single sale: sum of FIADO sale payments minus allocations to that sale."""
-    from decimal import Decimal
+    """Return remaining fiado for a single sale from its ledger columns (fiado_total - fiado_allocated)."""
     if not sale:
         return 0.0
-    fiado_total = Decimal('0')
-    for p in (sale.payments or []):
-        try:
-            pm = p.method
-        except Exception:
-            pm = None
-        if pm == models.PaymentMethod.FIADO or str(pm) == str(models.PaymentMethod.FIADO):
-            fiado_total += Decimal(p.amount or 0)
-
-    allocated = db.query(func.coalesce(func.sum(models.CustomerPaymentAllocation.amount), 0)).filter(models.CustomerPaymentAllocation.sale_id == sale.id).scalar() or 0
-    allocated = Decimal(allocated)
-    remaining = fiado_total - allocated
+    remaining = Decimal(sale.fiado_total or 0) - Decimal(sale.fiado_allocated or 0)
     return float(remaining if remaining > 0 else 0)
 
 
+def rebuild_fiado_ledger(db: Session, sale_ids: List[int] | None = None) -> int:
+    """Recompute sales.fiado_total / sales.fiado_allocated from the raw payment and allocation rows.
+
+    Only sales whose ledger drifted are touched. Returns the number of sales that were corrected.
+    """
+    fiado_sum = (
+        select(func.coalesce(func.sum(models.SalePayment.amount), 0))
+        .where(
+            models.SalePayment.sale_id == models.Sale.id,
+            models.SalePayment.method == models.PaymentMethod.FIADO,
+        )
+        .scalar_subquery()
+    )
+    allocated_sum = (
+        select(func.coalesce(func.sum(models.CustomerPaymentAllocation.amount), 0))
+        .where(models.CustomerPaymentAllocation.sale_id == models.Sale.id)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(models.Sale)
+        .where(or_(models.Sale.fiado_total != fiado_sum, models.Sale.fiado_allocated != allocated_sum))
+        .values(fiado_total=fiado_sum, fiado_allocated=allocated_sum)
+        # sessions keep objects across commit: expire the corrected sales that are loaded
+        .execution_options(synchronize_session="fetch")
+    )
+    if sale_ids is not None:
+        stmt = stmt.where(models.Sale.id.in_(sale_ids))
+    result = db.execute(stmt)
+    db.commit()
+    return result.rowcount or 0
+
+
 def update_sale(
     db: Session, db_sale: models.Sale, sale_in: schemas.SaleUpdate
 ) -> models.Sale:
@@ -509,10 +748,21 @@ def update_sale(
     ):
         raise ValueError("Nao e possivel alterar uma venda cancelada.")
 
+    was_completed = db_sale.status == models.SaleStatus.COMPLETED
+    # stock currently held by this sale; reconciled against the new state before commit
+    held_quantities = _sale_quantities(db_sale.items) if was_completed else {}
+    cash_before: dict[int, Decimal] = {}
+    if db_sale.status == models.SaleStatus.COMPLETED:
+        # take the stored items out of the daily rollup; the new state is added back below
+        apply_sales_rollup(db, [db_sale.id], -1)
+        cash_before = _cash_deltas(_payment_rows(db_sale.payments), -1)
+
     if sale_in.customer_id is not None:
         if sale_in.customer_id:
-            if not db.get(models.Customer, sale_in.customer_id):
+            customer = db.get(models.Customer, sale_in.customer_id)
+            if not customer:
                 raise ValueError("Cliente informado nao existe.")
+            db_sale.customer = customer
         db_sale.customer_id = sale_in.customer_id
 
     if sale_in.status is not None:
@@ -524,10 +774,13 @@ def update_sale(
     if sale_in.items is not None:
         if db_sale.status == models.SaleStatus.CANCELLED:
             raise ValueError("Nao e possivel editar itens de venda cancelada.")
+        # products already in the sale keep the cost they were sold at
+        sold_costs = {item.product_id: item.unit_cost for item in db_sale.items}
         db_sale.items.clear()
+        products = _get_products_by_id(db, [item_in.product_id for item_in in sale_in.items])
         total_amount = Decimal("0")
         for item_in in sale_in.items:
-            product = db.get(models.Product, item_in.product_id)
+            product = products.get(item_in.product_id)
             if not product:
                 raise ValueError(f"Produto {item_in.product_id} nao encontrado.")
             unit_price = (
@@ -539,9 +792,11 @@ def update_sale(
             db_sale.items.append(
                 models.SaleItem(
                     product_id=product.id,
+                    product=product,
                     quantity=item_in.quantity,
                     unit_price=unit_price,
                     line_total=line_total,
+                    unit_cost=sold_costs.get(product.id, product.cost_price),
                 )
             )
             total_amount += line_total
@@ -552,35 +807,271 @@ def update_sale(
     if sale_in.payments is not None:
         if db_sale.status == models.SaleStatus.CANCELLED:
             raise ValueError("Nao e possivel editar pagamentos de venda cancelada.")
-        db_sale.payments.clear()
-        total_payments = _attach_payments(db_sale, sale_in.payments)
+        total_payments = _replace_payments(db_sale, sale_in.payments)
     else:
         total_payments = sum(Decimal(payment.amount) for payment in db_sale.payments)
 
     _validate_payment_totals(Decimal(db_sale.total_amount), total_payments)
 
+    wanted_quantities = (
+        _sale_quantities(db_sale.items) if db_sale.status == models.SaleStatus.COMPLETED else {}
+    )
+    _apply_stock_changes(db, held_quantities, wanted_quantities)
+    db_sale._stock_reserved = True
+
     db.add(db_sale)
+    cash_after: dict[int, Decimal] = {}
+    if db_sale.status == models.SaleStatus.COMPLETED:
+        db.flush()
+        apply_sales_rollup(db, [db_sale.id], 1)
+        cash_after = _cash_deltas(_payment_rows(db_sale.payments))
+    move_cashbox_balances(db, _merge_deltas(cash_before, cash_after), "sale_update")
     db.commit()
-    db.refresh(
-        db_sale,
-        attribute_names=["items", "payments", "customer"],
-    )
-    _ensure_loaded(db_sale)
+    if was_completed and db_sale.status == models.SaleStatus.CANCELLED:
+        metrics.sales_cancelled.inc()
     return db_sale
 
 
 def cancel_sale(db: Session, db_sale: models.Sale) -> models.Sale:
+    was_completed = db_sale.status == models.SaleStatus.COMPLETED
+    if was_completed:
+        release_stock(db, _sale_quantities(db_sale.items))
+        apply_sales_rollup(db, [db_sale.id], -1)
+        move_cashbox_balances(db, _cash_deltas(_payment_rows(db_sale.payments), -1), "sale_cancel")
     db_sale.status = models.SaleStatus.CANCELLED
     db.add(db_sale)
     db.commit()
-    db.refresh(
-        db_sale,
-        attribute_names=["items", "payments", "customer"],
-    )
-    _ensure_loaded(db_sale)
+    if was_completed:
+        metrics.sales_cancelled.inc()
     return db_sale
 
 
+# attempts made by create_sales_bulk when stock or an idempotency key changes under a batch
+_BULK_ATTEMPTS = 3
+
+
+class _BulkConflict(Exception):
+    """Stock reserved by someone else between planning and the conditional UPDATE."""
+
+
+def create_sales_bulk(db: Session, sales_in: List[schemas.SaleBulkItem]) -> List[dict]:
+    """Import a batch of sales replayed by an offline POS in a single transaction.
+
+    Keys already imported (or repeated in the batch) are reported as duplicates. The rest are
+    validated against one fetch of products and customers, in order, so a sale that would oversell
+    is rejected without blocking the following ones. Stock for the accepted sales is reserved with
+    one conditional UPDATE and sales, items and payments are written with batched INSERTs. Payments
+    go to the cashbox chosen by _bulk_sale_cashbox.
+
+    Returns one {idempotency_key, status, sale_id, detail} dict per input, in input order; a created
+    sale has a detail when its payments went to another cashbox than the one it named.
+    """
+    for _ in range(_BULK_ATTEMPTS):
+        try:
+            return _import_sales_batch(db, sales_in)
+        except (_BulkConflict, IntegrityError):
+            # stock taken or the same key imported concurrently: re-plan against the new state
+            db.rollback()
+    raise ValueError("Estoque ou vendas alterados durante a importacao; tente novamente.")
+
+
+def _import_sales_batch(db: Session, sales_in: List[schemas.SaleBulkItem]) -> List[dict]:
+    keys = [sale_in.idempotency_key for sale_in in sales_in]
+    existing: dict[str, int] = {}
+    for start in range(0, len(keys), 1000):
+        chunk = keys[start:start + 1000]
+        existing.update(
+            db.execute(
+                select(models.Sale.idempotency_key, models.Sale.id).where(models.Sale.idempotency_key.in_(chunk))
+            ).all()
+        )
+
+    product_ids = {item_in.product_id for sale_in in sales_in for item_in in sale_in.items}
+    products = {
+        row.id: row
+        for row in db.execute(
+            select(
+                models.Product.id,
+                models.Product.name,
+                models.Product.sale_price,
+                models.Product.cost_price,
+                models.Product.stock,
+            ).where(
+                models.Product.id.in_(product_ids)
+            )
+        ).all()
+    }
+    customer_ids = {sale_in.customer_id for sale_in in sales_in if sale_in.customer_id}
+    known_customers = set(
+        db.execute(select(models.Customer.id).where(models.Customer.id.in_(customer_ids))).scalars().all()
+    ) if customer_ids else set()
+
+    available = {pid: int(row.stock or 0) for pid, row in products.items()}
+    open_box = resolve_cashbox_id(db)
+    requested_boxes = {sale_in.cashbox_id for sale_in in sales_in if sale_in.cashbox_id}
+    cashboxes = {
+        cashbox.id: cashbox
+        for cashbox in db.scalars(select(models.Cashbox).where(models.Cashbox.id.in_(requested_boxes)))
+    } if requested_boxes else {}
+    received_at = datetime.now(timezone.utc)
+    results: List[dict] = []
+    accepted: List[tuple[int, dict, List[dict], List[dict]]] = []
+    seen: set[str] = set()
+    for sale_in in sales_in:
+        key = sale_in.idempotency_key
+        if key in existing:
+            results.append({"idempotency_key": key, "status": "duplicate", "sale_id": existing[key], "detail": None})
+            continue
+        if key in seen:
+            results.append({"idempotency_key": key, "status": "duplicate", "sale_id": None, "detail": "Chave repetida no lote."})
+            continue
+        seen.add(key)
+        sold_at = sale_in.created_at or received_at
+        try:
+            cashbox_id, paid_at, detail = _bulk_sale_cashbox(sale_in.cashbox_id, sold_at, cashboxes, open_box)
+            sale_row, item_rows, payment_rows = _plan_bulk_sale(sale_in, products, known_customers, available)
+        except ValueError as exc:
+            results.append({"idempotency_key": key, "status": "error", "sale_id": None, "detail": str(exc)})
+            continue
+        for row in payment_rows:
+            row["cashbox_id"] = cashbox_id
+            if paid_at is not None:
+                row["created_at"] = paid_at
+        sale_row["created_at"] = sold_at
+        results.append({"idempotency_key": key, "status": "created", "sale_id": None, "detail": detail})
+        accepted.append((len(results) - 1, sale_row, item_rows, payment_rows))
+
+    if not accepted:
+        return results
+
+    reserved: dict[int, int] = {}
+    for _, _, item_rows, _ in accepted:
+        for row in item_rows:
+            reserved[row["product_id"]] = reserved.get(row["product_id"], 0) + row["quantity"]
+    try:
+        reserve_stock(db, reserved)
+    except ValueError as exc:
+        raise _BulkConflict() from exc
+
+    sale_ids = db.execute(
+        insert(models.Sale).returning(models.Sale.id, sort_by_parameter_order=True),
+        [sale_row for _, sale_row, _, _ in accepted],
+    ).scalars().all()
+    item_rows_all: List[dict] = []
+    payment_rows_all: List[dict] = []
+    for sale_id, (position, _, item_rows, payment_rows) in zip(sale_ids, accepted):
+        results[position]["sale_id"] = sale_id
+        item_rows_all.extend({**row, "sale_id": sale_id} for row in item_rows)
+        payment_rows_all.extend({**row, "sale_id": sale_id} for row in payment_rows)
+    db.execute(insert(models.SaleItem), item_rows_all)
+    # rows dated at the sale (replayed into a closed cashbox) and rows taking the server default
+    for dated in (False, True):
+        rows = [row for row in payment_rows_all if ("created_at" in row) is dated]
+        if rows:
+            db.execute(insert(models.SalePayment), rows)
+    apply_sales_rollup(db, list(sale_ids), 1)
+    move_cashbox_balances(
+        db, _cash_deltas((row["cashbox_id"], row["method"], row["amount"]) for row in payment_rows_all), "sale"
+    )
+    db.commit()
+    metrics.sales_created.inc(len(sale_ids), source="bulk")
+    return results
+
+
+def _bulk_sale_cashbox(
+    requested: int | None, sold_at: datetime, cashboxes: dict[int, models.Cashbox], open_box: int | None
+) -> tuple[int | None, datetime | None, str | None]:
+    """Cashbox that receives the payments of a replayed sale, as (cashbox_id, paid_at, detail).
+
+    The cashbox named by the sale is used while it is open, and also after it was closed when the sale
+    happened during its session; those payments are dated at the sale (`paid_at`) so they land in that
+    cashbox's report. Otherwise the payments go to the cashbox open now and `detail` says so.
+    """
+    if requested is None:
+        return open_box, None, None
+    cashbox = cashboxes.get(requested)
+    if cashbox is None:
+        raise ValueError("Caixa informado nao existe.")
+    if cashbox.opened_at is not None and cashbox.closed_at is None:
+        return cashbox.id, None, None
+    if cashbox.opened_at is not None and _as_utc(cashbox.opened_at) <= _as_utc(sold_at) <= _as_utc(cashbox.closed_at):
+        return cashbox.id, sold_at, None
+    return open_box, None, "Caixa informado nao estava aberto na hora da venda; pagamentos lancados no caixa aberto."
+
+
+def _as_utc(moment: datetime) -> datetime:
+    # SQLite hands back naive UTC timestamps
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def _plan_bulk_sale(
+    sale_in: schemas.SaleBulkItem,
+    products: dict,
+    known_customers: set[int],
+    available: dict[int, int],
+) -> tuple[dict, List[dict], List[dict]]:
+    """Validate one bulk sale against the prefetched state and build its INSERT rows.
+
+    `available` is decremented only when the whole sale is accepted.
+    """
+    if sale_in.customer_id and sale_in.customer_id not in known_customers:
+        raise ValueError("Cliente informado nao existe.")
+
+    requested: dict[int, int] = {}
+    item_rows: List[dict] = []
+    total_amount = Decimal("0")
+    for item_in in sale_in.items:
+        product = products.get(item_in.product_id)
+        if not product:
+            raise ValueError(f"Produto {item_in.product_id} nao encontrado.")
+        unit_price = Decimal(item_in.unit_price) if item_in.unit_price is not None else Decimal(product.sale_price)
+        line_total = unit_price * item_in.quantity
+        item_rows.append(
+            {
+                "product_id": product.id,
+                "quantity": item_in.quantity,
+                "unit_price": unit_price,
+                "line_total": line_total,
+                "unit_cost": product.cost_price,
+            }
+        )
+        requested[product.id] = requested.get(product.id, 0) + item_in.quantity
+        total_amount += line_total
+    for pid, quantity in requested.items():
+        if quantity > available[pid]:
+            product = products[pid]
+            raise ValueError(
+                f"Estoque insuficiente para o produto {product.name} (id={pid}). Solicitado: {quantity}, disponível: {available[pid]}"
+            )
+
+    payment_rows: List[dict] = []
+    total_payments = Decimal("0")
+    fiado_total = Decimal("0")
+    for payment_in in sale_in.payments:
+        method = models.PaymentMethod(payment_in.method.value)
+        amount = Decimal(payment_in.amount)
+        if amount <= 0:
+            raise ValueError("Valor de pagamento deve ser maior que zero.")
+        payment_rows.append({"method": method, "amount": amount, "notes": payment_in.notes})
+        total_payments += amount
+        if method == models.PaymentMethod.FIADO:
+            fiado_total += amount
+    _validate_payment_totals(total_amount, total_payments)
+
+    for pid, quantity in requested.items():
+        available[pid] -= quantity
+    sale_row = {
+        "customer_id": sale_in.customer_id,
+        "notes": sale_in.notes,
+        "status": models.SaleStatus.COMPLETED,
+        "total_amount": total_amount,
+        "fiado_total": fiado_total,
+        "fiado_allocated": Decimal("0"),
+        "idempotency_key": sale_in.idempotency_key,
+    }
+    return sale_row, item_rows, payment_rows
+
+
 def create_sale_payment(
     db: Session,
     sale_id: int,
@@ -618,12 +1109,17 @@ def create_sale_payment(
         # reject overpayment for now
         raise ValueError("Amount exceeds remaining due")
 
-    # create payment
-    payment = models.SalePayment(sale_id=sale.id, method=models.PaymentMethod(method), amount=amt, notes=notes)
-    db.add(payment)
+    # appended through the sale so its fiado ledger (fiado_total) follows the new payment
+    _attach_payments(
+        sale,
+        [schemas.SalePaymentCreate(method=schemas.PaymentMethod(method), amount=amt, notes=notes)],
+        resolve_cashbox_id(db),
+    )
+    payment = sale.payments[-1]
+    if sale.status == models.SaleStatus.COMPLETED:
+        move_cashbox_balances(db, _cash_deltas([(payment.cashbox_id, payment.method, amt)]), "sale_payment")
     # commit inside transaction
     db.commit()
-    db.refresh(payment)
 
     remaining_due = float((total_amount - (total_paid + amt)))
 
@@ -632,7 +1128,7 @@ def create_sale_payment(
 
 
 def _attach_payments(
-    sale: models.Sale, payment_inputs: List[schemas.SalePaymentCreate]
+    sale: models.Sale, payment_inputs: List[schemas.SalePaymentCreate], cashbox_id: int | None = None
 ) -> Decimal:
     total_payments = Decimal("0")
     for payment_in in payment_inputs:
@@ -641,9 +1137,37 @@ def _attach_payments(
         if amount <= 0:
             raise ValueError("Valor de pagamento deve ser maior que zero.")
         sale.payments.append(
-            models.SalePayment(method=method, amount=amount, notes=payment_in.notes)
+            models.SalePayment(method=method, amount=amount, notes=payment_in.notes, cashbox_id=cashbox_id)
         )
         total_payments += amount
+    sale.recompute_fiado_total()
+    return total_payments
+
+
+def _replace_payments(sale: models.Sale, payment_inputs: List[schemas.SalePaymentCreate]) -> Decimal:
+    """Rewrite the payments of an existing sale without moving them to another cashbox session.
+
+    A current payment with the same method and amount is kept as is (cashbox_id, created_at); the
+    others are recorded on the sale's original cashbox and dated at the sale, so editing an old sale
+    never moves its cash into the cashbox that is open now nor out of a closed cashbox's report.
+    """
+    previous = list(sale.payments)
+    origin = next((payment.cashbox_id for payment in previous if payment.cashbox_id is not None), None)
+    sale.payments.clear()
+    total_payments = _attach_payments(sale, payment_inputs, origin)
+    payments = []
+    for payment in sale.payments:
+        match = next(
+            (old for old in previous if old.method == payment.method and Decimal(old.amount) == payment.amount), None
+        )
+        if match is None:
+            payment.created_at = select(models.Sale.created_at).where(models.Sale.id == sale.id).scalar_subquery()
+        else:
+            previous.remove(match)
+            match.notes = payment.notes
+            payment = match
+        payments.append(payment)
+    sale.payments = payments
     return total_payments
 
 
@@ -655,11 +1179,160 @@ def _validate_payment_totals(total_amount: Decimal, total_payments: Decimal) ->
         )
 
 
-def _ensure_loaded(sale: models.Sale) -> None:
-    # Forca o carregamento de relacionamentos antes de fechar a sessao
-    _ = sale.items
-    _ = sale.payments
-    _ = sale.customer
+# Estoque
+
+def _get_products_by_id(db: Session, product_ids: List[int]) -> dict[int, models.Product]:
+    ids = list(set(product_ids))
+    if not ids:
+        return {}
+    return {p.id: p for p in db.query(models.Product).filter(models.Product.id.in_(ids)).all()}
+
+
+def _sale_quantities(items: List[models.SaleItem]) -> dict[int, int]:
+    """Aggregate item quantities per product (a sale may list the same product twice)."""
+    quantities: dict[int, int] = {}
+    for item in items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + int(item.quantity)
+    return quantities
+
+
+def reserve_stock(db: Session, quantities: dict[int, int]) -> None:
+    """Check and decrement stock for all products with one batched conditional UPDATE.
+
+    Each row is updated only when stock >= requested quantity, so two concurrent checkouts can never
+    both take the last units. When any product falls short the transaction is rolled back and a
+    ValueError describing the first short product is raised.
+    """
+    rows = [{"b_id": pid, "b_qty": qty} for pid, qty in sorted(quantities.items()) if qty > 0]
+    products_table = models.Product.__table__
+    stmt = (
+        update(products_table)
+        .where(products_table.c.id == bindparam("b_id"), products_table.c.stock >= bindparam("b_qty"))
+        .values(stock=products_table.c.stock - bindparam("b_qty"))
+    )
+    if _executemany_all_matched(db, stmt, rows):
+        _shift_loaded(db, models.Product, "stock", {r["b_id"]: -r["b_qty"] for r in rows})
+        return
+
+    db.rollback()
+    current = db.query(models.Product.id, models.Product.name, models.Product.stock).filter(
+        models.Product.id.in_([r["b_id"] for r in rows])
+    )
+    for pid, name, stock in current.order_by(models.Product.id).all():
+        if quantities[pid] > stock:
+            raise ValueError(
+                f"Estoque insuficiente para o produto {name} (id={pid}). Solicitado: {quantities[pid]}, disponível: {stock}"
+            )
+    raise ValueError("Estoque alterado durante a venda; tente novamente.")
+
+
+def release_stock(db: Session, quantities: dict[int, int]) -> None:
+    """Give stock back (sale cancelled or items removed) with one batched UPDATE."""
+    rows = [{"b_id": pid, "b_qty": qty} for pid, qty in sorted(quantities.items()) if qty > 0]
+    if not rows:
+        return
+    products_table = models.Product.__table__
+    stmt = (
+        update(products_table)
+        .where(products_table.c.id == bindparam("b_id"))
+        .values(stock=products_table.c.stock + bindparam("b_qty"))
+    )
+    db.execute(stmt, rows)
+    _shift_loaded(db, models.Product, "stock", {r["b_id"]: r["b_qty"] for r in rows})
+
+
+def _shift_loaded(db: Session, model, attribute: str, deltas: dict) -> None:
+    """Apply the relative change a Core UPDATE just made to instances already loaded in the session.
+
+    Sessions do not expire on commit, so without this an object read before the UPDATE would keep
+    (and serialize) the old value; no SELECT is issued.
+    """
+    for pk, delta in deltas.items():
+        obj = db.identity_map.get(identity_key(model, pk))
+        if obj is not None and attribute in obj.__dict__:
+            set_committed_value(obj, attribute, obj.__dict__[attribute] + delta)
+
+
+def _apply_stock_changes(db: Session, held: dict[int, int], wanted: dict[int, int]) -> None:
+    """Move stock from the quantities a sale currently holds to the ones it should hold."""
+    to_release: dict[int, int] = {}
+    to_reserve: dict[int, int] = {}
+    for pid in set(held) | set(wanted):
+        delta = wanted.get(pid, 0) - held.get(pid, 0)
+        if delta > 0:
+            to_reserve[pid] = delta
+        elif delta < 0:
+            to_release[pid] = -delta
+    release_stock(db, to_release)
+    if to_reserve:
+        reserve_stock(db, to_reserve)
+
+
+# Consolidado diario (daily_product_sales)
+
+def _daily_sales_select(sale_filter, sign: int):
+    """Per (day, product) totals of the sale items matching `sale_filter`, multiplied by `sign`."""
+    item, sale = models.SaleItem, models.Sale
+    day = func.date(sale.created_at)
+    return (
+        select(
+            day.label("day"),
+            item.product_id,
+            (func.sum(item.quantity) * sign).label("quantity"),
+            (func.sum(item.line_total) * sign).label("revenue"),
+            (func.sum(item.quantity * item.unit_cost) * sign).label("cost"),
+        )
+        .join(sale, sale.id == item.sale_id)
+        .where(sale_filter)
+        .group_by(day, item.product_id)
+    )
+
+
+def apply_sales_rollup(db: Session, sale_ids: List[int], sign: int) -> None:
+    """Add (sign=1) or remove (sign=-1) the stored items of `sale_ids` to/from daily_product_sales.
+
+    Runs as one INSERT ... SELECT ... ON CONFLICT DO UPDATE inside the caller's transaction, so the
+    rollup commits (or rolls back) together with the sale. Call it when a sale enters or leaves the
+    completed state, with its items flushed.
+    """
+    if not sale_ids:
+        return
+    table = models.DailyProductSales.__table__
+    columns = ["day", "product_id", "quantity", "revenue", "cost"]
+    stmt = _upsert_insert(db)(table).from_select(
+        columns, _daily_sales_select(models.Sale.id.in_(sale_ids), sign)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.product_id],
+        set_={name: table.c[name] + stmt.excluded[name] for name in ("quantity", "revenue", "cost")},
+    )
+    db.execute(stmt)
+
+
+def rebuild_daily_product_sales(db: Session, from_day: date | None = None, to_day: date | None = None) -> int:
+    """Recompute daily_product_sales for [from_day, to_day] (everything when omitted) from the sale rows.
+
+    Returns the number of rollup rows written.
+    """
+    table = models.DailyProductSales.__table__
+    delete_stmt = table.delete()
+    sale_filter = [models.Sale.status == models.SaleStatus.COMPLETED]
+    if from_day:
+        delete_stmt = delete_stmt.where(table.c.day >= from_day)
+        sale_filter.append(models.Sale.created_at >= datetime.combine(from_day, datetime.min.time()))
+    if to_day:
+        delete_stmt = delete_stmt.where(table.c.day <= to_day)
+        sale_filter.append(
+            models.Sale.created_at < datetime.combine(to_day + timedelta(days=1), datetime.min.time())
+        )
+    db.execute(delete_stmt)
+    result = db.execute(
+        insert(table).from_select(
+            ["day", "product_id", "quantity", "revenue", "cost"], _daily_sales_select(and_(*sale_filter), 1)
+        )
+    )
+    db.commit()
+    return result.rowcount or 0
 
 
 # Financeiro
@@ -670,17 +1343,16 @@ def create_financial_entry(db: Session, entry_in: schemas.FinancialEntryCreate)
     # if date not provided, SQL default will set it
     db_entry = models.FinancialEntry(**data)
     db.add(db_entry)
+    move_cashbox_balances(db, _entry_delta(db_entry), "entry")
     db.commit()
-    db.refresh(db_entry)
     return db_entry
 
 
 def create_cashbox(db: Session, name: str, initial_amount: float = 0.0) -> models.Cashbox:
     from decimal import Decimal
-    cb = models.Cashbox(name=name, initial_amount=Decimal(initial_amount))
+    cb = models.Cashbox(name=name, initial_amount=Decimal(initial_amount), cash_balance=Decimal(initial_amount))
     db.add(cb)
     db.commit()
-    db.refresh(cb)
     return cb
 
 
@@ -699,10 +1371,12 @@ def open_cashbox(db: Session, cashbox_id: int) -> models.Cashbox:
     # Prevent opening a cashbox that's already opened
     if cb.opened_at and not cb.closed_at:
         raise ValueError("Cashbox is already opened")
-    cb.opened_at = func.now()
-    db.add(cb)
+    # reopening starts a new session: the previous close no longer applies
+    _update_returning(
+        db, cb, opened_at=func.now(), closed_at=None, closed_amount=None, cash_balance=cb.initial_amount
+    )
+    cashbox_events.queue_event(db, cb.id, {"source": "open", "delta": 0.0, "cash_balance": float(cb.initial_amount or 0)})
     db.commit()
-    db.refresh(cb)
     return cb
 
 
@@ -716,188 +1390,368 @@ def close_cashbox(db: Session, cashbox_id: int, closed_amount: float) -> models.
         raise ValueError("Cashbox is not opened")
     if cb.closed_at:
         raise ValueError("Cashbox is already closed")
-    cb.closed_at = func.now()
-    cb.closed_amount = Decimal(closed_amount)
-    db.add(cb)
+    _update_returning(db, cb, closed_at=func.now(), closed_amount=Decimal(closed_amount))
+    cashbox_events.queue_event(db, cb.id, {"source": "close", "delta": 0.0, "cash_balance": float(cb.cash_balance or 0)})
     db.commit()
-    db.refresh(cb)
     return cb
 
 
-def cashbox_report(db: Session, cashbox_id: int) -> dict:
-    """Return a summary report for the given cashbox.
+def _update_returning(db: Session, obj, **values) -> None:
+    """UPDATE the row of `obj` and load the written values (SQL expressions included) back through RETURNING."""
+    table = type(obj).__table__
+    row = db.execute(
+        update(table).where(table.c.id == obj.id).values(**values).returning(*(table.c[key] for key in values))
+    ).one()
+    for key, value in zip(values, row):
+        set_committed_value(obj, key, value)
+
+
+def resolve_cashbox_id(db: Session, cashbox_id: int | None = None) -> int | None:
+    """Cashbox that receives a payment taken now.
 
-    - payments: list of { method, amount }
-    - entries: list of financial entries (type, category, amount)
-    - expected_cash: computed expected cash total (initial + receitas in cash - despesas in cash + reforcos - sangrias)
+    `cashbox_id` when given (it must be open); otherwise the most recently opened cashbox that is still
+    open, or None when no cashbox is open.
     """
-    cb = get_cashbox(db, cashbox_id)
-    if not cb:
+    if cashbox_id is not None:
+        cb = get_cashbox(db, cashbox_id)
+        if not cb:
+            raise ValueError("Caixa informado nao existe.")
+        if not cb.opened_at or cb.closed_at:
+            raise ValueError("Caixa informado nao esta aberto.")
+        return cb.id
+    return db.scalar(
+        select(models.Cashbox.id)
+        .where(models.Cashbox.opened_at.is_not(None), models.Cashbox.closed_at.is_(None))
+        .order_by(models.Cashbox.opened_at.desc(), models.Cashbox.id.desc())
+        .limit(1)
+    )
+
+
+def _payment_rows(payments) -> list:
+    return [(p.cashbox_id, p.method, p.amount) for p in payments]
+
+
+def _cash_deltas(payments, sign: int = 1) -> dict[int, Decimal]:
+    """Cash (dinheiro) amounts of (cashbox_id, method, amount) rows, summed per cashbox."""
+    deltas: dict[int, Decimal] = {}
+    for cashbox_id, method, amount in payments:
+        if cashbox_id is not None and models.PaymentMethod(method) == models.PaymentMethod.DINHEIRO:
+            deltas[cashbox_id] = deltas.get(cashbox_id, Decimal("0")) + sign * Decimal(amount)
+    return deltas
+
+
+def _entry_delta(entry: models.FinancialEntry, sign: int = 1) -> dict[int, Decimal]:
+    if entry.cashbox_id is None:
+        return {}
+    amount = Decimal(entry.amount or 0)
+    if models.EntryType(entry.type) == models.EntryType.DESPESA:
+        amount = -amount
+    return {entry.cashbox_id: sign * amount}
+
+
+def _merge_deltas(*deltas: dict[int, Decimal]) -> dict[int, Decimal]:
+    merged: dict[int, Decimal] = {}
+    for delta in deltas:
+        for cashbox_id, amount in delta.items():
+            merged[cashbox_id] = merged.get(cashbox_id, Decimal("0")) + amount
+    return merged
+
+
+def move_cashbox_balances(db: Session, deltas: dict[int, Decimal], source: str) -> None:
+    """Add cash deltas to cashboxes.cash_balance with relative UPDATEs, in the caller's transaction.
+
+    Each move is queued as a live cashbox event ({source, delta, cash_balance}) that is published to
+    the SSE subscribers of the cashbox once the transaction commits.
+    """
+    table = models.Cashbox.__table__
+    for cashbox_id, delta in deltas.items():
+        if not delta:
+            continue
+        balance = db.execute(
+            update(table)
+            .where(table.c.id == cashbox_id)
+            .values(cash_balance=table.c.cash_balance + delta)
+            .returning(table.c.cash_balance)
+        ).scalar()
+        if balance is not None:
+            cashbox = db.identity_map.get(identity_key(models.Cashbox, cashbox_id))
+            if cashbox is not None:
+                set_committed_value(cashbox, "cash_balance", balance)
+            cashbox_events.queue_event(
+                db, cashbox_id, {"source": source, "delta": float(delta), "cash_balance": float(balance)}
+            )
+
+
+def cashbox_report(db: Session, cashbox_id: int) -> dict:
+    """Return a summary report for the given cashbox, read in a single query.
+
+    - payments: sale payment totals per method (completed sales)
+    - settlements: fiado settlement (customer payment) totals per method
+    - entries: the financial entries, one per row, oldest first (type, category, amount)
+    - entries_by_category: financial entry totals per type and category
+    - entry_totals: { receita, despesa }
+    - expected_cash: initial + cash payments + cash settlements + receitas - despesas
+    - cash_balance: the running balance kept on the cashbox (matches expected_cash)
+
+    Rows count when they were recorded on this cashbox since it was opened (created_at when it was
+    never opened) and, once closed, up to closed_at.
+    """
+    cb, sp, s, cp, fe = models.Cashbox, models.SalePayment, models.Sale, models.CustomerPayment, models.FinancialEntry
+    box = (
+        select(
+            cb.id,
+            cb.initial_amount,
+            cb.cash_balance,
+            func.coalesce(cb.opened_at, cb.created_at).label("start_at"),
+            cb.closed_at,
+        )
+        .where(cb.id == cashbox_id)
+        .cte("box")
+    )
+
+    def in_session(column):
+        return and_(column >= box.c.start_at, or_(box.c.closed_at.is_(None), column <= box.c.closed_at))
+
+    payments = (
+        select(cast(sp.method, String).label("method"), func.sum(sp.amount).label("amount"))
+        .join(s, s.id == sp.sale_id)
+        .join(box, box.c.id == sp.cashbox_id)
+        .where(s.status == models.SaleStatus.COMPLETED, in_session(sp.created_at))
+        .group_by(sp.method)
+        .cte("payments")
+    )
+    settlements = (
+        select(cast(cp.method, String).label("method"), func.sum(cp.amount).label("amount"))
+        .join(box, box.c.id == cp.cashbox_id)
+        .where(in_session(cp.created_at))
+        .group_by(cp.method)
+        .cte("settlements")
+    )
+    entry_rows = (
+        select(fe.id, fe.created_at, cast(fe.type, String).label("type"), fe.category, fe.amount)
+        .join(box, box.c.id == fe.cashbox_id)
+        .where(in_session(fe.created_at))
+        .cte("entry_rows")
+    )
+    entries = (
+        select(entry_rows.c.type, entry_rows.c.category, func.sum(entry_rows.c.amount).label("amount"))
+        .group_by(entry_rows.c.type, entry_rows.c.category)
+        .cte("entries")
+    )
+    cash = models.PaymentMethod.DINHEIRO.value
+
+    def total(cte, *where):
+        return func.coalesce(select(func.sum(cte.c.amount)).where(*where).scalar_subquery(), 0)
+
+    receitas = total(entries, entries.c.type == models.EntryType.RECEITA.value)
+    despesas = total(entries, entries.c.type == models.EntryType.DESPESA.value)
+    expected = (
+        box.c.initial_amount
+        + total(payments, payments.c.method == cash)
+        + total(settlements, settlements.c.method == cash)
+        + receitas
+        - despesas
+    )
+    no_text = literal(None, String)
+    no_id = literal(None, Integer)
+    no_time = literal(None, DateTime(timezone=True))
+    rows = db.execute(
+        union_all(
+            select(
+                literal("payment").label("kind"), payments.c.method.label("key"), no_text.label("category"),
+                payments.c.amount, no_id.label("entry_id"), no_time.label("entry_at"),
+            ),
+            select(literal("settlement"), settlements.c.method, no_text, settlements.c.amount, no_id, no_time),
+            select(
+                literal("entry"), entry_rows.c.type, entry_rows.c.category, entry_rows.c.amount,
+                entry_rows.c.id, entry_rows.c.created_at,
+            ),
+            select(literal("entry_category"), entries.c.type, entries.c.category, entries.c.amount, no_id, no_time),
+            select(literal("receita"), no_text, no_text, receitas, no_id, no_time).select_from(box),
+            select(literal("despesa"), no_text, no_text, despesas, no_id, no_time).select_from(box),
+            select(literal("initial"), no_text, no_text, box.c.initial_amount, no_id, no_time),
+            select(literal("balance"), no_text, no_text, box.c.cash_balance, no_id, no_time),
+            select(literal("expected"), no_text, no_text, expected, no_id, no_time),
+        )
+    ).all()
+    if not rows:
         raise ValueError("Cashbox not found")
 
-    # determine time window: from opened_at (if set) else created_at, until closed_at (if set) else now
-    if cb.opened_at:
-        start = cb.opened_at
-    else:
-        start = cb.created_at
-    end = cb.closed_at
-
-    # payments: gather sale payments created between start and end
-    # Sales don't have a direct created_at per payment, but payments are linked to sales; we'll filter by sale.created_at
-    from sqlalchemy import func
-
-    q = db.query(models.SalePayment.method, func.coalesce(func.sum(models.SalePayment.amount), 0))
-    q = q.join(models.Sale, models.Sale.id == models.SalePayment.sale_id)
-    q = q.filter(models.Sale.created_at >= start)
-    if end:
-        q = q.filter(models.Sale.created_at <= end)
-    q = q.group_by(models.SalePayment.method)
-    payments = [{"method": row[0].value if hasattr(row[0], 'value') else str(row[0]), "amount": float(row[1] or 0)} for row in q.all()]
-
-    # financial entries attached to this cashbox in the timeframe
-    ent_q = db.query(models.FinancialEntry).filter(models.FinancialEntry.cashbox_id == cb.id)
-    ent_q = ent_q.filter(models.FinancialEntry.created_at >= start)
-    if end:
-        ent_q = ent_q.filter(models.FinancialEntry.created_at <= end)
-    entries = []
-    for e in ent_q.order_by(models.FinancialEntry.created_at.asc()).all():
-        entries.append({"type": e.type.value if hasattr(e.type, 'value') else str(e.type), "category": e.category, "amount": float(e.amount)})
-
-    # compute expected cash: sum of payments in 'dinheiro' + financial_entries of type receita - despesas (only cash ones)
-    cash_payments = next((p['amount'] for p in payments if p['method'] == models.PaymentMethod.DINHEIRO.value or p['method'] == models.PaymentMethod.DINHEIRO), 0)
-    receitas = sum(e['amount'] for e in entries if e['type'] == 'receita')
-    despesas = sum(e['amount'] for e in entries if e['type'] == 'despesa')
-    expected_cash = float((float(cb.initial_amount or 0) + float(cash_payments or 0) + receitas - despesas))
-
-    return {"payments": payments, "entries": entries, "expected_cash": expected_cash}
+    report = {"payments": [], "settlements": [], "entries": [], "entries_by_category": [], "entry_totals": {}}
+    entry_order = []
+    for kind, key, category, amount, entry_id, entry_at in rows:
+        amount = float(amount or 0)
+        if kind == "payment":
+            report["payments"].append({"method": key, "amount": amount})
+        elif kind == "settlement":
+            report["settlements"].append({"method": key, "amount": amount})
+        elif kind == "entry":
+            entry_order.append(((entry_at, entry_id), {"type": key, "category": category, "amount": amount}))
+        elif kind == "entry_category":
+            report["entries_by_category"].append({"type": key, "category": category, "amount": amount})
+        elif kind in ("receita", "despesa"):
+            report["entry_totals"][kind] = amount
+        elif kind == "initial":
+            report["initial_amount"] = amount
+        elif kind == "balance":
+            report["cash_balance"] = amount
+        else:
+            report["expected_cash"] = amount
+    report["entries"] = [entry for _, entry in sorted(entry_order, key=lambda item: item[0])]
+    return report
+
+
+def get_customer_balances(db: Session, customer_ids: List[int]) -> dict[int, float]:
+    """Return outstanding fiado per customer for a set of customers in a single query.
+
+    For each sale the remaining fiado is read from the ledger (fiado_total - fiado_allocated),
+    clamped at zero, and summed per customer. Customers without open fiado map to 0.0.
+    """
+    ids = list({cid for cid in customer_ids if cid is not None})
+    if not ids:
+        return {}
+    return customer_balances_from_rows(ids, db.execute(customer_balances_statement(ids)).all())
+
+
+def customer_balances_statement(customer_ids: List[int]):
+    """SELECT (customer_id, outstanding fiado) shared by the sync and async balance lookups."""
+    return (
+        select(
+            models.Sale.customer_id,
+            func.sum(models.Sale.fiado_total - models.Sale.fiado_allocated),
+        )
+        .where(
+            models.Sale.customer_id.in_(customer_ids),
+            models.Sale.fiado_total > models.Sale.fiado_allocated,
+        )
+        .group_by(models.Sale.customer_id)
+    )
+
+
+def customer_balances_from_rows(customer_ids: List[int], rows) -> dict[int, float]:
+    """Map every requested customer to its outstanding fiado; customers without open fiado get 0.0."""
+    balances = {cid: 0.0 for cid in customer_ids}
+    for cid, outstanding in rows:
+        balances[cid] = float(Decimal(outstanding or 0))
+    return balances
 
 
 def get_customer_balance(db: Session, customer_id: int) -> float:
     """Return total outstanding fiado for customer (sum of sale fiado amounts minus allocations)."""
-    from decimal import Decimal
     customer = db.get(models.Customer, customer_id)
     if not customer:
         raise ValueError("Customer not found")
-    outstanding_sales = (
-        db.query(models.Sale)
-        .filter(models.Sale.customer_id == customer.id)
-        .order_by(models.Sale.created_at.asc())
-        .all()
-    )
-    total_outstanding = Decimal('0')
-    for sale in outstanding_sales:
-        fiado_total = Decimal('0')
-        for p in (sale.payments or []):
-            try:
-                pm = p.method
-            except Exception:
-                pm = None
-            if pm == models.PaymentMethod.FIADO or str(pm) == str(models.PaymentMethod.FIADO):
-                fiado_total += Decimal(p.amount or 0)
+    return get_customer_balances(db, [customer.id]).get(customer.id, 0.0)
 
-        allocated = db.query(func.coalesce(func.sum(models.CustomerPaymentAllocation.amount), 0)).filter(models.CustomerPaymentAllocation.sale_id == sale.id).scalar() or 0
-        allocated = Decimal(allocated)
-        sale_remaining = fiado_total - allocated
-        if sale_remaining > 0:
-            total_outstanding += sale_remaining
 
-    return float(total_outstanding)
+# attempts made by create_customer_payment when a concurrent payment changes the ledger mid-allocation
+_ALLOCATION_ATTEMPTS = 3
 
 
-def create_customer_payment(db: Session, customer_id: int, amount: float, method: str) -> dict:
+def create_customer_payment(
+    db: Session, customer_id: int, amount: float, method: str, cashbox_id: int | None = None
+) -> dict:
     """Create a CustomerPayment and allocate the amount to the customer's outstanding fiado sales.
 
-    Allocation order: most recent sale first (DESC by created_at). For each sale with balance_due > 0,
-    deduct from the remaining amount and create a CustomerPaymentAllocation linking payment -> sale.
+    Allocation order: oldest sale first (FIFO by created_at, id). The open sales and their remaining
+    fiado are read from the ledger in one query and locked with SELECT ... FOR UPDATE; the amount is
+    split in memory, the allocations are bulk-inserted and the ledger is updated with a conditional
+    UPDATE so a concurrent payment can never over-allocate a sale.
+
+    The payment is recorded on `cashbox_id`, or on the cashbox open now; cash settlements count in
+    its expected cash.
 
     Returns: { payment: CustomerPayment, allocations: List[{ sale_id, amount_allocated }], remaining: float }
     """
-    from decimal import Decimal
-
     if amount <= 0:
         raise ValueError("Amount must be greater than zero")
 
+    cashbox_id = resolve_cashbox_id(db, cashbox_id)
+    for _ in range(_ALLOCATION_ATTEMPTS):
+        result = _allocate_customer_payment(
+            db, customer_id, Decimal(str(amount)), models.PaymentMethod(method), cashbox_id
+        )
+        if result is not None:
+            return result
+        db.rollback()
+    raise ValueError("Saldo de fiado alterado por outro pagamento; tente novamente.")
+
+
+def _allocate_customer_payment(
+    db: Session, customer_id: int, amount: Decimal, method: models.PaymentMethod, cashbox_id: int | None = None
+) -> dict | None:
+    """Single allocation attempt; returns None when the ledger changed under us."""
     customer = db.get(models.Customer, customer_id)
     if not customer:
         raise ValueError("Customer not found")
 
-    payment = models.CustomerPayment(customer_id=customer.id, method=models.PaymentMethod(method), amount=Decimal(amount))
-    db.add(payment)
-
-    remaining = Decimal(amount)
-    allocations = []
-
-    # find outstanding sales for this customer, newest first
-    outstanding_sales = (
-        db.query(models.Sale)
-        .filter(models.Sale.customer_id == customer.id)
-        # allocate to oldest purchases first (FIFO)
-        .order_by(models.Sale.created_at.asc())
-        .all()
-    )
-
-    # compute total outstanding fiado across all sales for this customer
-    total_outstanding = Decimal("0")
-    for sale in outstanding_sales:
-        # total fiado for this sale is sum of payments with method FIADO
-        fiado_total = Decimal("0")
-        for p in (sale.payments or []):
-            try:
-                pm = p.method
-            except Exception:
-                pm = None
-            if pm == models.PaymentMethod.FIADO or str(pm) == str(models.PaymentMethod.FIADO):
-                fiado_total += Decimal(p.amount or 0)
-
-        # sum of previous allocations that already settled this sale
-        allocated = db.query(func.coalesce(func.sum(models.CustomerPaymentAllocation.amount), 0)).filter(models.CustomerPaymentAllocation.sale_id == sale.id).scalar() or 0
-        allocated = Decimal(allocated)
-
-        sale_remaining = fiado_total - allocated
-        if sale_remaining > 0:
-            total_outstanding += sale_remaining
-
-    if total_outstanding <= 0:
+    sale_remaining = models.Sale.fiado_total - models.Sale.fiado_allocated
+    open_sales = db.execute(
+        select(models.Sale.id, sale_remaining)
+        .where(
+            models.Sale.customer_id == customer.id,
+            models.Sale.fiado_total > models.Sale.fiado_allocated,
+        )
+        .order_by(models.Sale.created_at.asc(), models.Sale.id.asc())
+        .with_for_update()
+    ).all()
+    if not open_sales:
         # No fiado/open balance for this customer
         raise ValueError("Cliente não possui fiado em aberto.")
 
-    for sale in outstanding_sales:
-        # compute sale remaining as FIADO total minus previous allocations
-        fiado_total = Decimal("0")
-        for p in (sale.payments or []):
-            try:
-                pm = p.method
-            except Exception:
-                pm = None
-            if pm == models.PaymentMethod.FIADO or str(pm) == str(models.PaymentMethod.FIADO):
-                fiado_total += Decimal(p.amount or 0)
-
-        allocated = db.query(func.coalesce(func.sum(models.CustomerPaymentAllocation.amount), 0)).filter(models.CustomerPaymentAllocation.sale_id == sale.id).scalar() or 0
-        allocated = Decimal(allocated)
-        sale_remaining = fiado_total - allocated
-        if sale_remaining <= 0:
-            continue
+    payment = models.CustomerPayment(customer_id=customer.id, method=method, amount=amount, cashbox_id=cashbox_id)
+    db.add(payment)
+    db.flush()
 
+    remaining = amount
+    rows = []
+    for sale_id, open_amount in open_sales:
         if remaining <= 0:
             break
-
-        allocate_amt = min(remaining, sale_remaining)
-        alloc = models.CustomerPaymentAllocation(payment=payment, sale_id=sale.id, amount=allocate_amt)
-        db.add(alloc)
-        allocations.append({"sale_id": sale.id, "amount": float(allocate_amt)})
+        allocate_amt = min(remaining, Decimal(open_amount))
+        rows.append({"payment_id": payment.id, "sale_id": sale_id, "amount": allocate_amt})
         remaining -= allocate_amt
 
-    # commit and refresh
+    db.execute(insert(models.CustomerPaymentAllocation), rows)
+    sales_table = models.Sale.__table__
+    ledger_update = (
+        update(sales_table)
+        .where(
+            sales_table.c.id == bindparam("b_sale_id"),
+            sales_table.c.fiado_total - sales_table.c.fiado_allocated >= bindparam("b_amount"),
+        )
+        .values(fiado_allocated=sales_table.c.fiado_allocated + bindparam("b_amount"))
+    )
+    if not _executemany_all_matched(
+        db, ledger_update, [{"b_sale_id": r["sale_id"], "b_amount": r["amount"]} for r in rows]
+    ):
+        return None
+    _shift_loaded(db, models.Sale, "fiado_allocated", {r["sale_id"]: r["amount"] for r in rows})
+
+    move_cashbox_balances(db, _cash_deltas([(cashbox_id, method, amount)]), "settlement")
     db.commit()
-    db.refresh(payment)
+    metrics.fiado_allocations.inc(len(rows))
+    metrics.fiado_allocated_amount.inc(float(amount - remaining))
 
+    allocations = [{"sale_id": r["sale_id"], "amount": float(r["amount"])} for r in rows]
     return {"payment": payment, "allocations": allocations, "remaining": float(remaining)}
 
 
-def list_financial_entries(db: Session, skip: int = 0, limit: int = 100, type: str | None = None) -> List[models.FinancialEntry]:
+def _executemany_all_matched(db: Session, stmt, params: List[dict]) -> bool:
+    """Run a conditional UPDATE for every parameter set and report whether each one matched a row."""
+    if not params:
+        return True
+    if db.get_bind().dialect.supports_sane_multi_rowcount:
+        return db.execute(stmt, params).rowcount == len(params)
+    return all(db.execute(stmt, p).rowcount == 1 for p in params)
+
+
+def list_financial_entries(db: Session, skip: int = 0, limit: int = 100, type: str | None = None, cursor: str | None = None) -> List[models.FinancialEntry]:
     q = db.query(models.FinancialEntry)
     if type:
         q = q.filter(models.FinancialEntry.type == type)
+    if cursor is not None:
+        return keyset_page(q, FINANCIAL_ENTRY_PAGE_KEY, cursor, limit, descending=True).all()
     return q.order_by(models.FinancialEntry.date.desc()).offset(skip).limit(limit).all()
 
 
@@ -907,22 +1761,27 @@ def get_financial_entry(db: Session, entry_id: int) -> Optional[models.Financial
 
 def update_financial_entry(db: Session, db_entry: models.FinancialEntry, entry_in: schemas.FinancialEntryUpdate) -> models.FinancialEntry:
     update_data = entry_in.model_dump(exclude_unset=True)
+    before = _entry_delta(db_entry, -1)
     for field, value in update_data.items():
         setattr(db_entry, field, value)
     db.add(db_entry)
+    move_cashbox_balances(db, _merge_deltas(before, _entry_delta(db_entry)), "entry")
     db.commit()
-    db.refresh(db_entry)
     return db_entry
 
 
 def delete_financial_entry(db: Session, db_entry: models.FinancialEntry) -> None:
+    move_cashbox_balances(db, _entry_delta(db_entry, -1), "entry")
     db.delete(db_entry)
     db.commit()
 
 
 # Categories
-def list_categories(db: Session, skip: int = 0, limit: int = 100) -> List[models.Category]:
-    return db.query(models.Category).order_by(models.Category.name.asc()).offset(skip).limit(limit).all()
+def list_categories(db: Session, skip: int = 0, limit: int = 100, cursor: str | None = None) -> List[models.Category]:
+    q = db.query(models.Category)
+    if cursor is not None:
+        return keyset_page(q, CATEGORY_PAGE_KEY, cursor, limit).all()
+    return q.order_by(models.Category.name.asc()).offset(skip).limit(limit).all()
 
 
 def create_category(db: Session, category_in: schemas.CategoryCreate) -> models.Category:
@@ -933,7 +1792,6 @@ def create_category(db: Session, category_in: schemas.CategoryCreate) -> models.
     db_cat = models.Category(name=name)
     db.add(db_cat)
     db.commit()
-    db.refresh(db_cat)
     return db_cat
 
 
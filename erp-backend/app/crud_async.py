@@ -0,0 +1,156 @@
+"""Async counterparts of the hot CRUD paths (produtos, clientes, vendas).
+
+Reads are native async queries built from the same filters/options as app.crud. Writes reuse the
+sync functions through AsyncSession.run_sync, so stock reservation, fiado ledger and validation
+rules live in one place; the sync code runs on the event loop's greenlet, not in a thread.
+Everything returned here is fully loaded: the session has expire_on_commit=False and routes
+serialize the objects after the await, where lazy loading is not possible.
+"""
+
+from __future__ import annotations
+
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, models, schemas
+from app.pagination import keyset_page
+
+
+def _dialect_name(db: AsyncSession) -> str:
+    return db.get_bind().dialect.name
+
+
+# Produtos
+
+async def list_products(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    sku: str | None = None,
+    name: str | None = None,
+    cursor: str | None = None,
+) -> List[models.Product]:
+    stmt = select(models.Product).where(*crud.product_list_filters(sku, name))
+    if cursor is not None:
+        stmt = keyset_page(stmt, crud.PRODUCT_PAGE_KEY, cursor, limit, dialect_name=_dialect_name(db))
+    else:
+        stmt = stmt.offset(skip).limit(limit)
+    return list((await db.scalars(stmt)).all())
+
+
+async def search_products(db: AsyncSession, q: str, limit: int = 20, rank: bool = True) -> list:
+    stmt = crud.product_search_statement(q, limit, rank, _dialect_name(db))
+    if stmt is None:
+        return []
+    return list((await db.execute(stmt)).all())
+
+
+async def get_product(db: AsyncSession, product_id: int) -> Optional[models.Product]:
+    return await db.get(models.Product, product_id)
+
+
+async def get_product_by_sku(db: AsyncSession, sku: str) -> Optional[models.Product]:
+    return await db.scalar(select(models.Product).where(models.Product.sku == sku).limit(1))
+
+
+async def create_product(db: AsyncSession, product_in: schemas.ProductCreate) -> models.Product:
+    return await db.run_sync(crud.create_product, product_in)
+
+
+async def update_product(
+    db: AsyncSession, db_product: models.Product, product_in: schemas.ProductUpdate
+) -> models.Product:
+    return await db.run_sync(crud.update_product, db_product, product_in)
+
+
+# Clientes
+
+async def list_customers(
+    db: AsyncSession, skip: int = 0, limit: int = 100, cursor: str | None = None
+) -> List[models.Customer]:
+    stmt = select(models.Customer)
+    if cursor is not None:
+        stmt = keyset_page(stmt, crud.CUSTOMER_PAGE_KEY, cursor, limit, dialect_name=_dialect_name(db))
+    else:
+        stmt = stmt.order_by(models.Customer.name.asc()).offset(skip).limit(limit)
+    return list((await db.scalars(stmt)).all())
+
+
+async def get_customer(db: AsyncSession, customer_id: int) -> Optional[models.Customer]:
+    return await db.get(models.Customer, customer_id)
+
+
+async def get_customer_by_phone(db: AsyncSession, phone: str) -> Optional[models.Customer]:
+    if not phone:
+        return None
+    return await db.scalar(select(models.Customer).where(models.Customer.phone == phone).limit(1))
+
+
+async def get_customer_balances(db: AsyncSession, customer_ids: List[int]) -> dict[int, float]:
+    """Async version of crud.get_customer_balances (one grouped query over the fiado ledger)."""
+    ids = list({cid for cid in customer_ids if cid is not None})
+    if not ids:
+        return {}
+    rows = await db.execute(crud.customer_balances_statement(ids))
+    return crud.customer_balances_from_rows(ids, rows.all())
+
+
+async def create_customer(db: AsyncSession, customer_in: schemas.CustomerCreate) -> models.Customer:
+    return await db.run_sync(crud.create_customer, customer_in)
+
+
+async def update_customer(
+    db: AsyncSession, db_customer: models.Customer, customer_in: schemas.CustomerUpdate
+) -> models.Customer:
+    return await db.run_sync(crud.update_customer, db_customer, customer_in)
+
+
+# Vendas
+
+def _attach_fiado_pending(sales: List[models.Sale]) -> None:
+    for sale in sales:
+        sale.total_fiado_pending = crud.get_sale_fiado_remaining(None, sale)
+
+
+async def list_sales(
+    db: AsyncSession, skip: int = 0, limit: int = 100, cursor: str | None = None
+) -> List[models.Sale]:
+    stmt = select(models.Sale).options(*crud.SALE_LOAD_OPTIONS)
+    if cursor is not None:
+        stmt = keyset_page(
+            stmt, crud.SALE_PAGE_KEY, cursor, limit, descending=True, dialect_name=_dialect_name(db)
+        )
+    else:
+        stmt = stmt.order_by(models.Sale.created_at.desc()).offset(skip).limit(limit)
+    sales = list((await db.scalars(stmt)).all())
+    _attach_fiado_pending(sales)
+    return sales
+
+
+async def get_sale(db: AsyncSession, sale_id: int) -> Optional[models.Sale]:
+    """Load a sale with everything schemas.Sale serializes."""
+    stmt = select(models.Sale).options(*crud.SALE_LOAD_OPTIONS).where(models.Sale.id == sale_id)
+    sale = await db.scalar(stmt)
+    if sale:
+        _attach_fiado_pending([sale])
+    return sale
+
+
+async def create_sale(db: AsyncSession, sale_in: schemas.SaleCreate) -> models.Sale:
+    # crud builds the response in memory (items with their products, payments, customer) and
+    # RETURNING fills the server defaults, so no reload SELECT is needed
+    return await db.run_sync(crud.create_sale, sale_in)
+
+
+async def update_sale(db: AsyncSession, db_sale: models.Sale, sale_in: schemas.SaleUpdate) -> models.Sale:
+    sale = await db.run_sync(crud.update_sale, db_sale, sale_in)
+    _attach_fiado_pending([sale])
+    return sale
+
+
+async def cancel_sale(db: AsyncSession, db_sale: models.Sale) -> models.Sale:
+    sale = await db.run_sync(crud.cancel_sale, db_sale)
+    _attach_fiado_pending([sale])
+    return sale
@@ -3,8 +3,10 @@
 
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
-from sqlalchemy import event
+from sqlalchemy import event, select
 from sqlalchemy.orm import Session as OrmSession
 
 # guard to avoid double-registering listeners if init_db called multiple times
@@ -14,6 +16,10 @@ _listeners_registered = False
 class Base(DeclarativeBase):
     """Base class for all ORM models."""
 
+    # server-generated columns (ids, created_at, onupdate updated_at) come back in the INSERT/UPDATE
+    # itself through RETURNING, so writers never need a refresh SELECT
+    __mapper_args__ = {"eager_defaults": True}
+
 # Only Postgres is supported
 DATABASE_URL = os.environ["DATABASE_URL"]
 engine = create_engine(
@@ -22,7 +28,33 @@ engine = create_engine(
     pool_size=10,
     max_overflow=20,
 )
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+# expire_on_commit=False: objects written by crud keep their state after commit and are serialized
+# as they are in memory; crud keeps them in sync with the relative UPDATEs it issues
+SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, expire_on_commit=False)
+
+# Async driver for the same database, used by the hot request paths so a request waiting on
+# Postgres does not hold a threadpool thread. psycopg 3 serves both engines; SQLite (tests)
+# goes through aiosqlite.
+_ASYNC_DRIVERS = {"postgresql": "psycopg", "sqlite": "aiosqlite"}
+
+
+def _async_database_url(url: str):
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        return parsed
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}")
+
+
+_async_url = _async_database_url(DATABASE_URL)
+async_engine = create_async_engine(
+    _async_url,
+    pool_pre_ping=True,
+    # aiosqlite runs on a NullPool, which takes no sizing
+    **({} if _async_url.get_backend_name() == "sqlite" else {"pool_size": 10, "max_overflow": 20}),
+)
+# expire_on_commit=False: attributes must not be lazily reloaded after commit outside the greenlet
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 
 def init_db() -> None:
     """Create tables if they do not exist."""
@@ -30,42 +62,43 @@ def init_db() -> None:
     from app import models  # noqa: F401 - ensure models are imported
     Base.metadata.create_all(bind=engine)
 
-    # Register a before_flush listener to validate stock when Sales are created/updated
-    # This ensures tests or code that directly adds `models.Sale` and commits will still
-    # enforce stock validation (the same checks performed by crud.create_sale).
+    # Register a before_flush listener as a fallback stock check for Sales added directly through
+    # the ORM (tests, scripts). crud.create_sale/update_sale reserve stock themselves with a
+    # conditional UPDATE and flag the sale, so those are skipped here.
     global _listeners_registered
     if not _listeners_registered:
         def _validate_sale_stock(session: OrmSession, flush_context, instances):
-            # iterate new and dirty objects to find Sale instances
-            for obj in list(session.new) + list(session.dirty):
-                try:
-                    is_sale = isinstance(obj, models.Sale)
-                except Exception:
-                    is_sale = False
-                if not is_sale:
+            requested: dict[int, int] = {}
+            for obj in list(session.new):
+                if not isinstance(obj, models.Sale):
+                    continue
+                # keep the fiado ledger in sync for sales built directly through the ORM
+                obj.recompute_fiado_total()
+                if getattr(obj, "_stock_reserved", False):
                     continue
                 # Only validate completed sales (same business rule as crud.create_sale)
-                try:
-                    status = obj.status
-                except Exception:
-                    status = None
-                if status != models.SaleStatus.COMPLETED:
+                if obj.status not in (None, models.SaleStatus.COMPLETED):
                     continue
+                for item in obj.items or []:
+                    requested[item.product_id] = requested.get(item.product_id, 0) + item.quantity
+            if not requested:
+                return
 
-                # ensure items exist and stock is sufficient
-                for item in getattr(obj, 'items', []) or []:
-                    # product may be loaded or only have product_id
-                    prod = None
-                    try:
-                        prod = session.get(models.Product, item.product_id)
-                    except Exception:
-                        prod = None
-                    if not prod:
-                        raise ValueError(f"Produto {item.product_id} nao encontrado.")
-                    if item.quantity > prod.stock:
-                        raise ValueError(
-                            f"Estoque insuficiente para o produto {prod.name} (id={prod.id}). Solicitado: {item.quantity}, disponível: {prod.stock}"
-                        )
+            # one query for every product referenced by the pending sales
+            rows = session.execute(
+                select(models.Product.id, models.Product.name, models.Product.stock).where(
+                    models.Product.id.in_(list(requested))
+                )
+            ).all()
+            found = {row.id: row for row in rows}
+            for product_id, quantity in requested.items():
+                prod = found.get(product_id)
+                if not prod:
+                    raise ValueError(f"Produto {product_id} nao encontrado.")
+                if quantity > prod.stock:
+                    raise ValueError(
+                        f"Estoque insuficiente para o produto {prod.name} (id={prod.id}). Solicitado: {quantity}, disponível: {prod.stock}"
+                    )
 
         event.listen(OrmSession, "before_flush", _validate_sale_stock)
         _listeners_registered = True
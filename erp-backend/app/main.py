@@ -1,27 +1,50 @@
 ﻿from __future__ import annotations
 
+import json
+import os
+import tempfile
 from typing import List
 
-from fastapi import Depends, FastAPI, File, HTTPException, Query, Response, UploadFile, status
+from fastapi import Depends, FastAPI, File, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app import crud, schemas
+from app import crud, crud_async, models, schemas
+from app.pagination import next_cursor
 from sqlalchemy.exc import IntegrityError
-from app.database import init_db
-from app.dependencies import get_db
+from app.database import SessionLocal, async_engine, engine, init_db
+from app.dependencies import get_async_db, get_db
+from app.services.cashbox_events import hub as cashbox_hub, sse_stream
+from app.services.export import export_response
+from app.services.media import MediaFiles
+from app.services import metrics, query_profiler
+from app.services.product_import import ProductImportError, import_products, iter_records, ndjson_lines
 from app.services.image_processing import (
     MEDIA_ROOT,
     ImageProcessingError,
     convert_many_to_webp,
+    shutdown_image_pool,
 )
 from app.auth import verify_password, create_token_for_user, decode_access_token, get_password_hash
 from sqlalchemy.orm import Session
 from fastapi import Depends, Header
 
 app = FastAPI(title="Menju Backend", version="0.2.0")
-app.mount("/media/products", StaticFiles(directory=MEDIA_ROOT), name="product-media")
+# MEDIA_SENDFILE_HEADER (e.g. X-Accel-Redirect) + MEDIA_SENDFILE_PREFIX hand photo bodies to the
+# front proxy; MEDIA_PRECOMPRESSED=1 serves .br/.gz sidecars when present.
+app.mount(
+    "/media/products",
+    MediaFiles(
+        directory=MEDIA_ROOT,
+        precompressed=os.environ.get("MEDIA_PRECOMPRESSED", "0") == "1",
+        sendfile_header=os.environ.get("MEDIA_SENDFILE_HEADER") or None,
+        sendfile_prefix=os.environ.get("MEDIA_SENDFILE_PREFIX", "/internal-media/products/"),
+    ),
+    name="product-media",
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -37,35 +60,150 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Link", "X-Next-Cursor"],
 )
+# per-request statement count / database time; active with QUERY_PROFILER=1
+query_profiler.instrument(engine, async_engine.sync_engine)
+app.add_middleware(query_profiler.QueryProfilerMiddleware)
+metrics.instrument_pools({"sync": engine, "async": async_engine.sync_engine})
+app.add_middleware(metrics.MetricsMiddleware)
 
 @app.on_event("startup")
 def on_startup() -> None:
     init_db()
 
 
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    shutdown_image_pool()
+    await async_engine.dispose()
+
+
+def _set_next_page(request: Request, response: Response, token: str | None) -> None:
+    """Advertise the keyset cursor of the next page via `X-Next-Cursor` and a `Link: rel="next"` header."""
+    if not token:
+        return
+    next_url = request.url.remove_query_params("skip").include_query_params(cursor=token)
+    response.headers["X-Next-Cursor"] = token
+    response.headers["Link"] = f'<{next_url}>; rel="next"'
+
+
 # Produtos
 @app.post("/products", response_model=schemas.Product, status_code=status.HTTP_201_CREATED)
-def create_product(
-    product: schemas.ProductCreate, db: Session = Depends(get_db)
+async def create_product(
+    product: schemas.ProductCreate, db: AsyncSession = Depends(get_async_db)
 ) -> schemas.Product:
-    if crud.get_product_by_sku(db, product.sku):
+    if await crud_async.get_product_by_sku(db, product.sku):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="SKU already registered",
         )
-    return crud.create_product(db, product)
+    return await crud_async.create_product(db, product)
 
 
 @app.get("/products", response_model=List[schemas.Product])
-def read_products(
+async def read_products(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
     sku: str | None = Query(None),
     name: str | None = Query(None),
-    db: Session = Depends(get_db),
+    cursor: str | None = Query(None, description="Keyset cursor; send it empty for the first page"),
+    db: AsyncSession = Depends(get_async_db),
 ) -> List[schemas.Product]:
-    return crud.list_products(db, skip=skip, limit=limit, sku=sku, name=name)
+    try:
+        products = await crud_async.list_products(db, skip=skip, limit=limit, sku=sku, name=name, cursor=cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    if cursor is not None:
+        _set_next_page(request, response, next_cursor(products, crud.PRODUCT_PAGE_KEY, limit))
+    return products
+
+
+@app.get("/products/search", response_model=List[schemas.ProductSearchResult])
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    rank: bool = Query(True),
+    db: AsyncSession = Depends(get_async_db),
+) -> List[schemas.ProductSearchResult]:
+    return await crud_async.search_products(db, q, limit=limit, rank=rank)
+
+
+EXPORT_FORMAT = Query("csv", pattern="^(csv|xlsx|jsonl)$")
+
+
+def _export(statement_factory, fmt: str, filename: str, **filters) -> StreamingResponse:
+    """Stream every row matching `filters` (no limit) through a server-side cursor."""
+    try:
+        return export_response(statement_factory(**filters), fmt, filename)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+
+@app.get("/products/export")
+def export_products(
+    format: str = EXPORT_FORMAT,
+    sku: str | None = Query(None),
+    name: str | None = Query(None),
+) -> StreamingResponse:
+    return _export(crud.products_export_statement, format, "produtos", sku=sku, name=name)
+
+
+# request bodies up to this size stay in memory while importing; larger ones spill to a temp file
+IMPORT_SPOOL_BYTES = 8 * 1024 * 1024
+
+
+@app.post("/products/import")
+async def import_products_endpoint(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|jsonl)$"),
+    chunk_size: int = Query(1000, ge=1, le=10000),
+) -> StreamingResponse:
+    """Upsert products by SKU from a raw CSV or JSONL request body.
+
+    Streams NDJSON progress: one line per committed chunk ({processed, upserted, failed, errors}) and a
+    last line with done=true. Rows are validated as ProductCreate; invalid rows are reported and skipped.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES)
+    async for body_chunk in request.stream():
+        await run_in_threadpool(spool.write, body_chunk)
+    spool.seek(0)
+
+    # the import opens its own session: dependency-managed sessions are closed before streaming starts
+    def progress():
+        db = SessionLocal()
+        try:
+            yield from ndjson_lines(import_products(db, iter_records(spool, format), chunk_size=chunk_size))
+        except ProductImportError as exc:
+            yield (json.dumps({"done": True, "error": str(exc)}, ensure_ascii=False) + "\n").encode("utf-8")
+        finally:
+            db.close()
+            spool.close()
+
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
+
+
+@app.get("/reports/products/export")
+def export_products_report(
+    format: str = EXPORT_FORMAT,
+    from_date: str | None = Query(None),
+    to_date: str | None = Query(None),
+    sku: str | None = Query(None),
+    name: str | None = Query(None),
+    category: str | None = Query(None),
+) -> StreamingResponse:
+    return _export(
+        crud.products_report_export_statement,
+        format,
+        "relatorio-produtos",
+        from_date=from_date,
+        to_date=to_date,
+        sku=sku,
+        name=name,
+        category=category,
+    )
 
 
 @app.get("/reports/products", response_model=schemas.ProductsReport)
@@ -268,32 +406,32 @@ def read_current_tenant(authorization: str | None = Header(None), db: Session =
 
 
 @app.get("/products/{product_id}", response_model=schemas.Product)
-def read_product(product_id: int, db: Session = Depends(get_db)) -> schemas.Product:
-    db_product = crud.get_product(db, product_id)
+async def read_product(product_id: int, db: AsyncSession = Depends(get_async_db)) -> schemas.Product:
+    db_product = await crud_async.get_product(db, product_id)
     if not db_product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
     return db_product
 
 
 @app.put("/products/{product_id}", response_model=schemas.Product)
-def update_product(
+async def update_product(
     product_id: int,
     product_update: schemas.ProductUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> schemas.Product:
-    db_product = crud.get_product(db, product_id)
+    db_product = await crud_async.get_product(db, product_id)
     if not db_product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
 
     if product_update.sku and product_update.sku != db_product.sku:
-        existing = crud.get_product_by_sku(db, product_update.sku)
+        existing = await crud_async.get_product_by_sku(db, product_update.sku)
         if existing and existing.id != product_id:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="SKU already registered",
             )
 
-    return crud.update_product(db, db_product, product_update)
+    return await crud_async.update_product(db, db_product, product_update)
 
 
 @app.delete("/products/{product_id}", status_code=status.HTTP_200_OK)
@@ -352,46 +490,59 @@ def delete_product_photo(
 
 # Clientes
 @app.post("/customers", response_model=schemas.Customer, status_code=status.HTTP_201_CREATED)
-def create_customer(
-    customer: schemas.CustomerCreate, db: Session = Depends(get_db)
+async def create_customer(
+    customer: schemas.CustomerCreate, db: AsyncSession = Depends(get_async_db)
 ) -> schemas.Customer:
     # 'document' field removed from Customer model; skip document uniqueness check.
     # Prevent duplicate by phone
-    if customer.phone and crud.get_customer_by_phone(db, customer.phone):
+    if customer.phone and await crud_async.get_customer_by_phone(db, customer.phone):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Cliente já cadastrado.",
         )
-    return crud.create_customer(db, customer)
+    return await crud_async.create_customer(db, customer)
 
 
 @app.get("/customers", response_model=List[schemas.Customer])
-def read_customers(
+async def read_customers(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
-    db: Session = Depends(get_db),
+    cursor: str | None = Query(None, description="Keyset cursor; send it empty for the first page"),
+    db: AsyncSession = Depends(get_async_db),
 ) -> List[schemas.Customer]:
-    db_customers = crud.list_customers(db, skip=skip, limit=limit)
+    try:
+        db_customers = await crud_async.list_customers(db, skip=skip, limit=limit, cursor=cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    if cursor is not None:
+        _set_next_page(request, response, next_cursor(db_customers, crud.CUSTOMER_PAGE_KEY, limit))
+    try:
+        balances = await crud_async.get_customer_balances(db, [c.id for c in db_customers])
+    except Exception:
+        balances = {}
     out = []
     for c in db_customers:
-        try:
-            balance = crud.get_customer_balance(db, c.id)
-        except Exception:
-            balance = 0.0
         cust = schemas.Customer.model_validate(c)
         d = cust.model_dump()
-        d["balance_due"] = balance
+        d["balance_due"] = balances.get(c.id, 0.0)
         out.append(d)
     return out
 
 
+@app.get("/customers/export")
+def export_customers(format: str = EXPORT_FORMAT) -> StreamingResponse:
+    return _export(crud.customers_export_statement, format, "clientes")
+
+
 @app.get("/customers/{customer_id}", response_model=schemas.Customer)
-def read_customer(customer_id: int, db: Session = Depends(get_db)) -> schemas.Customer:
-    db_customer = crud.get_customer(db, customer_id)
+async def read_customer(customer_id: int, db: AsyncSession = Depends(get_async_db)) -> schemas.Customer:
+    db_customer = await crud_async.get_customer(db, customer_id)
     if not db_customer:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found")
     try:
-        balance = crud.get_customer_balance(db, customer_id)
+        balance = (await crud_async.get_customer_balances(db, [db_customer.id])).get(db_customer.id, 0.0)
     except Exception:
         balance = 0.0
     # use pydantic schema to serialize and include balance_due
@@ -402,17 +553,17 @@ def read_customer(customer_id: int, db: Session = Depends(get_db)) -> schemas.Cu
 
 
 @app.put("/customers/{customer_id}", response_model=schemas.Customer)
-def update_customer(
+async def update_customer(
     customer_id: int,
     customer_update: schemas.CustomerUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> schemas.Customer:
-    db_customer = crud.get_customer(db, customer_id)
+    db_customer = await crud_async.get_customer(db, customer_id)
     if not db_customer:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found")
     # 'document' field removed from Customer model; no document uniqueness check.
 
-    return crud.update_customer(db, db_customer, customer_update)
+    return await crud_async.update_customer(db, db_customer, customer_update)
 
 
 @app.delete("/customers/{customer_id}", status_code=status.HTTP_200_OK)
@@ -425,26 +576,50 @@ def delete_customer(customer_id: int, db: Session = Depends(get_db)) -> None:
 
 # Vendas
 @app.post("/sales", response_model=schemas.Sale, status_code=status.HTTP_201_CREATED)
-def create_sale(sale: schemas.SaleCreate, db: Session = Depends(get_db)) -> schemas.Sale:
+async def create_sale(sale: schemas.SaleCreate, db: AsyncSession = Depends(get_async_db)) -> schemas.Sale:
     try:
-        return crud.create_sale(db, sale)
+        return await crud_async.create_sale(db, sale)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
 
 
+@app.post("/sales/bulk", response_model=schemas.SaleBulkResponse)
+def create_sales_bulk(payload: schemas.SaleBulkCreate, db: Session = Depends(get_db)) -> schemas.SaleBulkResponse:
+    """Import sales stored by an offline POS; each one carries a client idempotency key.
+
+    Sync on purpose: a large batch is CPU-bound planning plus one transaction, better kept in the
+    threadpool than on the event loop.
+    """
+    try:
+        results = crud.create_sales_bulk(db, payload.sales)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc)) from exc
+    counts = {"created": 0, "duplicate": 0, "error": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    return {
+        "created": counts["created"],
+        "duplicates": counts["duplicate"],
+        "errors": counts["error"],
+        "results": results,
+    }
+
+
 @app.post("/customer-payments", status_code=status.HTTP_201_CREATED)
 def create_customer_payment(payload: dict, db: Session = Depends(get_db)):
     """Register a payment from a customer and allocate to outstanding fiado sales.
 
-    Payload: { customer_id, amount, method, notes? }
+    Payload: { customer_id, amount, method, notes?, cashbox_id? }
     Returns: { payment: {id, customer_id, method, amount, notes, created_at}, allocations: [{sale_id, amount}], remaining }
     """
     try:
         customer_id = payload.get("customer_id")
         amount = payload.get("amount")
         method = payload.get("method")
-        result = crud.create_customer_payment(db, customer_id=customer_id, amount=amount, method=method)
+        result = crud.create_customer_payment(
+            db, customer_id=customer_id, amount=amount, method=method, cashbox_id=payload.get("cashbox_id")
+        )
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
@@ -457,6 +632,7 @@ def create_customer_payment(payload: dict, db: Session = Depends(get_db)):
         "customer_id": payment.customer_id,
         "method": str(payment.method),
         "amount": float(payment.amount),
+        "cashbox_id": payment.cashbox_id,
         "created_at": payment.created_at.isoformat(),
     }
 
@@ -465,45 +641,71 @@ def create_customer_payment(payload: dict, db: Session = Depends(get_db)):
 
 
 @app.get("/sales", response_model=List[schemas.Sale])
-def read_sales(
+async def read_sales(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
-    db: Session = Depends(get_db),
+    cursor: str | None = Query(None, description="Keyset cursor; send it empty for the first page"),
+    db: AsyncSession = Depends(get_async_db),
 ) -> List[schemas.Sale]:
-    return crud.list_sales(db, skip=skip, limit=limit)
+    try:
+        sales = await crud_async.list_sales(db, skip=skip, limit=limit, cursor=cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    if cursor is not None:
+        _set_next_page(request, response, next_cursor(sales, crud.SALE_PAGE_KEY, limit))
+    return sales
+
+
+@app.get("/sales/export")
+def export_sales(
+    format: str = EXPORT_FORMAT,
+    from_date: str | None = Query(None),
+    to_date: str | None = Query(None),
+    status_filter: schemas.SaleStatus | None = Query(None, alias="status"),
+) -> StreamingResponse:
+    return _export(
+        crud.sales_export_statement,
+        format,
+        "vendas",
+        from_date=from_date,
+        to_date=to_date,
+        status=status_filter.value if status_filter else None,
+    )
 
 
 @app.get("/sales/{sale_id}", response_model=schemas.Sale)
-def read_sale(sale_id: int, db: Session = Depends(get_db)) -> schemas.Sale:
-    db_sale = crud.get_sale(db, sale_id)
+async def read_sale(sale_id: int, db: AsyncSession = Depends(get_async_db)) -> schemas.Sale:
+    db_sale = await crud_async.get_sale(db, sale_id)
     if not db_sale:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sale not found")
     return db_sale
 
 
 @app.put("/sales/{sale_id}", response_model=schemas.Sale)
-def update_sale(
+async def update_sale(
     sale_id: int,
     sale_update: schemas.SaleUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> schemas.Sale:
-    db_sale = crud.get_sale(db, sale_id)
+    db_sale = await crud_async.get_sale(db, sale_id)
     if not db_sale:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sale not found")
     try:
-        return crud.update_sale(db, db_sale, sale_update)
+        return await crud_async.update_sale(db, db_sale, sale_update)
     except ValueError as exc:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
 
 
 @app.post("/sales/{sale_id}/cancel", response_model=schemas.Sale)
-def cancel_sale(sale_id: int, db: Session = Depends(get_db)) -> schemas.Sale:
-    db_sale = crud.get_sale(db, sale_id)
+async def cancel_sale(sale_id: int, db: AsyncSession = Depends(get_async_db)) -> schemas.Sale:
+    db_sale = await crud_async.get_sale(db, sale_id)
     if not db_sale:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sale not found")
     if db_sale.status.value == schemas.SaleStatus.CANCELLED.value:
         return db_sale
-    return crud.cancel_sale(db, db_sale)
+    return await crud_async.cancel_sale(db, db_sale)
 
 
 # Financeiro
@@ -526,7 +728,7 @@ def create_cashbox(payload: dict, db: Session = Depends(get_db)):
 @app.get("/cashboxes")
 def list_cashboxes(db: Session = Depends(get_db)):
     cbs = crud.list_cashboxes(db)
-    return [{"id": c.id, "name": c.name, "initial_amount": float(c.initial_amount), "opened_at": c.opened_at.isoformat() if c.opened_at else None, "closed_at": c.closed_at.isoformat() if c.closed_at else None, "closed_amount": float(c.closed_amount) if c.closed_amount is not None else None} for c in cbs]
+    return [{"id": c.id, "name": c.name, "initial_amount": float(c.initial_amount), "opened_at": c.opened_at.isoformat() if c.opened_at else None, "closed_at": c.closed_at.isoformat() if c.closed_at else None, "closed_amount": float(c.closed_amount) if c.closed_amount is not None else None, "cash_balance": float(c.cash_balance or 0)} for c in cbs]
 
 
 @app.post("/cashboxes/{cashbox_id}/open")
@@ -548,6 +750,54 @@ def close_cashbox(cashbox_id: int, payload: dict, db: Session = Depends(get_db))
     return {"id": cb.id, "closed_at": cb.closed_at.isoformat() if cb.closed_at else None, "closed_amount": float(cb.closed_amount) if cb.closed_amount is not None else None}
 
 
+@app.get("/cashboxes/{cashbox_id}/balance")
+def cashbox_balance(cashbox_id: int, db: Session = Depends(get_db)):
+    """Running expected cash of a cashbox (one row read; meant for polling the open-cashbox screen)."""
+    cb = crud.get_cashbox(db, cashbox_id)
+    if not cb:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cashbox not found")
+    return {
+        "id": cb.id,
+        "cash_balance": float(cb.cash_balance or 0),
+        "opened_at": cb.opened_at.isoformat() if cb.opened_at else None,
+        "closed_at": cb.closed_at.isoformat() if cb.closed_at else None,
+    }
+
+
+@app.get("/cashboxes/{cashbox_id}/events")
+async def cashbox_events_stream(
+    cashbox_id: int,
+    request: Request,
+    since: int | None = Query(None, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+) -> StreamingResponse:
+    """Server-Sent Events with the live cash balance of a cashbox.
+
+    Each `balance` event carries {seq, source, delta, cash_balance}. A client reconnecting with
+    Last-Event-ID (or ?since=) gets the events it missed from memory; otherwise, or when they are no
+    longer kept, the stream starts with a `snapshot` event read from the cashbox row.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    last_seq = since if since is not None else (int(last_event_id) if last_event_id and last_event_id.isdigit() else None)
+    # subscribe before reading the snapshot so no event falls between the two
+    queue, backlog, seq = cashbox_hub.subscribe(cashbox_id, last_seq)
+    try:
+        cb = await db.get(models.Cashbox, cashbox_id)
+        if not cb:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cashbox not found")
+        first = backlog
+        if first is None:
+            first = [{"type": "snapshot", "seq": seq, "cashbox_id": cb.id, "cash_balance": float(cb.cash_balance or 0)}]
+    except BaseException:
+        cashbox_hub.unsubscribe(cashbox_id, queue)
+        raise
+    return StreamingResponse(
+        sse_stream(cashbox_id, queue, first, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/cashboxes/{cashbox_id}/report")
 def cashbox_report(cashbox_id: int, db: Session = Depends(get_db)):
     try:
@@ -559,12 +809,38 @@ def cashbox_report(cashbox_id: int, db: Session = Depends(get_db)):
 
 @app.get("/financial-entries", response_model=List[schemas.FinancialEntry])
 def read_financial_entries(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
     type: str | None = Query(None),
+    cursor: str | None = Query(None, description="Keyset cursor; send it empty for the first page"),
     db: Session = Depends(get_db),
 ) -> List[schemas.FinancialEntry]:
-    return crud.list_financial_entries(db, skip=skip, limit=limit, type=type)
+    try:
+        entries = crud.list_financial_entries(db, skip=skip, limit=limit, type=type, cursor=cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    if cursor is not None:
+        _set_next_page(request, response, next_cursor(entries, crud.FINANCIAL_ENTRY_PAGE_KEY, limit))
+    return entries
+
+
+@app.get("/financial-entries/export")
+def export_financial_entries(
+    format: str = EXPORT_FORMAT,
+    from_date: str | None = Query(None),
+    to_date: str | None = Query(None),
+    type: schemas.EntryType | None = Query(None),
+) -> StreamingResponse:
+    return _export(
+        crud.financial_entries_export_statement,
+        format,
+        "financeiro",
+        from_date=from_date,
+        to_date=to_date,
+        type=type.value if type else None,
+    )
 
 
 @app.get("/financial-entries/{entry_id}", response_model=schemas.FinancialEntry)
@@ -595,11 +871,20 @@ def delete_financial_entry(entry_id: int, db: Session = Depends(get_db)) -> None
 # Categories endpoints
 @app.get("/categories", response_model=List[schemas.Category])
 def read_categories(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    cursor: str | None = Query(None, description="Keyset cursor; send it empty for the first page"),
     db: Session = Depends(get_db),
 ) -> List[schemas.Category]:
-    return crud.list_categories(db, skip=skip, limit=limit)
+    try:
+        categories = crud.list_categories(db, skip=skip, limit=limit, cursor=cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    if cursor is not None:
+        _set_next_page(request, response, next_cursor(categories, crud.CATEGORY_PAGE_KEY, limit))
+    return categories
 
 
 @app.post("/categories", response_model=schemas.Category, status_code=status.HTTP_201_CREATED)
@@ -607,12 +892,19 @@ def create_category(category: schemas.CategoryCreate, db: Session = Depends(get_
     return crud.create_category(db, category)
 
 
+# Diagnostico
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint() -> Response:
+    """Prometheus text exposition of request latencies, pools, threadpool and business counters."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 
-
-
-
-
-
-
-
+@app.get("/debug/profile")
+def debug_profile(
+    limit: int = Query(50, ge=1, le=query_profiler.HISTORY_SIZE),
+    min_queries: int = Query(0, ge=0),
+) -> List[dict]:
+    """Latest request profiles (statements, database time, slowest statements), newest first."""
+    if not query_profiler.settings.enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Query profiler disabled")
+    return query_profiler.recent_profiles(limit=limit, min_queries=min_queries)
@@ -1,10 +1,11 @@
 ﻿from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal
 from enum import Enum
 from typing import Dict, List
 
-from sqlalchemy import DateTime, Enum as SqlEnum, ForeignKey, Integer, Numeric, String, func
+from sqlalchemy import Date, DateTime, Enum as SqlEnum, ForeignKey, Index, Integer, Numeric, String, func
 from sqlalchemy import JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -76,6 +77,8 @@ class User(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    # composite index backing keyset pagination
+    __table_args__ = (Index("ix_products_name_id", "name", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -95,8 +98,9 @@ class Product(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), nullable=False, server_default=func.now()
     )
+    # indexed: max(updated_at) is the report cache's change watermark
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now()
+        DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now(), index=True
     )
 
     sale_items: Mapped[List["SaleItem"]] = relationship(back_populates="product")
@@ -104,6 +108,8 @@ class Product(Base):
 
 class Customer(Base):
     __tablename__ = "customers"
+    # composite index backing keyset pagination
+    __table_args__ = (Index("ix_customers_name_id", "name", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -128,6 +134,9 @@ class Cashbox(Base):
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     initial_amount: Mapped[Numeric] = mapped_column(Numeric(12, 2), nullable=False, default=0)
     closed_amount: Mapped[Numeric | None] = mapped_column(Numeric(12, 2), nullable=True)
+    # running expected cash (initial + cash payments/settlements + receitas - despesas), moved by
+    # crud on every write that touches this cashbox so the open-cashbox screen can poll one row
+    cash_balance: Mapped[Numeric] = mapped_column(Numeric(12, 2), nullable=False, default=0, server_default="0")
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
     opened_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     closed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -150,21 +159,34 @@ class PaymentMethod(str, Enum):
 
 class Sale(Base):
     __tablename__ = "sales"
+    __table_args__ = (
+        # composite index backing keyset pagination
+        Index("ix_sales_created_at_id", "created_at", "id"),
+        # report ranges: status = 'completed' AND created_at >= :from AND created_at < :to
+        Index("ix_sales_status_created_at", "status", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    customer_id: Mapped[int | None] = mapped_column(ForeignKey("customers.id"), nullable=True)
+    customer_id: Mapped[int | None] = mapped_column(ForeignKey("customers.id"), nullable=True, index=True)
     status: Mapped[SaleStatus] = mapped_column(
         SqlEnum(SaleStatus, native_enum=False, values_callable=lambda enum: [e.value for e in enum]),
         nullable=False,
         default=SaleStatus.COMPLETED,
     )
     total_amount: Mapped[Numeric] = mapped_column(Numeric(12, 2), nullable=False, default=0)
+    # fiado ledger: sum of FIADO payments and of customer payment allocations for this sale,
+    # maintained on write so the remaining fiado can be read without aggregating
+    fiado_total: Mapped[Numeric] = mapped_column(Numeric(12, 2), nullable=False, default=0, server_default="0")
+    fiado_allocated: Mapped[Numeric] = mapped_column(Numeric(12, 2), nullable=False, default=0, server_default="0")
     notes: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    # client-generated key of sales replayed by an offline POS (POST /sales/bulk)
+    idempotency_key: Mapped[str | None] = mapped_column(String(100), nullable=True, unique=True, index=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), nullable=False, server_default=func.now()
     )
+    # indexed: max(updated_at) is the report cache's change watermark
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now()
+        DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now(), index=True
     )
 
     customer: Mapped[Customer | None] = relationship(back_populates="sales")
@@ -175,16 +197,34 @@ class Sale(Base):
         back_populates="sale", cascade="all, delete-orphan", passive_deletes=True
     )
 
+    def recompute_fiado_total(self) -> None:
+        """Refresh fiado_total from the payments currently attached to this sale."""
+        self.fiado_total = sum(
+            (Decimal(p.amount or 0) for p in self.payments if p.method == PaymentMethod.FIADO),
+            Decimal("0"),
+        )
+
 
 class SaleItem(Base):
     __tablename__ = "sale_items"
+    __table_args__ = (
+        # per-product report aggregates read quantity/line_total from the index alone on Postgres
+        Index(
+            "ix_sale_items_product_id_sale_id",
+            "product_id",
+            "sale_id",
+            postgresql_include=["quantity", "line_total"],
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    sale_id: Mapped[int] = mapped_column(ForeignKey("sales.id", ondelete="CASCADE"), nullable=False)
+    sale_id: Mapped[int] = mapped_column(ForeignKey("sales.id", ondelete="CASCADE"), nullable=False, index=True)
     product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), nullable=False)
     quantity: Mapped[int] = mapped_column(Integer, nullable=False)
     unit_price: Mapped[Numeric] = mapped_column(Numeric(10, 2), nullable=False)
     line_total: Mapped[Numeric] = mapped_column(Numeric(12, 2), nullable=False)
+    # products.cost_price when the item was recorded; later cost changes do not touch past sales
+    unit_cost: Mapped[Numeric] = mapped_column(Numeric(10, 2), nullable=False, default=0, server_default="0")
 
     sale: Mapped[Sale] = relationship(back_populates="items")
     product: Mapped[Product] = relationship(back_populates="sale_items")
@@ -194,17 +234,36 @@ class SalePayment(Base):
     __tablename__ = "sale_payments"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    sale_id: Mapped[int] = mapped_column(ForeignKey("sales.id", ondelete="CASCADE"), nullable=False)
+    sale_id: Mapped[int] = mapped_column(ForeignKey("sales.id", ondelete="CASCADE"), nullable=False, index=True)
     method: Mapped[PaymentMethod] = mapped_column(
         SqlEnum(PaymentMethod, native_enum=False, values_callable=lambda enum: [e.value for e in enum]),
         nullable=False,
     )
     amount: Mapped[Numeric] = mapped_column(Numeric(12, 2), nullable=False)
     notes: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    # cashbox open when the payment was taken, and when it was taken
+    cashbox_id: Mapped[int | None] = mapped_column(ForeignKey("cashboxes.id"), nullable=True, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
 
     sale: Mapped[Sale] = relationship(back_populates="payments")
 
 
+class DailyProductSales(Base):
+    """Per-day, per-product totals of completed sales, maintained by crud on every sale write.
+
+    cost is quantity x sale_items.unit_cost, the product cost stored with each item when the sale
+    was recorded, so removing a sale takes out exactly what adding it put in.
+    """
+
+    __tablename__ = "daily_product_sales"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), primary_key=True, index=True)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    revenue: Mapped[Numeric] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    cost: Mapped[Numeric] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+
+
 class CustomerPayment(Base):
     __tablename__ = "customer_payments"
 
@@ -215,6 +274,7 @@ class CustomerPayment(Base):
         nullable=False,
     )
     amount: Mapped[Numeric] = mapped_column(Numeric(12, 2), nullable=False)
+    cashbox_id: Mapped[int | None] = mapped_column(ForeignKey("cashboxes.id"), nullable=True, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
 
     customer: Mapped[Customer] = relationship()
@@ -226,7 +286,7 @@ class CustomerPaymentAllocation(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     payment_id: Mapped[int] = mapped_column(ForeignKey("customer_payments.id", ondelete="CASCADE"), nullable=False)
-    sale_id: Mapped[int] = mapped_column(ForeignKey("sales.id", ondelete="CASCADE"), nullable=False)
+    sale_id: Mapped[int] = mapped_column(ForeignKey("sales.id", ondelete="CASCADE"), nullable=False, index=True)
     amount: Mapped[Numeric] = mapped_column(Numeric(12, 2), nullable=False)
 
     payment: Mapped[CustomerPayment] = relationship(back_populates="allocations")
@@ -241,6 +301,8 @@ class EntryType(str, Enum):
 
 class FinancialEntry(Base):
     __tablename__ = "financial_entries"
+    # composite index backing keyset pagination
+    __table_args__ = (Index("ix_financial_entries_date_id", "date", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     date: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
@@ -251,12 +313,13 @@ class FinancialEntry(Base):
     category: Mapped[str] = mapped_column(String(100), nullable=False)
     amount: Mapped[Numeric] = mapped_column(Numeric(12, 2), nullable=False)
     notes: Mapped[str | None] = mapped_column(String(500), nullable=True)
-    cashbox_id: Mapped[int | None] = mapped_column(ForeignKey("cashboxes.id"), nullable=True)
+    cashbox_id: Mapped[int | None] = mapped_column(ForeignKey("cashboxes.id"), nullable=True, index=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), nullable=False, server_default=func.now()
     )
+    # indexed: max(updated_at) is the report cache's change watermark
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now()
+        DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now(), index=True
     )
 
     cashbox: Mapped[Cashbox | None] = relationship(back_populates="entries")
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Sequence
+
+from sqlalchemy import func, literal, tuple_
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key of the last row of a page as an opaque, url-safe token."""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> list[Any]:
+    """Decode a token produced by encode_cursor back into values typed after `columns`.
+
+    Raises ValueError when the token is malformed or does not match the sort key.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except Exception as exc:
+        raise ValueError("Cursor invalido.") from exc
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError("Cursor invalido.")
+    out = []
+    for column, value in zip(columns, values):
+        if value is not None and column.type.python_type is datetime:
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError) as exc:
+                raise ValueError("Cursor invalido.") from exc
+        out.append(value)
+    return out
+
+
+def _sort_expression(column: Any, dialect_name: str | None):
+    # SQLite keeps timestamps as text in two shapes (CURRENT_TIMESTAMP has no microseconds,
+    # SQLAlchemy binds include them), so compare them numerically there.
+    if dialect_name == "sqlite" and column.type.python_type is datetime:
+        return func.julianday(column)
+    return column
+
+
+def keyset_page(
+    query,
+    columns: Sequence[Any],
+    cursor: str,
+    limit: int,
+    descending: bool = False,
+    dialect_name: str | None = None,
+):
+    """Apply keyset ordering, the "after cursor" predicate and the limit to a Query/Select.
+
+    An empty cursor means the first page. The row-value comparison lets the database walk the
+    matching composite index instead of counting past `offset` rows. `dialect_name` is taken from
+    the Query's session when not given.
+    """
+    if dialect_name is None and getattr(query, "session", None) is not None:
+        dialect_name = query.session.get_bind().dialect.name
+    keys = [_sort_expression(c, dialect_name) for c in columns]
+    query = query.order_by(*[k.desc() if descending else k.asc() for k in keys])
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        bounds = [
+            _sort_expression(literal(v, type_=c.type), dialect_name) for c, v in zip(columns, values)
+        ]
+        key, bound = tuple_(*keys), tuple_(*bounds)
+        query = query.filter(key < bound if descending else key > bound)
+    return query.limit(limit)
+
+
+def next_cursor(rows: Sequence[Any], columns: Sequence[Any], limit: int) -> str | None:
+    """Return the cursor for the page after `rows`, or None when this was the last page."""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor([getattr(last, c.key) for c in columns])
@@ -8,6 +8,8 @@ from typing import Dict, List, Optional
 from pydantic import BaseModel, ConfigDict, Field, computed_field, field_serializer, field_validator
 import re
 
+from app.services.image_processing import derivative_paths
+
 
 class ProductBase(BaseModel):
     name: str = Field(..., max_length=255)
@@ -155,6 +157,12 @@ class Product(ProductBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+    @computed_field
+    @property
+    def photo_variants(self) -> List[Dict[str, str]]:
+        """Per photo: the original URL plus the 128/512/1024 derivatives served next to it."""
+        return [{"original": path, **derivative_paths(path)} for path in self.photos]
+
     @field_serializer("cost_price", "sale_price", mode="plain")
     def serialize_decimal(self, value: Decimal) -> float:
         return float(value)
@@ -168,6 +176,20 @@ class Product(ProductBase):
         return float(value)
 
 
+class ProductSearchResult(BaseModel):
+    id: int
+    name: str
+    sku: str
+    sale_price: Decimal
+    stock: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_serializer("sale_price", mode="plain")
+    def serialize_price(self, value: Decimal) -> float:
+        return float(value)
+
+
 class CustomerBase(BaseModel):
     name: str = Field(..., max_length=255)
     # ...campo 'document' removido...
@@ -245,6 +267,7 @@ class SalePaymentCreate(SalePaymentBase):
 
 class SalePayment(SalePaymentBase):
     id: int
+    cashbox_id: Optional[int] = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -261,7 +284,8 @@ class SaleBase(BaseModel):
 
 
 class SaleCreate(SaleBase):
-    pass
+    # cashbox receiving the payments; defaults to the cashbox currently open
+    cashbox_id: Optional[int] = Field(None, gt=0)
 
 
 class SaleUpdate(BaseModel):
@@ -310,6 +334,31 @@ class Sale(SaleBase):
         )
 
 
+class SaleBulkItem(SaleCreate):
+    # generated by the POS when the sale is rung up; replaying the same key never creates a second sale
+    idempotency_key: str = Field(..., min_length=1, max_length=100)
+    # when the sale happened offline; defaults to the time it is received
+    created_at: Optional[datetime] = None
+
+
+class SaleBulkCreate(BaseModel):
+    sales: List[SaleBulkItem] = Field(..., min_length=1, max_length=5000)
+
+
+class SaleBulkResult(BaseModel):
+    idempotency_key: str
+    # created | duplicate (already imported, sale_id is the existing sale) | error
+    status: str
+    sale_id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class SaleBulkResponse(BaseModel):
+    created: int
+    duplicates: int
+    errors: int
+    results: List[SaleBulkResult]
+
 
 class EntryType(str, Enum):
     RECEITA = "receita"
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from collections import deque
+from typing import AsyncIterator
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# events kept per cashbox for clients resuming with Last-Event-ID
+HISTORY_SIZE = 500
+# events buffered per subscriber before it is told to resync
+SUBSCRIBER_BUFFER = 1000
+KEEPALIVE_SECONDS = 15.0
+
+_PENDING_KEY = "cashbox_events"
+
+
+class _Channel:
+    __slots__ = ("seq", "history", "subscribers")
+
+    def __init__(self) -> None:
+        self.seq = 0
+        self.history: deque[dict] = deque(maxlen=HISTORY_SIZE)
+        self.subscribers: set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+
+
+class CashboxHub:
+    """In-memory fan-out of cashbox balance events to live subscribers (SSE streams).
+
+    Every event gets a per-cashbox sequence number; the last HISTORY_SIZE events are kept so a client
+    reconnecting with the last sequence it saw receives what it missed without touching the database.
+    The hub lives in the worker process: with several workers, terminals watching a cashbox must reach
+    the worker that records its sales (or run a single worker).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._channels: dict[int, _Channel] = {}
+
+    def _channel(self, cashbox_id: int) -> _Channel:
+        channel = self._channels.get(cashbox_id)
+        if channel is None:
+            channel = self._channels[cashbox_id] = _Channel()
+        return channel
+
+    def publish(self, cashbox_id: int, payload: dict) -> dict:
+        """Record an event and hand it to every subscriber; safe to call from any thread."""
+        with self._lock:
+            channel = self._channel(cashbox_id)
+            channel.seq += 1
+            item = {"seq": channel.seq, "cashbox_id": cashbox_id, **payload}
+            channel.history.append(item)
+            subscribers = list(channel.subscribers)
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(_deliver, queue, item)
+        return item
+
+    def subscribe(self, cashbox_id: int, last_seq: int | None = None) -> tuple[asyncio.Queue, list[dict] | None, int]:
+        """Register a subscriber on the running loop.
+
+        Returns (queue, backlog, seq): the events after `last_seq` when they are all still in history
+        (None when the client must start from a snapshot) and the current sequence number.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_BUFFER)
+        with self._lock:
+            channel = self._channel(cashbox_id)
+            channel.subscribers.add((asyncio.get_running_loop(), queue))
+            backlog = None
+            if last_seq is not None and last_seq <= channel.seq:
+                oldest = channel.history[0]["seq"] if channel.history else channel.seq + 1
+                if last_seq + 1 >= oldest:
+                    backlog = [item for item in channel.history if item["seq"] > last_seq]
+            return queue, backlog, channel.seq
+
+    def unsubscribe(self, cashbox_id: int, queue: asyncio.Queue) -> None:
+        with self._lock:
+            channel = self._channels.get(cashbox_id)
+            if channel is not None:
+                channel.subscribers = {sub for sub in channel.subscribers if sub[1] is not queue}
+
+
+def _deliver(queue: asyncio.Queue, item: dict) -> None:
+    try:
+        queue.put_nowait(item)
+    except asyncio.QueueFull:
+        # too far behind: drop the buffer and have the client reload a snapshot
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait({"type": "resync", "seq": item["seq"]})
+
+
+hub = CashboxHub()
+
+
+def queue_event(db: Session, cashbox_id: int, payload: dict) -> None:
+    """Publish `payload` for `cashbox_id` once the session's transaction commits (dropped on rollback)."""
+    db.info.setdefault(_PENDING_KEY, []).append((cashbox_id, payload))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session: Session) -> None:
+    for cashbox_id, payload in session.info.pop(_PENDING_KEY, []):
+        hub.publish(cashbox_id, payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rolled_back(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _sse(item: dict, event_name: str = "balance") -> str:
+    return f"id: {item['seq']}\nevent: {event_name}\ndata: {json.dumps(item)}\n\n"
+
+
+async def sse_stream(
+    cashbox_id: int, queue: asyncio.Queue, first: list[dict], is_disconnected
+) -> AsyncIterator[str]:
+    """Server-Sent Events for one subscriber: `first` (snapshot or backlog), then live events."""
+    try:
+        for item in first:
+            yield _sse(item, item.get("type", "balance"))
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            yield _sse(item, item.get("type", "balance"))
+    finally:
+        hub.unsubscribe(cashbox_id, queue)
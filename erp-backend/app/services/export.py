@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Iterator
+
+from fastapi.responses import StreamingResponse
+
+from app.database import SessionLocal
+
+EXPORT_FORMATS = ("csv", "xlsx", "jsonl")
+# rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 2000
+# rows serialized before a chunk is handed to the client
+_FLUSH_ROWS = 500
+# data rows per xlsx sheet: 1,048,576 rows per sheet, one of them the header
+XLSX_SHEET_ROWS = 1_048_575
+
+_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+class ExportError(ValueError):
+    """Raised when an export cannot be produced (unknown format, missing optional dependency)."""
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _json_value(value: Any) -> Any:
+    value = _plain(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def iter_rows(statement) -> Iterator[Any]:
+    """Run `statement` on its own session through a server-side cursor and yield its column names, then rows.
+
+    The session is opened here rather than taken from a request dependency because the rows are
+    consumed while the response streams, after the request scope (and its session) is gone.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(statement.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE))
+        yield list(result.keys())
+        for partition in result.partitions():
+            yield from partition
+    finally:
+        db.close()
+
+
+def _csv_chunks(rows: Iterator) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so spreadsheet apps open accented text as UTF-8
+    buffer.write("\ufeff")
+    writer.writerow(next(rows))
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_plain(v) for v in row])
+        if count % _FLUSH_ROWS == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def _jsonl_chunks(rows: Iterator) -> Iterator[bytes]:
+    columns = next(rows)
+    lines: list[str] = []
+    for row in rows:
+        lines.append(json.dumps({c: _json_value(v) for c, v in zip(columns, row)}, ensure_ascii=False))
+        if len(lines) >= _FLUSH_ROWS:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines.clear()
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _xlsx_chunks(rows: Iterator) -> Iterator[bytes]:
+    from openpyxl import Workbook
+
+    # write-only workbooks keep rows in a temp file; the zip is assembled on save into a spool
+    workbook = Workbook(write_only=True)
+    header = next(rows)
+    for count, row in enumerate(rows):
+        if count % XLSX_SHEET_ROWS == 0:
+            # past the sheet row limit the rows continue on a new sheet, under the same header
+            sheet = workbook.create_sheet()
+            sheet.append(header)
+        sheet.append([_plain(v) for v in row])
+    if not workbook.worksheets:
+        workbook.create_sheet().append(header)
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+        workbook.save(spool)
+        spool.seek(0)
+        while chunk := spool.read(64 * 1024):
+            yield chunk
+
+
+_WRITERS: dict[str, Callable[[Iterator], Iterator[bytes]]] = {
+    "csv": _csv_chunks,
+    "jsonl": _jsonl_chunks,
+    "xlsx": _xlsx_chunks,
+}
+
+
+def export_response(statement, fmt: str, filename: str) -> StreamingResponse:
+    """StreamingResponse serializing every row of `statement` as csv, xlsx or jsonl."""
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"Formato de exportacao invalido: {fmt}.")
+    if fmt == "xlsx":
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError as exc:
+            raise ExportError("Exportacao xlsx requer o pacote openpyxl.") from exc
+    return StreamingResponse(
+        _WRITERS[fmt](iter_rows(statement)),
+        media_type=_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
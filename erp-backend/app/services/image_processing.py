@@ -1,5 +1,12 @@
 ﻿from __future__ import annotations
 
+import asyncio
+import multiprocessing
+import os
+import time
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
 from pathlib import Path
 from typing import Iterable
@@ -8,10 +15,15 @@ from uuid import uuid4
 from fastapi import UploadFile
 from PIL import Image
 
+from app.services import metrics
+
 MEDIA_ROOT = Path(__file__).resolve().parent.parent / "data" / "product_photos"
 MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
 
 WEBP_QUALITY = 85
+# longest-side sizes of the downscaled copies written next to every photo (thumbnails, grid, zoom)
+DERIVATIVE_SIZES: tuple[int, ...] = (128, 512, 1024)
+PUBLIC_PREFIX = "/media/products/"
 ALLOWED_CONTENT_TYPES: set[str] = {
     "image/jpeg",
     "image/png",
@@ -19,6 +31,22 @@ ALLOWED_CONTENT_TYPES: set[str] = {
     "image/jpg",
 }
 
+# Decode/encode/write runs in a process pool so a large upload never blocks the event loop.
+# IMAGE_WORKERS=0 falls back to the default thread pool (useful for constrained dev boxes).
+# IMAGE_QUEUE_DEPTH bounds how many conversions may wait for a free worker; further callers
+# wait for a slot instead of piling raw image bytes into the pool's unbounded queue.
+try:
+    IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", str(min(2, os.cpu_count() or 1))))
+except Exception:
+    IMAGE_WORKERS = 1
+try:
+    IMAGE_QUEUE_DEPTH = int(os.environ.get("IMAGE_QUEUE_DEPTH", "8"))
+except Exception:
+    IMAGE_QUEUE_DEPTH = 8
+
+_executor: Executor | None = None
+_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
 
 class ImageProcessingError(RuntimeError):
     """Raised when an uploaded image cannot be processed."""
@@ -29,49 +57,142 @@ def _path_from_public(public_path: str) -> Path:
     return MEDIA_ROOT / filename
 
 
-async def convert_upload_to_webp(upload: UploadFile, *, prefix: str) -> str:
-    """Convert an uploaded image to WEBP and persist it on disk."""
-    if upload.content_type not in ALLOWED_CONTENT_TYPES:
-        raise ImageProcessingError("Formato de arquivo nao suportado.")
+def derivative_filename(filename: str, size: int) -> str:
+    """Name of the `size` derivative of a stored photo: product-1-<hex>.webp -> product-1-<hex>-w128.webp."""
+    stem = filename[: -len(".webp")] if filename.endswith(".webp") else filename
+    return f"{stem}-w{size}.webp"
+
+
+def is_derivative_filename(filename: str) -> bool:
+    return any(filename.endswith(f"-w{size}.webp") for size in DERIVATIVE_SIZES)
+
+
+def derivative_paths(public_path: str) -> dict[str, str]:
+    """Public URLs of the derivatives of a stored photo, keyed by size ({} for external URLs)."""
+    if not public_path or not public_path.startswith(PUBLIC_PREFIX):
+        return {}
+    filename = public_path.split("/")[-1]
+    return {str(size): PUBLIC_PREFIX + derivative_filename(filename, size) for size in DERIVATIVE_SIZES}
+
+
+def _get_executor() -> Executor | None:
+    global _executor
+    if IMAGE_WORKERS <= 0:
+        return None
+    if _executor is None:
+        # spawn: forking a process that already runs uvicorn/DB threads is not safe
+        _executor = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def _get_slots() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    slots = _slots.get(loop)
+    if slots is None:
+        slots = asyncio.Semaphore(max(IMAGE_WORKERS, 1) + max(IMAGE_QUEUE_DEPTH, 0))
+        _slots[loop] = slots
+    return slots
+
+
+def shutdown_image_pool() -> None:
+    """Stop the conversion workers (called on application shutdown)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
 
-    raw_bytes = await upload.read()
-    if not raw_bytes:
-        raise ImageProcessingError("Arquivo de imagem vazio.")
 
+def _write_derivatives(image: Image.Image, destination: Path, sizes: Iterable[int]) -> None:
+    for size in sizes:
+        copy = image.copy()
+        # thumbnail() only ever shrinks, so small originals are stored as-is under every size
+        copy.thumbnail((size, size), Image.Resampling.LANCZOS)
+        copy.save(destination.with_name(derivative_filename(destination.name, size)), format="WEBP", quality=WEBP_QUALITY, method=4)
+
+
+def _remove_with_derivatives(destination: Path) -> None:
+    destination.unlink(missing_ok=True)
+    for size in DERIVATIVE_SIZES:
+        destination.with_name(derivative_filename(destination.name, size)).unlink(missing_ok=True)
+
+
+def _encode_webp_file(raw_bytes: bytes, destination: str) -> None:
+    """Decode an image, write it as WEBP plus its derivatives to `destination` (runs in a worker)."""
+    target = Path(destination)
     try:
         with Image.open(BytesIO(raw_bytes)) as source:
             if source.mode in {"RGBA", "P"}:
                 image = source.convert("RGBA")
             else:
                 image = source.convert("RGB")
-
-            buffer = BytesIO()
-            image.save(buffer, format="WEBP", quality=WEBP_QUALITY, method=6)
-            buffer.seek(0)
+            image.save(target, format="WEBP", quality=WEBP_QUALITY, method=6)
+            _write_derivatives(image, target, DERIVATIVE_SIZES)
     except Exception as exc:  # Pillow may raise multiple exception types
+        _remove_with_derivatives(target)
         raise ImageProcessingError("Nao foi possivel processar a imagem enviada.") from exc
+
+
+def generate_missing_derivatives(stored: Path) -> int:
+    """Write the derivatives missing for an already stored photo; returns how many were created."""
+    missing = [
+        size for size in DERIVATIVE_SIZES
+        if not stored.with_name(derivative_filename(stored.name, size)).exists()
+    ]
+    if not missing:
+        return 0
+    with Image.open(stored) as source:
+        image = source.convert("RGBA" if source.mode in {"RGBA", "P"} else "RGB")
+        _write_derivatives(image, stored, missing)
+    return len(missing)
+
+
+async def convert_upload_to_webp(upload: UploadFile, *, prefix: str) -> str:
+    """Convert an uploaded image to WEBP and persist it on disk."""
+    if upload.content_type not in ALLOWED_CONTENT_TYPES:
+        raise ImageProcessingError("Formato de arquivo nao suportado.")
+
+    try:
+        raw_bytes = await upload.read()
     finally:
         await upload.close()
+    if not raw_bytes:
+        raise ImageProcessingError("Arquivo de imagem vazio.")
 
     filename = f"{prefix}-{uuid4().hex}.webp"
     destination = MEDIA_ROOT / filename
-    with destination.open("wb") as output:
-        output.write(buffer.getvalue())
+
+    global _executor
+    async with _get_slots():
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            await loop.run_in_executor(_get_executor(), _encode_webp_file, raw_bytes, str(destination))
+            outcome = "ok"
+        except BrokenProcessPool as exc:
+            # a worker died (e.g. OOM on a huge image); start a fresh pool on the next upload
+            _executor = None
+            _remove_with_derivatives(destination)
+            raise ImageProcessingError("Nao foi possivel processar a imagem enviada.") from exc
+        finally:
+            metrics.image_conversion_duration.observe(time.perf_counter() - started, outcome=outcome)
 
     return f"/media/products/{filename}"
 
 
 async def convert_many_to_webp(uploads: Iterable[UploadFile], *, prefix: str) -> list[str]:
-    saved_paths: list[str] = []
-    try:
-        for upload in uploads:
-            saved_paths.append(await convert_upload_to_webp(upload, prefix=prefix))
-    except Exception:
-        for public_path in saved_paths:
-            stored = _path_from_public(public_path)
-            if stored.exists():
-                stored.unlink(missing_ok=True)
-        raise
+    """Convert the files of one request in parallel; on any failure remove the ones already saved."""
+    results = await asyncio.gather(
+        *(convert_upload_to_webp(upload, prefix=prefix) for upload in uploads),
+        return_exceptions=True,
+    )
+    saved_paths = [r for r in results if isinstance(r, str)]
+    failure = next((r for r in results if isinstance(r, BaseException)), None)
+    if failure is not None:
+        remove_product_photos(saved_paths)
+        raise failure
     return saved_paths
 
 
@@ -80,9 +201,7 @@ def remove_product_photos(paths: Iterable[str]) -> None:
         if not public_path:
             continue
         try:
-            file_path = _path_from_public(public_path)
-            if file_path.exists():
-                file_path.unlink()
+            _remove_with_derivatives(_path_from_public(public_path))
         except OSError:
             continue
 
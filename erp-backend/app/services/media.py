@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import os
+import re
+from email.utils import formatdate
+from mimetypes import guess_type
+from typing import Mapping
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Receive, Scope, Send
+
+# Stored photos are named product-<id>-<uuid4 hex>.webp (plus -w<size> derivatives), so a URL never
+# changes content: browsers and proxies may keep them for a year without revalidating.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Optional precompressed sidecars (<file>.br / <file>.gz) for compressible media; WebP gains nothing.
+PRECOMPRESSED_ENCODINGS: tuple[tuple[str, str], ...] = (("br", ".br"), ("gzip", ".gz"))
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def media_etag(filename: str) -> str:
+    """Strong ETag for an immutable media file: its (unique) name is its version."""
+    return f'"{filename}"'
+
+
+def _etag_matches(if_none_match: str, *etags: str) -> bool:
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # weak comparison is the rule for If-None-Match
+    tags = [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+    return "*" in tags or any(etag in tags for etag in etags)
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Parse a single `bytes=` range into inclusive (start, end) offsets.
+
+    Returns None when the header should be ignored (multiple ranges or unknown unit; the full file is
+    served), and raises ValueError when it is unsatisfiable.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("unsatisfiable range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("unsatisfiable range")
+    return start, min(end, size - 1)
+
+
+class RangeFileResponse(FileResponse):
+    """FileResponse that sends only bytes [start, end] of the file with a 206 status."""
+
+    def __init__(self, path, start: int, end: int, size: int, headers: Mapping[str, str], **kwargs) -> None:
+        super().__init__(path, status_code=206, headers=headers, **kwargs)
+        self.start = start
+        self.end = end
+        self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # file shrank underneath us; close the body so the client does not hang
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class MediaFiles(StaticFiles):
+    """StaticFiles for content-addressed media (product photos).
+
+    On top of plain StaticFiles it sends immutable Cache-Control, a strong ETag taken from the file
+    name, honours If-None-Match / If-Range / single byte ranges, and can hand the transfer to the
+    front proxy (`sendfile_header`, e.g. X-Accel-Redirect with `sendfile_prefix` pointing at an
+    internal nginx location) or serve precompressed .br/.gz sidecars when `precompressed` is set.
+    HEAD is answered from the stat result without opening the file.
+    """
+
+    def __init__(
+        self,
+        *args,
+        precompressed: bool = False,
+        sendfile_header: str | None = None,
+        sendfile_prefix: str = "",
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.precompressed = precompressed
+        self.sendfile_header = sendfile_header
+        self.sendfile_prefix = sendfile_prefix
+
+    def _base_headers(self, stat_result: os.stat_result, etag: str) -> dict[str, str]:
+        return {
+            "cache-control": IMMUTABLE_CACHE_CONTROL,
+            "etag": etag,
+            "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+            "accept-ranges": "bytes",
+        }
+
+    def _precompressed_variant(self, full_path: str, request_headers: Headers) -> tuple[str, str, os.stat_result] | None:
+        accepted = {part.split(";")[0].strip().lower() for part in request_headers.get("accept-encoding", "").split(",")}
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            if encoding not in accepted:
+                continue
+            try:
+                stat_result = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            return encoding, suffix, stat_result
+        return None
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        full_path = str(full_path)
+        request_headers = Headers(scope=scope)
+        filename = os.path.basename(full_path)
+        etag = media_etag(filename)
+        headers = self._base_headers(stat_result, etag)
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            # If-None-Match wins over If-Modified-Since (RFC 9110 13.2.2)
+            # a cached precompressed copy is just as fresh as the identity one
+            if _etag_matches(if_none_match, etag, *(media_etag(filename + suffix) for _, suffix in PRECOMPRESSED_ENCODINGS)):
+                return Response(status_code=304, headers=headers)
+        elif self.is_not_modified(Headers(headers), request_headers):
+            return Response(status_code=304, headers=headers)
+
+        if self.sendfile_header:
+            # the proxy streams the file (and handles ranges) from its internal location
+            headers[self.sendfile_header] = self.sendfile_prefix + filename
+            headers["content-length"] = "0"
+            return Response(status_code=status_code, headers=headers, media_type=self._media_type(filename))
+
+        range_header = request_headers.get("range")
+        if range_header and status_code == 200:
+            if_range = request_headers.get("if-range")
+            if if_range is None or if_range.strip() == etag:
+                try:
+                    byte_range = parse_range(range_header, stat_result.st_size)
+                except ValueError:
+                    headers["content-range"] = f"bytes */{stat_result.st_size}"
+                    return Response(status_code=416, headers=headers)
+                if byte_range is not None:
+                    start, end = byte_range
+                    return RangeFileResponse(
+                        full_path,
+                        start,
+                        end,
+                        stat_result.st_size,
+                        headers=headers,
+                        stat_result=stat_result,
+                        media_type=self._media_type(filename),
+                    )
+
+        if self.precompressed:
+            variant = self._precompressed_variant(full_path, request_headers)
+            if variant is not None:
+                encoding, suffix, variant_stat = variant
+                headers["etag"] = media_etag(filename + suffix)
+                headers["content-encoding"] = encoding
+                headers["vary"] = "Accept-Encoding"
+                # ranges over the encoded bytes are not offered for sidecars
+                headers.pop("accept-ranges")
+                return FileResponse(
+                    full_path + suffix,
+                    status_code=status_code,
+                    headers=headers,
+                    stat_result=variant_stat,
+                    media_type=self._media_type(filename),
+                )
+            headers["vary"] = "Accept-Encoding"
+
+        return FileResponse(
+            full_path,
+            status_code=status_code,
+            headers=headers,
+            stat_result=stat_result,
+            media_type=self._media_type(filename),
+        )
+
+    @staticmethod
+    def _media_type(filename: str) -> str:
+        return guess_type(filename)[0] or "application/octet-stream"
@@ -0,0 +1,253 @@
+# In-process metrics rendered in the Prometheus text exposition format (GET /metrics).
+# Counters and histograms are updated where things happen; gauges are read at scrape time. Nothing
+# is pushed anywhere, so the same code runs in tests and local runs. Values are per worker process.
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Iterable
+
+import anyio.to_thread
+from sqlalchemy.engine import Engine
+
+# seconds; HTTP and image conversion latencies
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry: list["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.help}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(f"{line}\n" for line in self.samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames:
+            items = [((), 0)]
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [per-bucket counts (last one is +Inf), sum]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+    def time(self, **labels) -> "_Timer":
+        return _Timer(self, labels)
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict) -> None:
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class GaugeCallback(_Metric):
+    """Gauge whose samples are produced at scrape time by `collect` as (label values, value) pairs."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], Iterable[tuple[tuple[str, ...], float]]],
+        labelnames: tuple[str, ...] = (),
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.collect = collect
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in self.collect()]
+
+
+def render() -> str:
+    """Every registered metric in the text exposition format."""
+    return "".join(metric.render() for metric in _registry)
+
+
+# HTTP
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time to serve a request (until the response body is sent), by route template.",
+    ("method", "route", "status"),
+)
+
+# Imagens
+image_conversion_duration = Histogram(
+    "image_conversion_duration_seconds",
+    "Time to convert one uploaded image to WEBP with its derivatives, excluding the wait for a worker slot.",
+    ("outcome",),
+)
+
+# Negocio
+sales_created = Counter("sales_created_total", "Sales recorded.", ("source",))
+sales_cancelled = Counter("sales_cancelled_total", "Completed sales cancelled.")
+fiado_allocations = Counter("fiado_allocations_total", "Customer payment allocations to fiado sales.")
+fiado_allocated_amount = Counter("fiado_allocated_amount_total", "Amount of customer payments allocated to fiado sales.")
+
+
+def _threadpool_samples(field: str) -> list[tuple[tuple[str, ...], float]]:
+    try:
+        limiter = anyio.to_thread.current_default_thread_limiter()
+    except RuntimeError:
+        # not on the event loop (rendered from a worker thread or a script)
+        return []
+    stats = limiter.statistics()
+    return [((), {"busy": stats.borrowed_tokens, "max": limiter.total_tokens, "waiting": stats.tasks_waiting}[field])]
+
+
+GaugeCallback("threadpool_busy_threads", "Threadpool tokens in use by sync routes and run_in_threadpool calls.", lambda: _threadpool_samples("busy"))
+GaugeCallback("threadpool_max_threads", "Threadpool size (anyio default limiter).", lambda: _threadpool_samples("max"))
+GaugeCallback("threadpool_waiting_tasks", "Calls waiting for a free threadpool token.", lambda: _threadpool_samples("waiting"))
+
+
+def instrument_pools(engines: dict[str, Engine]) -> None:
+    """Connection pool gauges for `engines` (name -> sync Engine); pools without sizing (NullPool) are skipped."""
+
+    def collect(method: str) -> Callable[[], list]:
+        def samples() -> list[tuple[tuple[str, ...], float]]:
+            return [
+                ((name,), getattr(engine.pool, method)())
+                for name, engine in engines.items()
+                if hasattr(engine.pool, method)
+            ]
+        return samples
+
+    GaugeCallback("db_pool_size", "Connections the pool keeps open.", collect("size"), ("engine",))
+    GaugeCallback("db_pool_checked_out", "Connections currently checked out of the pool.", collect("checkedout"), ("engine",))
+    GaugeCallback("db_pool_overflow", "Connections opened beyond pool_size (negative while the pool is not full).", collect("overflow"), ("engine",))
+
+
+class MetricsMiddleware:
+    """ASGI middleware feeding http_request_duration_seconds.
+
+    Requests are labelled with the route template (/products/{product_id}) so ids do not create
+    series; paths that match no route are grouped as "unmatched".
+    """
+
+    def __init__(self, app, exclude_paths: tuple[str, ...] = ("/metrics",)) -> None:
+        self.app = app
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            )
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from typing import IO, Iterable, Iterator
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app import crud, schemas
+
+IMPORT_FORMATS = ("csv", "jsonl")
+DEFAULT_CHUNK_SIZE = 1000
+# per-row errors echoed back per chunk; the final summary always carries the full count
+MAX_ERRORS_PER_CHUNK = 100
+
+
+class ProductImportError(ValueError):
+    """Raised when the import file itself cannot be read (unknown format, bad header)."""
+
+
+def _csv_value(field: str, value: str):
+    if field in ("photos", "extra_attributes"):
+        # JSON-encoded in CSV cells: ["/media/..."], {"cor": ["azul"]}
+        return json.loads(value)
+    return value
+
+
+def iter_records(binary: IO[bytes], fmt: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    """Yield (line number, raw record, parse error) from a CSV or JSONL byte stream, one record at a time.
+
+    CSV needs a header row; empty cells are left out so schema defaults (and, on update, the stored
+    value) apply. Blank JSONL lines are skipped.
+    """
+    if fmt not in IMPORT_FORMATS:
+        raise ProductImportError(f"Formato de importacao invalido: {fmt}.")
+    text = io.TextIOWrapper(binary, encoding="utf-8-sig", newline="")
+    if fmt == "jsonl":
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield line_no, None, f"JSON invalido: {exc.msg}"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, "Cada linha deve ser um objeto JSON."
+                continue
+            yield line_no, record, None
+        return
+
+    reader = csv.DictReader(text)
+    if not reader.fieldnames:
+        raise ProductImportError("Arquivo CSV sem cabecalho.")
+    for row in reader:
+        line_no = reader.line_num
+        if None in row:
+            yield line_no, None, "Linha com mais colunas que o cabecalho."
+            continue
+        try:
+            record = {k.strip(): _csv_value(k.strip(), v) for k, v in row.items() if v not in (None, "")}
+        except json.JSONDecodeError as exc:
+            yield line_no, None, f"JSON invalido em photos/extra_attributes: {exc.msg}"
+            continue
+        yield line_no, record, None
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in exc.errors())
+
+
+def import_products(
+    db: Session,
+    records: Iterable[tuple[int, dict | None, str | None]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[dict]:
+    """Validate records through schemas.ProductCreate and upsert them by SKU, one chunk per transaction.
+
+    Yields a progress dict after every chunk ({processed, upserted, failed, errors}) and a final one with
+    done=True. Only the current chunk is held in memory; a chunk that fails in the database is rolled
+    back and reported as errors for its rows, and the import goes on with the next one.
+    """
+    processed = upserted = failed = 0
+    chunk: list[tuple[int, schemas.ProductCreate]] = []
+    errors: list[dict] = []
+
+    def flush() -> dict:
+        nonlocal upserted, failed
+        if chunk:
+            try:
+                upserted += crud.upsert_products(db, [product for _, product in chunk])
+                db.commit()
+            except Exception as exc:  # noqa: BLE001 - reported per row, the import continues
+                db.rollback()
+                failed += len(chunk)
+                detail = str(getattr(exc, "orig", exc)).splitlines()[0]
+                errors.extend({"line": line, "sku": p.sku, "error": detail} for line, p in chunk)
+        progress = {
+            "processed": processed,
+            "upserted": upserted,
+            "failed": failed,
+            "errors": errors[:MAX_ERRORS_PER_CHUNK],
+        }
+        chunk.clear()
+        errors.clear()
+        return progress
+
+    for line_no, record, parse_error in records:
+        processed += 1
+        if parse_error is not None:
+            failed += 1
+            errors.append({"line": line_no, "sku": None, "error": parse_error})
+        else:
+            try:
+                chunk.append((line_no, schemas.ProductCreate.model_validate(record)))
+            except ValidationError as exc:
+                failed += 1
+                errors.append({"line": line_no, "sku": record.get("sku"), "error": _validation_message(exc)})
+        if processed % chunk_size == 0:
+            yield flush()
+
+    final = flush()
+    final["done"] = True
+    yield final
+
+
+def ndjson_lines(progress: Iterable[dict]) -> Iterator[bytes]:
+    for item in progress:
+        yield (json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def detect_format(filename: str) -> str:
+    return "jsonl" if filename.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import os
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# slowest statements kept per request
+SLOWEST_PER_REQUEST = 5
+# requests kept for /debug/profile
+HISTORY_SIZE = 200
+# characters of SQL kept per slow statement
+_SQL_PREVIEW = 500
+
+_APP_ROOT = str(Path(__file__).resolve().parents[1])
+_THIS_FILE = str(Path(__file__).resolve())
+
+
+class ProfilerSettings:
+    """Runtime switches, read from the environment at import and adjustable in tests.
+
+    QUERY_PROFILER=1 turns the profiler on (Server-Timing headers and /debug/profile).
+    QUERY_PROFILER_STACK_THRESHOLD=N additionally captures the call site of every statement and logs
+    them, grouped, for requests that run more than N statements (0 = off).
+    """
+
+    def __init__(self) -> None:
+        self.enabled = os.environ.get("QUERY_PROFILER", "0") == "1"
+        self.stack_threshold = int(os.environ.get("QUERY_PROFILER_STACK_THRESHOLD", "0"))
+
+
+settings = ProfilerSettings()
+
+
+class RequestProfile:
+    __slots__ = ("method", "path", "started_at", "started", "queries", "db_seconds", "slowest", "stacks", "_lock")
+
+    def __init__(self, method: str, path: str, capture_stacks: bool) -> None:
+        self.method = method
+        self.path = path
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.slowest: list[tuple[float, int, str]] = []
+        self.stacks: Counter | None = Counter() if capture_stacks else None
+        # statements of one request may run on the event loop and in threadpool workers
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float) -> None:
+        stack = _app_stack() if self.stacks is not None else None
+        with self._lock:
+            self.queries += 1
+            self.db_seconds += seconds
+            entry = (seconds, self.queries, statement)
+            if len(self.slowest) < SLOWEST_PER_REQUEST:
+                heapq.heappush(self.slowest, entry)
+            elif seconds > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+            if stack is not None:
+                self.stacks[stack] += 1
+
+    def server_timing(self, total_seconds: float) -> str:
+        return f'db;desc="{self.queries} queries";dur={self.db_seconds * 1000:.2f}, total;dur={total_seconds * 1000:.2f}'
+
+    def summary(self, status: int | None, total_seconds: float) -> dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(total_seconds * 1000, 2),
+            "queries": self.queries,
+            "db_ms": round(self.db_seconds * 1000, 2),
+            "slowest": [
+                {"ms": round(seconds * 1000, 2), "sql": " ".join(statement.split())[:_SQL_PREVIEW]}
+                for seconds, _, statement in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+
+_current: ContextVar[RequestProfile | None] = ContextVar("query_profile", default=None)
+_history: deque[dict] = deque(maxlen=HISTORY_SIZE)
+
+
+def _app_stack() -> str:
+    """Frames of this application (not SQLAlchemy, Starlette or the profiler) leading to the statement."""
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(_APP_ROOT) and frame.filename != _THIS_FILE
+    ]
+    return "".join(traceback.format_list(frames))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if context is not None and _current.get() is not None:
+        context._profiler_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    profile = _current.get()
+    started = getattr(context, "_profiler_started", None)
+    if profile is not None and started is not None:
+        profile.record(statement, time.perf_counter() - started)
+
+
+def instrument(*engines: Engine) -> None:
+    """Time every statement of `engines` (sync engines; pass async_engine.sync_engine for async)."""
+    for engine in engines:
+        if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def recent_profiles(limit: int = 50, min_queries: int = 0) -> list[dict]:
+    """Newest first."""
+    return [item for item in reversed(_history) if item["queries"] >= min_queries][:limit]
+
+
+def _log_stacks(profile: RequestProfile) -> None:
+    lines = [f"{profile.method} {profile.path} ran {profile.queries} statements ({profile.db_seconds * 1000:.1f} ms in the database)"]
+    for stack, count in profile.stacks.most_common():
+        lines.append(f"--- {count} statement(s) from:\n{stack or '  (outside app code)'}")
+    logger.warning("\n".join(lines))
+
+
+class QueryProfilerMiddleware:
+    """ASGI middleware recording statement count, database time and the slowest statements per request.
+
+    The totals so far are sent as a Server-Timing header when the response starts; the full profile,
+    including statements run while a streaming body is sent, goes to the /debug/profile ring buffer.
+    """
+
+    def __init__(self, app, exclude_paths: tuple[str, ...] = ("/debug/profile",)) -> None:
+        self.app = app
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not settings.enabled or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"], capture_stacks=settings.stack_threshold > 0)
+        status: int | None = None
+
+        async def send_with_timing(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = profile.server_timing(time.perf_counter() - profile.started)
+                message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode("latin-1"))]
+            await send(message)
+
+        token = _current.set(profile)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            _history.append(profile.summary(status, time.perf_counter() - profile.started))
+            if profile.stacks is not None and profile.queries > settings.stack_threshold:
+                _log_stacks(profile)
@@ -1,5 +1,6 @@
 import os
 import sys
+import tempfile
 from pathlib import Path
 
 # Ensure erp-backend is on sys.path when pytest runs from the repository root
@@ -7,6 +8,10 @@ HERE = Path(__file__).resolve().parent
 sys.path.insert(0, str(HERE))
 
 # Provide minimal env defaults for tests that import app at collection time
-os.environ.setdefault('DATABASE_URL', 'sqlite:///./.tmp_test.db')
+# Use a throwaway SQLite file so schema changes never hit a stale database
+if 'DATABASE_URL' not in os.environ:
+    _TEST_DB = Path(tempfile.gettempdir()) / 'erp-backend-tests.db'
+    _TEST_DB.unlink(missing_ok=True)
+    os.environ['DATABASE_URL'] = f'sqlite:///{_TEST_DB}'
 os.environ.setdefault('SECRET_KEY', 'test-secret')
 os.environ.setdefault('ACCESS_TOKEN_EXPIRE_MINUTES', '60')
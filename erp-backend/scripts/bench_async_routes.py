@@ -0,0 +1,112 @@
+"""
+Benchmark de carga: rotas sync (Session + threadpool) x async (AsyncSession) de produtos,
+clientes e vendas.
+
+Monta um app FastAPI de benchmark com as duas versoes de cada leitura (crud.* em `def`
+x crud_async.* em `async def`) sobre o mesmo banco e dispara `--concurrency` clientes
+simultaneos via httpx (ASGI em processo, sem rede), imprimindo req/s, p50 e p95. As rotas
+sync disputam os `--threads` tokens do threadpool do Starlette (40 por padrao), como em
+producao; as async so disputam o pool de conexoes.
+
+Rode contra o Postgres (DATABASE_URL) com dados de volume, por exemplo apos
+scripts/seed_data.py. `--pg-sleep-ms` soma um pg_sleep a cada requisicao para simular um
+banco mais lento / rede mais longa.
+
+Uso:
+    python -m scripts.bench_async_routes --requests 2000 --concurrency 200
+    python -m scripts.bench_async_routes --threads 40 --pg-sleep-ms 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import anyio.to_thread
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import crud, crud_async
+from app.database import async_engine, engine
+from app.dependencies import get_async_db, get_db
+
+ROUTES = ['products', 'customers', 'sales']
+
+
+def build_app(pg_sleep_ms: int) -> FastAPI:
+    bench = FastAPI()
+    postgres = engine.dialect.name == 'postgresql'
+    delay = text('SELECT pg_sleep(:s)').bindparams(s=pg_sleep_ms / 1000) if pg_sleep_ms and postgres else None
+
+    def add_routes(name, list_sync, list_async):
+        @bench.get(f'/sync/{name}')
+        def sync_route(limit: int = 50, db: Session = Depends(get_db)):
+            if delay is not None:
+                db.execute(delay)
+            return len(list_sync(db, limit=limit))
+
+        @bench.get(f'/async/{name}')
+        async def async_route(limit: int = 50, db: AsyncSession = Depends(get_async_db)):
+            if delay is not None:
+                await db.execute(delay)
+            return len(await list_async(db, limit=limit))
+
+    add_routes('products', crud.list_products, crud_async.list_products)
+    add_routes('customers', crud.list_customers, crud_async.list_customers)
+    add_routes('sales', crud.list_sales, crud_async.list_sales)
+    return bench
+
+
+async def run(app: FastAPI, mode: str, requests: int, concurrency: int) -> list[float]:
+    transport = httpx.ASGITransport(app=app)
+    samples: list[float] = []
+    counter = iter(range(requests))
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        async def worker():
+            for i in counter:
+                t0 = time.perf_counter()
+                resp = await client.get(f'/{mode}/{ROUTES[i % len(ROUTES)]}')
+                resp.raise_for_status()
+                samples.append((time.perf_counter() - t0) * 1000)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+
+def report(mode: str, samples: list[float], elapsed: float) -> None:
+    p95 = statistics.quantiles(samples, n=20)[18] if len(samples) >= 20 else max(samples)
+    print(
+        f'{mode:>5}: {len(samples) / elapsed:8.1f} req/s  p50={statistics.median(samples):.1f}ms '
+        f'p95={p95:.1f}ms  ({len(samples)} reqs em {elapsed:.2f}s)'
+    )
+
+
+async def main_async(args) -> None:
+    anyio.to_thread.current_default_thread_limiter().total_tokens = args.threads
+    app = build_app(args.pg_sleep_ms)
+    # aquecimento: abre conexoes dos dois pools
+    await run(app, 'sync', len(ROUTES) * 2, 2)
+    await run(app, 'async', len(ROUTES) * 2, 2)
+    for mode in ('sync', 'async'):
+        t0 = time.perf_counter()
+        samples = await run(app, mode, args.requests, args.concurrency)
+        report(mode, samples, time.perf_counter() - t0)
+    await async_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=40, help='tokens do threadpool (padrao do Starlette: 40)')
+    parser.add_argument('--pg-sleep-ms', type=int, default=0, help='latencia extra por requisicao (so Postgres)')
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark de GET /products/search (crud.search_products) sobre um catalogo grande.
+
+Popula N produtos sinteticos (SKU com prefixo BENCH-), roda ANALYZE e mede a latencia
+das buscas por nome (substring) e por SKU (prefixo), imprimindo p50/p95 e o EXPLAIN
+de cada consulta para conferir o uso dos indices pg_trgm / text_pattern_ops.
+
+Requer Postgres com as migrations aplicadas (alembic upgrade head).
+
+Uso:
+    python -m scripts.bench_product_search --count 500000
+    python -m scripts.bench_product_search --skip-seed --repeat 200
+    python -m scripts.bench_product_search --cleanup
+"""
+
+import argparse
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from sqlalchemy import insert, text
+
+from app import crud, models
+from app.database import SessionLocal
+
+WORDS = [
+    'camiseta', 'calca', 'vestido', 'saia', 'blusa', 'jaqueta', 'bermuda', 'meia', 'bone', 'tenis',
+    'azul', 'preta', 'branca', 'verde', 'rosa', 'algodao', 'linho', 'jeans', 'infantil', 'plus',
+]
+CHUNK = 5000
+
+
+def seed(session, count: int) -> None:
+    rng = random.Random(42)
+    start = session.execute(text("SELECT count(*) FROM products WHERE sku LIKE 'BENCH-%'")).scalar() or 0
+    for offset in range(start, count, CHUNK):
+        rows = []
+        for i in range(offset, min(offset + CHUNK, count)):
+            cost = Decimal(rng.randint(500, 20000)) / 100
+            price = cost * Decimal('1.8')
+            rows.append({
+                'name': ' '.join(rng.sample(WORDS, 3)) + f' {i}',
+                'sku': f'BENCH-{i:07d}',
+                'category': rng.choice(WORDS[:10]),
+                'cost_price': cost,
+                'sale_price': price,
+                'margin': price - cost,
+                'stock': rng.randint(0, 200),
+                'min_stock': 0,
+                'photos': [],
+                'extra_attributes': {},
+            })
+        session.execute(insert(models.Product), rows)
+        session.commit()
+        print(f'seeded {min(offset + CHUNK, count)}/{count}')
+    session.execute(text('ANALYZE products'))
+    session.commit()
+
+
+def timed(session, term: str, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        crud.search_products(session, term, limit=20)
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+
+def explain(session, term: str) -> None:
+    like = f'%{term}%'
+    plan = session.execute(
+        text(
+            "EXPLAIN (ANALYZE, BUFFERS) SELECT id, name, sku, sale_price, stock FROM products "
+            "WHERE name ILIKE :like OR lower(sku) LIKE :prefix ORDER BY similarity(name, :term) DESC LIMIT 20"
+        ),
+        {'like': like, 'prefix': f'{term.lower()}%', 'term': term},
+    ).scalars().all()
+    print('\n'.join(plan))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=500_000)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--skip-seed', action='store_true')
+    parser.add_argument('--cleanup', action='store_true', help='remove BENCH- products and exit')
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        if session.get_bind().dialect.name != 'postgresql':
+            raise SystemExit('this benchmark needs Postgres (pg_trgm); check DATABASE_URL')
+        if args.cleanup:
+            deleted = session.execute(text("DELETE FROM products WHERE sku LIKE 'BENCH-%'")).rowcount
+            session.commit()
+            print('deleted', deleted)
+            return
+        if not args.skip_seed:
+            seed(session, args.count)
+
+        for term in ['camis', 'jeans azul', 'BENCH-00012', 'linho 4242']:
+            samples = timed(session, term, args.repeat)
+            p95 = statistics.quantiles(samples, n=20)[18] if len(samples) >= 20 else max(samples)
+            print(f'{term!r}: p50={statistics.median(samples):.2f}ms p95={p95:.2f}ms')
+            explain(session, term)
+            print()
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Micro-benchmark das rotas de escrita: quantos statements SQL cada endpoint emite.
+
+Dispara cada escrita (produto, cliente, venda, lancamento financeiro, categoria, caixa)
+`--repeat` vezes via TestClient contra o banco de DATABASE_URL e conta os statements
+executados nos dois engines (sync e async) durante a requisicao, imprimindo a contagem
+e o tempo mediano. Serve para pegar regressao de round trips: um refresh apos o commit ou
+um relacionamento carregado sob demanda na serializacao aparece como statement a mais.
+
+Cria seus proprios produtos/clientes/caixa (SKUs e telefones com prefixo BENCH-); rode
+contra um banco de teste. `--sql` imprime os statements da ultima execucao de cada rota.
+
+Uso:
+    python -m scripts.bench_write_statements
+    python -m scripts.bench_write_statements --repeat 50 --sql
+"""
+
+import argparse
+import statistics
+import time
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.database import async_engine, engine, init_db
+from app.main import app
+
+
+class StatementCounter:
+    def __init__(self):
+        self.statements: list[str] = []
+        for target in (engine, async_engine.sync_engine):
+            event.listen(target, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(' '.join(statement.split()))
+
+    def reset(self) -> None:
+        self.statements = []
+
+
+def _tag() -> str:
+    return uuid.uuid4().hex[:10]
+
+
+def _ok(resp):
+    if resp.status_code >= 400:
+        raise SystemExit(f'{resp.request.method} {resp.request.url.path}: {resp.status_code} {resp.text}')
+    return resp.json()
+
+
+def scenarios(client: TestClient):
+    """(rota, funcao que faz a requisicao) na ordem em que as escritas dependem umas das outras."""
+    state: dict = {}
+
+    def new_product():
+        state['product'] = _ok(client.post('/products', json={
+            'name': 'Produto bench', 'sku': f'BENCH-{_tag()}', 'category': 'Bench',
+            'cost_price': '4.00', 'sale_price': '10.00', 'stock': 1000,
+        }))
+
+    def update_product():
+        _ok(client.put(f"/products/{state['product']['id']}", json={'sale_price': '11.00'}))
+
+    def new_customer():
+        state['customer'] = _ok(client.post('/customers', json={'name': 'Cliente bench', 'phone': f'BENCH-{_tag()}'}))
+
+    def update_customer():
+        _ok(client.put(f"/customers/{state['customer']['id']}", json={'notes': 'bench'}))
+
+    def new_sale():
+        state['sale'] = _ok(client.post('/sales', json={
+            'customer_id': state['customer']['id'],
+            'items': [{'product_id': state['product']['id'], 'quantity': 2}],
+            'payments': [{'method': 'dinheiro', 'amount': '22.00'}],
+        }))
+
+    def update_sale():
+        _ok(client.put(f"/sales/{state['sale']['id']}", json={
+            'items': [{'product_id': state['product']['id'], 'quantity': 1}],
+            'payments': [{'method': 'pix', 'amount': '11.00'}],
+        }))
+
+    def cancel_sale():
+        _ok(client.post(f"/sales/{state['sale']['id']}/cancel"))
+
+    def new_entry():
+        state['entry'] = _ok(client.post('/financial-entries', json={
+            'type': 'receita', 'category': 'Bench', 'amount': '5.00', 'cashbox_id': state['cashbox'],
+        }))
+
+    def update_entry():
+        _ok(client.put(f"/financial-entries/{state['entry']['id']}", json={'amount': '6.00'}))
+
+    def new_category():
+        _ok(client.post('/categories', json={'name': f'Bench {_tag()}'}))
+
+    def cycle_cashbox():
+        _ok(client.post(f"/cashboxes/{state['cashbox']}/close", json={'closed_amount': 0}))
+        _ok(client.post(f"/cashboxes/{state['cashbox']}/open"))
+
+    return state, [
+        ('POST /products', new_product),
+        ('PUT /products/{id}', update_product),
+        ('POST /customers', new_customer),
+        ('PUT /customers/{id}', update_customer),
+        ('POST /sales', new_sale),
+        ('PUT /sales/{id}', update_sale),
+        ('POST /sales/{id}/cancel', cancel_sale),
+        ('POST /financial-entries', new_entry),
+        ('PUT /financial-entries/{id}', update_entry),
+        ('POST /categories', new_category),
+        ('close + open /cashboxes/{id}', cycle_cashbox),
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--sql', action='store_true', help='imprime os statements de cada rota')
+    args = parser.parse_args()
+
+    init_db()
+    counter = StatementCounter()
+    with TestClient(app) as client:
+        state, routes = scenarios(client)
+        state['cashbox'] = _ok(client.post('/cashboxes', json={'name': f'Caixa bench {_tag()}'}))['id']
+        _ok(client.post(f"/cashboxes/{state['cashbox']}/open"))
+        results: dict[str, list[tuple[int, float]]] = {name: [] for name, _ in routes}
+        last_sql: dict[str, list[str]] = {}
+        for _ in range(args.repeat):
+            for name, run in routes:
+                counter.reset()
+                t0 = time.perf_counter()
+                run()
+                results[name].append((len(counter.statements), (time.perf_counter() - t0) * 1000))
+                last_sql[name] = list(counter.statements)
+        _ok(client.post(f"/cashboxes/{state['cashbox']}/close", json={'closed_amount': 0}))
+
+    for name, samples in results.items():
+        counts = [count for count, _ in samples]
+        print(
+            f'{name:<32} statements={statistics.median(counts):>4.0f} (min {min(counts)}, max {max(counts)})  '
+            f'p50={statistics.median(ms for _, ms in samples):.1f}ms'
+        )
+        if args.sql:
+            for statement in last_sql[name]:
+                print(f'    {statement[:160]}')
+    async_engine.sync_engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
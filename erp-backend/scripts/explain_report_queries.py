@@ -0,0 +1,98 @@
+"""
+EXPLAIN antes/depois das consultas de relatorio de vendas (faixa de datas + indices).
+
+"antes": filtro no formato antigo dos templates, `(:d IS NULL OR s.created_at::date >= :d)`,
+rodado numa transacao que remove os indices da migration 20261017_report_indexes (a
+transacao e desfeita no fim, os indices continuam no banco). "depois": faixa semiaberta
+`created_at >= :de AND created_at < :ate + 1 dia`, sem cast, com os indices.
+
+Imprime o plano de cada consulta (EXPLAIN ANALYZE, BUFFERS). Requer Postgres com as
+migrations aplicadas e dados de volume (scripts/seed_data.py). O DROP INDEX bloqueia as
+tabelas durante a transacao: nao rode em producao.
+
+Uso:
+    python -m scripts.explain_report_queries --from 2026-01-01 --to 2026-03-31
+"""
+
+import argparse
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from app.database import SessionLocal
+
+REPORT_INDEXES = [
+    'ix_sale_items_sale_id',
+    'ix_sale_payments_sale_id',
+    'ix_customer_payment_allocations_sale_id',
+    'ix_sale_items_product_id_sale_id',
+    'ix_sales_status_created_at',
+]
+
+PRODUCT_TOTALS = """
+    SELECT si.product_id, SUM(si.quantity) AS quantity, SUM(si.line_total) AS revenue
+    FROM sale_items si
+    JOIN sales s ON s.id = si.sale_id
+    WHERE s.status = 'completed' AND {range}
+    GROUP BY si.product_id
+"""
+OLD_RANGE = (
+    "(CAST(:from_day AS date) IS NULL OR s.created_at::date >= :from_day) "
+    "AND (CAST(:to_day AS date) IS NULL OR s.created_at::date <= :to_day)"
+)
+NEW_RANGE = "s.created_at >= :from_day AND s.created_at < :to_next"
+
+SALE_CHILDREN = [
+    "SELECT * FROM sale_items WHERE sale_id = :sale_id",
+    "SELECT * FROM sale_payments WHERE sale_id = :sale_id",
+]
+
+
+def explain(session, sql: str, params: dict) -> None:
+    plan = session.execute(text('EXPLAIN (ANALYZE, BUFFERS) ' + sql), params).scalars().all()
+    print('\n'.join(plan))
+    print()
+
+
+def run(session, label: str, range_sql: str, params: dict) -> None:
+    print(f'===== {label}: totais por produto =====')
+    explain(session, PRODUCT_TOTALS.format(range=range_sql), params)
+    for sql in SALE_CHILDREN:
+        print(f'===== {label}: {sql} =====')
+        explain(session, sql, params)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--from', dest='from_day', type=date.fromisoformat, required=True)
+    parser.add_argument('--to', dest='to_day', type=date.fromisoformat, required=True)
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        if session.get_bind().dialect.name != 'postgresql':
+            raise SystemExit('this benchmark needs Postgres; check DATABASE_URL')
+        sale_id = session.execute(text('SELECT max(id) FROM sales')).scalar() or 0
+        params = {
+            'from_day': args.from_day,
+            'to_day': args.to_day,
+            'to_next': args.to_day + timedelta(days=1),
+            'sale_id': sale_id,
+        }
+        for table in ('sales', 'sale_items', 'sale_payments'):
+            session.execute(text(f'ANALYZE {table}'))
+        session.commit()
+
+        for name in REPORT_INDEXES:
+            session.execute(text(f'DROP INDEX IF EXISTS {name}'))
+        run(session, 'antes', OLD_RANGE, params)
+        session.rollback()
+
+        run(session, 'depois', NEW_RANGE, params)
+        session.rollback()
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""
+Gera as versoes reduzidas (128/512/1024 px) das fotos de produto ja armazenadas em
+app/data/product_photos. Apenas os tamanhos que ainda nao existem sao criados, entao o
+script pode ser executado novamente com seguranca.
+
+Uso:
+    python -m scripts.generate_photo_derivatives
+"""
+
+from app.services.image_processing import MEDIA_ROOT, generate_missing_derivatives, is_derivative_filename
+
+
+def main() -> None:
+    originals = 0
+    created = 0
+    failed = 0
+    for stored in sorted(MEDIA_ROOT.glob('*.webp')):
+        if is_derivative_filename(stored.name):
+            continue
+        originals += 1
+        try:
+            created += generate_missing_derivatives(stored)
+        except Exception as exc:
+            failed += 1
+            print('failed:', stored.name, exc)
+    print(f'photos: {originals} derivatives created: {created} failed: {failed}')
+
+
+if __name__ == '__main__':
+    main()
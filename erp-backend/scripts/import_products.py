@@ -0,0 +1,52 @@
+"""
+Importa/atualiza o catalogo de produtos a partir de um arquivo CSV ou JSONL (upsert por SKU).
+
+Le o arquivo em streaming, valida cada linha com schemas.ProductCreate e grava em lotes com
+INSERT ... ON CONFLICT (sku) DO UPDATE (margem calculada no SQL). Linhas invalidas sao
+listadas com o numero da linha e ignoradas; o progresso e impresso a cada lote.
+
+CSV: cabecalho com os campos do produto (name, sku, category, supplier, cost_price,
+sale_price, stock, min_stock; photos/extra_attributes como JSON). Celulas vazias nao
+sobrescrevem o valor ja cadastrado.
+
+Uso:
+    python -m scripts.import_products catalogo.csv
+    python -m scripts.import_products fornecedor.jsonl --chunk-size 2000
+"""
+
+import argparse
+import sys
+
+from app.database import SessionLocal
+from app.services.product_import import (
+    DEFAULT_CHUNK_SIZE,
+    IMPORT_FORMATS,
+    detect_format,
+    import_products,
+    iter_records,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=IMPORT_FORMATS, help='padrao: pela extensao do arquivo')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    session = SessionLocal()
+    try:
+        with open(args.path, 'rb') as fh:
+            for progress in import_products(session, iter_records(fh, fmt), chunk_size=args.chunk_size):
+                for error in progress['errors']:
+                    print(f"  linha {error['line']} ({error['sku'] or '-'}): {error['error']}", file=sys.stderr)
+                print(f"processadas={progress['processed']} gravadas={progress['upserted']} com_erro={progress['failed']}")
+        if progress['failed']:
+            sys.exit(1)
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""
+Recalcula o consolidado diario de vendas por produto (daily_product_sales) a partir das
+vendas concluidas em sales/sale_items.
+
+O consolidado e mantido a cada venda criada, alterada ou cancelada; use este comando para
+a carga inicial, depois de importar vendas por fora da API ou para corrigir o custo apos
+reajustes de cost_price (o custo e gravado com o cost_price vigente no momento).
+
+Uso:
+    python -m scripts.rebuild_daily_product_sales                        # todo o historico
+    python -m scripts.rebuild_daily_product_sales --from 2026-01-01 --to 2026-01-31
+"""
+
+import argparse
+from datetime import date
+
+from app import crud
+from app.database import SessionLocal
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--from', dest='from_day', type=date.fromisoformat, help='primeiro dia (AAAA-MM-DD)')
+    parser.add_argument('--to', dest='to_day', type=date.fromisoformat, help='ultimo dia, inclusive (AAAA-MM-DD)')
+    args = parser.parse_args()
+    session = SessionLocal()
+    try:
+        rows = crud.rebuild_daily_product_sales(session, from_day=args.from_day, to_day=args.to_day)
+        print('rollup rows written:', rows)
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+"""
+Reconcilia o ledger de fiado das vendas (sales.fiado_total / sales.fiado_allocated)
+a partir das linhas de sale_payments e customer_payment_allocations.
+
+Uso:
+    python -m scripts.rebuild_fiado_ledger            # todas as vendas
+    python -m scripts.rebuild_fiado_ledger 10 11 12   # apenas as vendas informadas
+"""
+
+import sys
+
+from app.database import SessionLocal
+from app import crud
+
+
+def main(argv: list[str]) -> None:
+    sale_ids = [int(a) for a in argv] or None
+    session = SessionLocal()
+    try:
+        fixed = crud.rebuild_fiado_ledger(session, sale_ids=sale_ids)
+        print('sales corrected:', fixed)
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -120,6 +120,7 @@ def seed_sales(db: Session, customers: list[models.Customer], products: list[mod
                 quantity=quantity,
                 unit_price=unit_price,
                 line_total=line_total,
+                unit_cost=product.cost_price,
             )
             total_amount += line_total
             db.add(sale_item)
@@ -93,6 +93,7 @@ def ensure_sales(db: Session, customers: list[models.Customer], products: list[m
                 quantity=qty,
                 unit_price=unit_price,
                 line_total=line_total,
+                unit_cost=p.cost_price,
             )
             db.add(si)
             total_amount += line_total
@@ -0,0 +1,80 @@
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def _product(client, stock=5):
+    resp = client.post(
+        "/products",
+        json={
+            "name": "Produto Async",
+            "sku": f"ASY-{uuid.uuid4().hex[:8]}",
+            "category": "Test",
+            "cost_price": 4,
+            "sale_price": 10,
+            "stock": stock,
+        },
+    )
+    assert resp.status_code == 201, resp.text
+    return resp.json()
+
+
+def test_sale_lifecycle_through_async_routes():
+    with TestClient(app) as client:
+        product = _product(client)
+        customer = client.post("/customers", json={"name": "Cliente Async", "phone": f"11{uuid.uuid4().hex[:9]}"})
+        assert customer.status_code == 201, customer.text
+        customer_id = customer.json()["id"]
+
+        created = client.post(
+            "/sales",
+            json={
+                "customer_id": customer_id,
+                "items": [{"product_id": product["id"], "quantity": 2}],
+                "payments": [{"method": "fiado", "amount": 20}],
+            },
+        )
+        assert created.status_code == 201, created.text
+        sale = created.json()
+        assert sale["items"][0]["product"]["id"] == product["id"]
+        assert sale["total_fiado_pending"] == 20.0
+        assert sale["created_at"]
+        assert client.get(f"/products/{product['id']}").json()["stock"] == 3
+        assert client.get(f"/customers/{customer_id}").json()["balance_due"] == 20.0
+
+        updated = client.put(
+            f"/sales/{sale['id']}",
+            json={
+                "items": [{"product_id": product["id"], "quantity": 1}],
+                "payments": [{"method": "dinheiro", "amount": 10}],
+            },
+        )
+        assert updated.status_code == 200, updated.text
+        assert updated.json()["total_amount"] == 10.0
+        assert client.get(f"/products/{product['id']}").json()["stock"] == 4
+
+        cancelled = client.post(f"/sales/{sale['id']}/cancel")
+        assert cancelled.json()["status"] == "cancelled"
+        assert client.get(f"/products/{product['id']}").json()["stock"] == 5
+        assert client.get(f"/sales/{sale['id']}").json()["status"] == "cancelled"
+
+
+def test_async_routes_report_errors():
+    with TestClient(app) as client:
+        product = _product(client, stock=1)
+        duplicate = client.post("/products", json={**product, "sku": product["sku"]})
+        assert duplicate.status_code == 409
+
+        oversell = client.post(
+            "/sales",
+            json={
+                "items": [{"product_id": product["id"], "quantity": 2}],
+                "payments": [{"method": "dinheiro", "amount": 20}],
+            },
+        )
+        assert oversell.status_code == 400
+        assert "Estoque insuficiente" in oversell.json()["detail"]
+        assert client.get("/sales/999999").status_code == 404
+        assert client.put(f"/products/{product['id']}", json={"stock": 7}).json()["stock"] == 7
@@ -0,0 +1,76 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from app import crud, models, schemas
+from app.database import SessionLocal, init_db
+from app.services import cashbox_events
+from app.services.cashbox_events import CashboxHub
+
+
+@pytest.fixture(scope="function")
+def db():
+    init_db()
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def test_hub_resumes_from_sequence_and_falls_back_to_snapshot(monkeypatch):
+    monkeypatch.setattr(cashbox_events, "HISTORY_SIZE", 3)
+
+    async def scenario():
+        hub = CashboxHub()
+        for amount in (1, 2, 3, 4):
+            hub.publish(7, {"delta": amount})
+
+        queue, backlog, seq = hub.subscribe(7, last_seq=2)
+        assert seq == 4
+        assert [item["seq"] for item in backlog] == [3, 4]
+
+        # seq 1 already left the history: the client has to start from a snapshot
+        _, stale, _ = hub.subscribe(7, last_seq=0)
+        assert stale is None
+
+        hub.publish(7, {"delta": 5})
+        item = await asyncio.wait_for(queue.get(), timeout=1)
+        assert item["seq"] == 5 and item["delta"] == 5
+
+        hub.unsubscribe(7, queue)
+        hub.publish(7, {"delta": 6})
+        await asyncio.sleep(0)
+        assert queue.empty()
+
+    asyncio.run(scenario())
+
+
+def test_committed_entry_publishes_balance_and_rollback_does_not(db):
+    cashbox = crud.create_cashbox(db, name="Caixa Eventos", initial_amount=100.0)
+
+    async def scenario():
+        queue, _, _ = cashbox_events.hub.subscribe(cashbox.id)
+        try:
+            crud.open_cashbox(db, cashbox.id)
+            opened = await asyncio.wait_for(queue.get(), timeout=1)
+            assert opened["source"] == "open" and opened["cash_balance"] == 100.0
+
+            crud.create_financial_entry(
+                db,
+                schemas.FinancialEntryCreate(
+                    type=models.EntryType.RECEITA, category="Reforco", amount=Decimal("25.00"), cashbox_id=cashbox.id
+                ),
+            )
+            moved = await asyncio.wait_for(queue.get(), timeout=1)
+            assert moved["source"] == "entry"
+            assert moved["delta"] == 25.0 and moved["cash_balance"] == 125.0
+            assert moved["seq"] == opened["seq"] + 1
+
+            crud.move_cashbox_balances(db, {cashbox.id: Decimal("10.00")}, "entry")
+            db.rollback()
+            await asyncio.sleep(0.05)
+            assert queue.empty()
+        finally:
+            cashbox_events.hub.unsubscribe(cashbox.id, queue)
+
+    asyncio.run(scenario())
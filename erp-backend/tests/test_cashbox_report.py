@@ -0,0 +1,139 @@
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from app import crud, models, schemas
+from app.database import SessionLocal, init_db
+
+
+@pytest.fixture(scope="function")
+def db():
+    init_db()
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def create_product(db):
+    product = models.Product(
+        name="Produto Caixa",
+        sku=f"CX-{uuid.uuid4().hex[:8]}",
+        category="Test",
+        cost_price=Decimal("5.00"),
+        sale_price=Decimal("10.00"),
+        stock=100,
+        margin=Decimal("5.00"),
+    )
+    db.add(product)
+    db.commit()
+    return product
+
+
+def sale_payload(product_id, quantity, *payments, customer_id=None):
+    return schemas.SaleCreate(
+        customer_id=customer_id,
+        items=[schemas.SaleItemCreate(product_id=product_id, quantity=quantity)],
+        payments=[schemas.SalePaymentCreate(method=method, amount=Decimal(amount)) for method, amount in payments],
+    )
+
+
+def test_report_counts_cash_settlements_and_matches_running_balance(db):
+    product = create_product(db)
+    customer = models.Customer(name="Cliente Caixa", phone=f"11{uuid.uuid4().hex[:9]}")
+    db.add(customer)
+    db.commit()
+    cashbox = crud.create_cashbox(db, name="Caixa Teste", initial_amount=100.0)
+    crud.open_cashbox(db, cashbox.id)
+
+    crud.create_sale(db, sale_payload(product.id, 3, (schemas.PaymentMethod.DINHEIRO, "20.00"), (schemas.PaymentMethod.PIX, "10.00")))
+    cancelled = crud.create_sale(db, sale_payload(product.id, 1, (schemas.PaymentMethod.DINHEIRO, "10.00")))
+    crud.cancel_sale(db, cancelled)
+    crud.create_sale(
+        db, sale_payload(product.id, 4, (schemas.PaymentMethod.FIADO, "40.00"), customer_id=customer.id)
+    )
+    crud.create_customer_payment(db, customer_id=customer.id, amount=15.0, method="dinheiro")
+    crud.create_financial_entry(
+        db,
+        schemas.FinancialEntryCreate(type=models.EntryType.RECEITA, category="Reforco", amount=Decimal("50.00"), cashbox_id=cashbox.id),
+    )
+    despesa = crud.create_financial_entry(
+        db,
+        schemas.FinancialEntryCreate(type=models.EntryType.DESPESA, category="Sangria", amount=Decimal("30.00"), cashbox_id=cashbox.id),
+    )
+    crud.update_financial_entry(db, despesa, schemas.FinancialEntryUpdate(amount=Decimal("25.00")))
+
+    report = crud.cashbox_report(db, cashbox.id)
+
+    assert {p["method"]: p["amount"] for p in report["payments"]} == {"dinheiro": 20.0, "pix": 10.0, "fiado": 40.0}
+    assert report["settlements"] == [{"method": "dinheiro", "amount": 15.0}]
+    assert report["entries"] == [
+        {"type": "receita", "category": "Reforco", "amount": 50.0},
+        {"type": "despesa", "category": "Sangria", "amount": 25.0},
+    ]
+    assert sorted(report["entries_by_category"], key=lambda e: e["type"]) == [
+        {"type": "despesa", "category": "Sangria", "amount": 25.0},
+        {"type": "receita", "category": "Reforco", "amount": 50.0},
+    ]
+    assert report["entry_totals"] == {"receita": 50.0, "despesa": 25.0}
+    # 100 initial + 20 cash sale + 15 cash settlement + 50 - 25
+    assert report["expected_cash"] == 160.0
+    assert report["cash_balance"] == report["expected_cash"]
+
+    crud.close_cashbox(db, cashbox.id, closed_amount=160.0)
+    assert crud.resolve_cashbox_id(db) != cashbox.id
+
+
+def test_report_of_unknown_cashbox_raises(db):
+    with pytest.raises(ValueError):
+        crud.cashbox_report(db, 999999)
+
+
+def test_report_lists_each_entry_and_totals_per_category(db):
+    cashbox = crud.create_cashbox(db, name="Caixa Lancamentos", initial_amount=0.0)
+    for amount in ("10.00", "5.00"):
+        crud.create_financial_entry(
+            db,
+            schemas.FinancialEntryCreate(type=models.EntryType.RECEITA, category="Reforco", amount=Decimal(amount), cashbox_id=cashbox.id),
+        )
+
+    report = crud.cashbox_report(db, cashbox.id)
+
+    assert report["entries"] == [
+        {"type": "receita", "category": "Reforco", "amount": 10.0},
+        {"type": "receita", "category": "Reforco", "amount": 5.0},
+    ]
+    assert report["entries_by_category"] == [{"type": "receita", "category": "Reforco", "amount": 15.0}]
+
+
+def test_editing_sale_keeps_payments_on_the_original_cashbox(db):
+    product = create_product(db)
+    first = crud.create_cashbox(db, name="Caixa Ontem", initial_amount=0.0)
+    crud.open_cashbox(db, first.id)
+    sale = crud.create_sale(
+        db, sale_payload(product.id, 2, (schemas.PaymentMethod.DINHEIRO, "10.00"), (schemas.PaymentMethod.PIX, "10.00"))
+    )
+    pix_taken_at = next(p.created_at for p in sale.payments if p.method == models.PaymentMethod.PIX)
+    crud.close_cashbox(db, first.id, closed_amount=10.0)
+    second = crud.create_cashbox(db, name="Caixa Hoje", initial_amount=0.0)
+    crud.open_cashbox(db, second.id)
+
+    sale = crud.update_sale(
+        db,
+        sale,
+        schemas.SaleUpdate(
+            items=[schemas.SaleItemCreate(product_id=product.id, quantity=3)],
+            payments=[
+                schemas.SalePaymentCreate(method=schemas.PaymentMethod.DINHEIRO, amount=Decimal("20.00")),
+                schemas.SalePaymentCreate(method=schemas.PaymentMethod.PIX, amount=Decimal("10.00")),
+            ],
+        ),
+    )
+
+    assert {p.cashbox_id for p in sale.payments} == {first.id}
+    assert next(p.created_at for p in sale.payments if p.method == models.PaymentMethod.PIX) == pix_taken_at
+    report = crud.cashbox_report(db, first.id)
+    assert {p["method"]: p["amount"] for p in report["payments"]} == {"dinheiro": 20.0, "pix": 10.0}
+    assert report["cash_balance"] == report["expected_cash"] == 20.0
+    second_report = crud.cashbox_report(db, second.id)
+    assert second_report["payments"] == [] and second_report["cash_balance"] == 0.0
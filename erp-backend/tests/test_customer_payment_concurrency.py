@@ -0,0 +1,70 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from sqlalchemy import func
+
+from app import crud, models
+from app.database import SessionLocal, init_db
+
+
+def _setup_customer_with_fiado(amounts):
+    init_db()
+    db = SessionLocal()
+    try:
+        customer = models.Customer(name="Cliente Concorrente", phone=f"11{uuid.uuid4().hex[:9]}")
+        db.add(customer)
+        db.commit()
+        sale_ids = []
+        for amount in amounts:
+            sale = models.Sale(customer_id=customer.id, status=models.SaleStatus.COMPLETED, total_amount=amount)
+            sale.payments.append(models.SalePayment(method=models.PaymentMethod.FIADO, amount=amount))
+            db.add(sale)
+            db.commit()
+            sale_ids.append(sale.id)
+        return customer.id, sale_ids
+    finally:
+        db.close()
+
+
+def _pay(customer_id, amount):
+    db = SessionLocal()
+    try:
+        return crud.create_customer_payment(db, customer_id=customer_id, amount=amount, method="dinheiro")
+    except ValueError as exc:
+        return exc
+    finally:
+        db.close()
+
+
+def test_parallel_payments_never_overallocate():
+    customer_id, sale_ids = _setup_customer_with_fiado([Decimal("60.00"), Decimal("40.00")])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: _pay(customer_id, 20), range(8)))
+
+    succeeded = [r for r in results if isinstance(r, dict)]
+    failed = [r for r in results if not isinstance(r, dict)]
+    allocated_by_payments = sum(Decimal(str(a["amount"])) for r in succeeded for a in r["allocations"])
+
+    # 100.00 of fiado settles exactly five payments of 20; the other three find nothing left to pay
+    assert len(succeeded) == 5
+    assert allocated_by_payments == Decimal("100.00")
+    assert all(r["remaining"] == 0 for r in succeeded)
+    assert [str(r) for r in failed] == ["Cliente não possui fiado em aberto."] * 3
+
+    db = SessionLocal()
+    try:
+        allocated_rows = (
+            db.query(func.coalesce(func.sum(models.CustomerPaymentAllocation.amount), 0))
+            .filter(models.CustomerPaymentAllocation.sale_id.in_(sale_ids))
+            .scalar()
+        )
+        sales = db.query(models.Sale).filter(models.Sale.id.in_(sale_ids)).all()
+        for sale in sales:
+            assert sale.fiado_allocated == sale.fiado_total
+        assert Decimal(allocated_rows) == Decimal("100.00")
+        assert sum(Decimal(s.fiado_allocated) for s in sales) == Decimal(allocated_rows)
+        assert crud.rebuild_fiado_ledger(db, sale_ids=sale_ids) == 0
+    finally:
+        db.close()
@@ -0,0 +1,112 @@
+import uuid
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+
+from app import crud, models, schemas
+from app.database import SessionLocal, init_db
+
+
+@pytest.fixture(scope="function")
+def db():
+    init_db()
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def create_product(db):
+    product = models.Product(
+        name="Produto Consolidado",
+        sku=f"DPS-{uuid.uuid4().hex[:8]}",
+        category="Test",
+        cost_price=Decimal("4.00"),
+        sale_price=Decimal("10.00"),
+        stock=100,
+        margin=Decimal("6.00"),
+    )
+    db.add(product)
+    db.commit()
+    return product
+
+
+def sale_payload(product_id, quantity):
+    return schemas.SaleCreate(
+        items=[schemas.SaleItemCreate(product_id=product_id, quantity=quantity)],
+        payments=[schemas.SalePaymentCreate(method=schemas.PaymentMethod.DINHEIRO, amount=Decimal("10.00") * quantity)],
+    )
+
+
+def rollup(db, product_id):
+    db.expire_all()
+    rows = db.execute(
+        select(
+            models.DailyProductSales.quantity,
+            models.DailyProductSales.revenue,
+            models.DailyProductSales.cost,
+        ).where(models.DailyProductSales.product_id == product_id)
+    ).all()
+    return (
+        sum(r.quantity for r in rows),
+        sum(Decimal(r.revenue) for r in rows),
+        sum(Decimal(r.cost) for r in rows),
+    )
+
+
+def test_rollup_follows_create_update_and_cancel(db):
+    product = create_product(db)
+
+    first = crud.create_sale(db, sale_payload(product.id, 2))
+    second = crud.create_sale(db, sale_payload(product.id, 3))
+    assert rollup(db, product.id) == (5, Decimal("50.00"), Decimal("20.00"))
+
+    crud.update_sale(
+        db,
+        first,
+        schemas.SaleUpdate(
+            items=[schemas.SaleItemCreate(product_id=product.id, quantity=4)],
+            payments=[schemas.SalePaymentCreate(method=schemas.PaymentMethod.DINHEIRO, amount=Decimal("40.00"))],
+        ),
+    )
+    assert rollup(db, product.id) == (7, Decimal("70.00"), Decimal("28.00"))
+
+    crud.cancel_sale(db, second)
+    assert rollup(db, product.id) == (4, Decimal("40.00"), Decimal("16.00"))
+
+
+def test_rebuild_matches_incremental_rollup(db):
+    product = create_product(db)
+    crud.create_sale(db, sale_payload(product.id, 1))
+    cancelled = crud.create_sale(db, sale_payload(product.id, 5))
+    crud.cancel_sale(db, cancelled)
+    incremental = rollup(db, product.id)
+
+    crud.rebuild_daily_product_sales(db)
+    assert rollup(db, product.id) == incremental == (1, Decimal("10.00"), Decimal("4.00"))
+
+
+def test_cost_change_does_not_drift_the_rollup(db):
+    product = create_product(db)
+    edited = crud.create_sale(db, sale_payload(product.id, 2))
+    cancelled = crud.create_sale(db, sale_payload(product.id, 3))
+    assert rollup(db, product.id) == (5, Decimal("50.00"), Decimal("20.00"))
+
+    crud.update_product(db, product, schemas.ProductUpdate(cost_price=Decimal("6.00")))
+    crud.cancel_sale(db, cancelled)
+    assert rollup(db, product.id) == (2, Decimal("20.00"), Decimal("8.00"))
+
+    crud.update_sale(
+        db,
+        edited,
+        schemas.SaleUpdate(
+            items=[schemas.SaleItemCreate(product_id=product.id, quantity=1)],
+            payments=[schemas.SalePaymentCreate(method=schemas.PaymentMethod.DINHEIRO, amount=Decimal("10.00"))],
+        ),
+    )
+    # the edited item keeps the cost it was sold at
+    incremental = rollup(db, product.id)
+    assert incremental == (1, Decimal("10.00"), Decimal("4.00"))
+
+    crud.rebuild_daily_product_sales(db)
+    assert rollup(db, product.id) == incremental
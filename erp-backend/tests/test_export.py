@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+import uuid
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import crud, models, schemas
+from app.database import SessionLocal, init_db
+from app.main import app
+
+
+@pytest.fixture(scope="module")
+def sold_product():
+    init_db()
+    db = SessionLocal()
+    try:
+        product = models.Product(
+            name="Produto Export",
+            sku=f"EXP-{uuid.uuid4().hex[:8]}",
+            category="Exportacao",
+            cost_price=Decimal("3.00"),
+            sale_price=Decimal("7.50"),
+            stock=10,
+            margin=Decimal("4.50"),
+        )
+        db.add(product)
+        db.commit()
+        for quantity in (1, 2):
+            crud.create_sale(
+                db,
+                schemas.SaleCreate(
+                    notes="exportação",
+                    items=[schemas.SaleItemCreate(product_id=product.id, quantity=quantity)],
+                    payments=[schemas.SalePaymentCreate(method=schemas.PaymentMethod.PIX, amount=Decimal("7.50") * quantity)],
+                ),
+            )
+        return product.id, product.sku
+    finally:
+        db.close()
+
+
+def test_sales_csv_and_jsonl(sold_product):
+    client = TestClient(app)
+
+    resp = client.get("/sales/export", params={"format": "csv", "status": "completed"})
+    assert resp.status_code == 200
+    assert resp.headers["content-disposition"] == 'attachment; filename="vendas.csv"'
+    rows = list(csv.DictReader(io.StringIO(resp.content.decode("utf-8-sig"))))
+    ours = [r for r in rows if r["notes"] == "exportação"]
+    assert sorted(Decimal(r["total_amount"]) for r in ours)[-2:] == [Decimal("7.50"), Decimal("15.00")]
+    assert all(r["status"] == "completed" for r in rows)
+
+    lines = [json.loads(line) for line in client.get("/sales/export", params={"format": "jsonl"}).text.splitlines()]
+    assert {"id", "created_at", "customer_name", "fiado_pending"} <= set(lines[0])
+    assert isinstance(lines[0]["total_amount"], float)
+
+    assert client.get("/sales/export", params={"from_date": "ontem"}).status_code == 400
+    assert client.get("/sales/export", params={"format": "pdf"}).status_code == 422
+
+
+def test_products_report_xlsx(sold_product):
+    openpyxl = pytest.importorskip("openpyxl")
+    _, sku = sold_product
+    client = TestClient(app)
+
+    resp = client.get("/reports/products/export", params={"format": "xlsx", "sku": sku})
+    assert resp.status_code == 200
+    sheet = openpyxl.load_workbook(io.BytesIO(resp.content)).active
+    header, *values = [[cell.value for cell in row] for row in sheet.iter_rows()]
+    row = dict(zip(header, values[0]))
+    assert len(values) == 1
+    assert (row["sku"], row["quantity_sold"], float(row["total_sold"]), row["stock"]) == (sku, 3, 22.5, 7)
+
+
+def test_xlsx_continues_on_a_new_sheet_past_the_row_limit(monkeypatch):
+    openpyxl = pytest.importorskip("openpyxl")
+    from app.services import export
+
+    monkeypatch.setattr(export, "XLSX_SHEET_ROWS", 2)
+    content = b"".join(export._xlsx_chunks(iter([["id", "name"], (1, "a"), (2, "b"), (3, "c")])))
+    sheets = [
+        [[cell.value for cell in row] for row in sheet.iter_rows()]
+        for sheet in openpyxl.load_workbook(io.BytesIO(content)).worksheets
+    ]
+    assert sheets == [[["id", "name"], [1, "a"], [2, "b"]], [["id", "name"], [3, "c"]]]
+
+    empty = openpyxl.load_workbook(io.BytesIO(b"".join(export._xlsx_chunks(iter([["id"]])))))
+    assert [[cell.value for cell in row] for row in empty.active.iter_rows()] == [["id"]]
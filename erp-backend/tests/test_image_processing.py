@@ -0,0 +1,60 @@
+import asyncio
+import uuid
+from io import BytesIO
+
+import pytest
+from fastapi import UploadFile
+from PIL import Image
+from starlette.datastructures import Headers
+
+from app.services import image_processing
+from app.services.image_processing import MEDIA_ROOT, ImageProcessingError, convert_many_to_webp
+
+
+def make_upload(data: bytes, content_type: str = "image/png") -> UploadFile:
+    return UploadFile(file=BytesIO(data), filename="foto.png", headers=Headers({"content-type": content_type}))
+
+
+def png_bytes(size=(64, 48)) -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", size, (200, 30, 30)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def shutdown_pool():
+    yield
+    image_processing.shutdown_image_pool()
+
+
+def test_convert_many_writes_webp_files_in_parallel():
+    prefix = f"test-{uuid.uuid4().hex[:8]}"
+    paths = asyncio.run(convert_many_to_webp([make_upload(png_bytes()), make_upload(png_bytes())], prefix=prefix))
+    try:
+        assert len(paths) == 2
+        for public_path in paths:
+            with Image.open(MEDIA_ROOT / public_path.split("/")[-1]) as img:
+                assert img.format == "WEBP"
+            for size, derivative in image_processing.derivative_paths(public_path).items():
+                with Image.open(MEDIA_ROOT / derivative.split("/")[-1]) as img:
+                    assert max(img.size) <= int(size)
+    finally:
+        image_processing.remove_product_photos(paths)
+
+
+def test_derivatives_are_downscaled_and_removed_with_the_photo():
+    prefix = f"test-{uuid.uuid4().hex[:8]}"
+    [path] = asyncio.run(convert_many_to_webp([make_upload(png_bytes((1600, 800)))], prefix=prefix))
+    with Image.open(MEDIA_ROOT / image_processing.derivative_paths(path)["512"].split("/")[-1]) as img:
+        assert img.size == (512, 256)
+
+    image_processing.remove_product_photos([path])
+    assert list(MEDIA_ROOT.glob(f"{prefix}-*")) == []
+
+
+def test_convert_many_cleans_up_when_one_file_fails():
+    prefix = f"test-{uuid.uuid4().hex[:8]}"
+    uploads = [make_upload(png_bytes()), make_upload(b"not an image")]
+    with pytest.raises(ImageProcessingError):
+        asyncio.run(convert_many_to_webp(uploads, prefix=prefix))
+    assert list(MEDIA_ROOT.glob(f"{prefix}-*")) == []
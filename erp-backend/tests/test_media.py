@@ -0,0 +1,86 @@
+import gzip
+from uuid import uuid4
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.image_processing import MEDIA_ROOT
+from app.services.media import IMMUTABLE_CACHE_CONTROL, MediaFiles
+
+
+def _stored_file(content: bytes) -> str:
+    filename = f"product-0-{uuid4().hex}.webp"
+    (MEDIA_ROOT / filename).write_bytes(content)
+    return filename
+
+
+def test_photos_are_immutable_and_revalidate_by_etag():
+    filename = _stored_file(b"0123456789")
+    client = TestClient(app)
+    try:
+        response = client.get(f"/media/products/{filename}")
+        assert response.status_code == 200
+        assert response.content == b"0123456789"
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+        assert response.headers["etag"] == f'"{filename}"'
+        assert response.headers["content-type"] == "image/webp"
+
+        head = client.head(f"/media/products/{filename}")
+        assert head.status_code == 200 and head.content == b""
+        assert head.headers["content-length"] == "10"
+
+        cached = client.get(f"/media/products/{filename}", headers={"If-None-Match": f'W/"{filename}"'})
+        assert cached.status_code == 304 and cached.content == b""
+        assert cached.headers["etag"] == f'"{filename}"'
+    finally:
+        (MEDIA_ROOT / filename).unlink()
+
+
+def test_byte_ranges():
+    filename = _stored_file(b"0123456789")
+    client = TestClient(app)
+    url = f"/media/products/{filename}"
+    try:
+        part = client.get(url, headers={"Range": "bytes=2-5"})
+        assert part.status_code == 206
+        assert part.content == b"2345"
+        assert part.headers["content-range"] == "bytes 2-5/10"
+
+        assert client.get(url, headers={"Range": "bytes=-3"}).content == b"789"
+        assert client.get(url, headers={"Range": "bytes=7-"}).content == b"789"
+
+        unsatisfiable = client.get(url, headers={"Range": "bytes=20-"})
+        assert unsatisfiable.status_code == 416
+        assert unsatisfiable.headers["content-range"] == "bytes */10"
+
+        # a stale If-Range falls back to the full body
+        stale = client.get(url, headers={"Range": "bytes=0-1", "If-Range": '"other"'})
+        assert stale.status_code == 200 and stale.content == b"0123456789"
+    finally:
+        (MEDIA_ROOT / filename).unlink()
+
+
+def test_sendfile_and_precompressed_paths(tmp_path):
+    (tmp_path / "a.svg").write_bytes(b"<svg/>")
+    (tmp_path / "a.svg.gz").write_bytes(gzip.compress(b"<svg/>"))
+    media_app = FastAPI()
+    media_app.mount("/precompressed", MediaFiles(directory=tmp_path, precompressed=True))
+    media_app.mount(
+        "/sendfile",
+        MediaFiles(directory=tmp_path, sendfile_header="X-Accel-Redirect", sendfile_prefix="/internal/"),
+    )
+    client = TestClient(media_app)
+
+    encoded = client.get("/precompressed/a.svg", headers={"Accept-Encoding": "gzip"})
+    assert encoded.headers["content-encoding"] == "gzip"
+    assert encoded.headers["vary"] == "Accept-Encoding"
+    assert encoded.headers["etag"] == '"a.svg.gz"'
+    assert encoded.headers["content-length"] == str((tmp_path / "a.svg.gz").stat().st_size)
+    identity = client.get("/precompressed/a.svg", headers={"Accept-Encoding": "identity"})
+    assert identity.content == b"<svg/>"
+
+    delegated = client.get("/sendfile/a.svg")
+    assert delegated.status_code == 200 and delegated.content == b""
+    assert delegated.headers["x-accel-redirect"] == "/internal/a.svg"
+    assert delegated.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
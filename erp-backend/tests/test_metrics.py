@@ -0,0 +1,60 @@
+import re
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import metrics
+
+SAMPLE_LINE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? -?[0-9.e+-]+$|^\S+ \+Inf$')
+
+
+def test_metrics_endpoint_exposes_requests_pools_and_business_counters():
+    created_before = metrics.sales_created.value(source="pos")
+    cancelled_before = metrics.sales_cancelled.value()
+
+    with TestClient(app) as client:
+        product = client.post(
+            "/products",
+            json={"name": "Produto Metricas", "sku": f"MET-{uuid.uuid4().hex[:8]}", "category": "Test",
+                  "cost_price": 4, "sale_price": 10, "stock": 5},
+        ).json()
+        sale = client.post(
+            "/sales",
+            json={"items": [{"product_id": product["id"], "quantity": 1}], "payments": [{"method": "pix", "amount": 10}]},
+        )
+        assert sale.status_code == 201, sale.text
+        assert client.post(f"/sales/{sale.json()['id']}/cancel").status_code == 200
+        client.get("/products/does-not-exist/anything")
+
+        resp = client.get("/metrics")
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = resp.text
+    for line in body.splitlines():
+        assert line.startswith("# ") or SAMPLE_LINE.match(line), line
+
+    assert metrics.sales_created.value(source="pos") == created_before + 1
+    assert metrics.sales_cancelled.value() == cancelled_before + 1
+    assert 'http_request_duration_seconds_count{method="POST",route="/sales/{sale_id}/cancel",status="200"}' in body
+    assert 'route="unmatched",status="404"' in body
+    assert 'db_pool_checked_out{engine="sync"}' in body
+    assert re.search(r"^threadpool_max_threads \d+$", body, re.M)
+    assert "# TYPE image_conversion_duration_seconds histogram" in body
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("test_latency_seconds", "Test.", ("op",), buckets=(0.1, 1.0))
+    try:
+        for value in (0.05, 0.5, 0.5, 3):
+            histogram.observe(value, op="x")
+        assert histogram.samples() == [
+            'test_latency_seconds_bucket{op="x",le="0.1"} 1',
+            'test_latency_seconds_bucket{op="x",le="1"} 3',
+            'test_latency_seconds_bucket{op="x",le="+Inf"} 4',
+            'test_latency_seconds_sum{op="x"} 4.05',
+            'test_latency_seconds_count{op="x"} 4',
+        ]
+    finally:
+        metrics._registry.remove(histogram)
@@ -0,0 +1,56 @@
+import uuid
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+
+from app import models
+from app.database import SessionLocal, init_db
+from app.main import app
+
+
+def create_products(prefix, count):
+    init_db()
+    db = SessionLocal()
+    try:
+        for i in range(count):
+            db.add(models.Product(
+                name=f"{prefix} {i % 3}",
+                sku=f"PG-{uuid.uuid4().hex[:8]}",
+                category="Test",
+                cost_price=Decimal("1.00"),
+                sale_price=Decimal("2.00"),
+                stock=1,
+                margin=Decimal("1.00"),
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_products_keyset_pages_walk_every_row_once():
+    prefix = f"Paginado-{uuid.uuid4().hex[:6]}"
+    create_products(prefix, 7)
+    client = TestClient(app)
+
+    seen = []
+    params = {"name": prefix, "limit": 3, "cursor": ""}
+    while True:
+        resp = client.get("/products", params=params)
+        assert resp.status_code == 200
+        seen.extend((p["name"], p["id"]) for p in resp.json())
+        token = resp.headers.get("X-Next-Cursor")
+        if not token:
+            break
+        assert 'rel="next"' in resp.headers["Link"]
+        params["cursor"] = token
+
+    assert len(seen) == 7
+    assert seen == sorted(seen)
+
+
+def test_offset_mode_and_invalid_cursor():
+    client = TestClient(app)
+    resp = client.get("/products", params={"skip": 0, "limit": 1})
+    assert resp.status_code == 200
+    assert "X-Next-Cursor" not in resp.headers
+    assert client.get("/products", params={"cursor": "not-a-cursor"}).status_code == 400
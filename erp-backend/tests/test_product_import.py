@@ -0,0 +1,69 @@
+import io
+import json
+import uuid
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+
+from app import models
+from app.database import SessionLocal, init_db
+from app.main import app
+from app.services.product_import import import_products, iter_records
+
+
+def _product(sku):
+    db = SessionLocal()
+    try:
+        return db.query(models.Product).filter(models.Product.sku == sku).one()
+    finally:
+        db.close()
+
+
+def test_csv_import_upserts_and_reports_bad_rows():
+    init_db()
+    prefix = f"IMP-{uuid.uuid4().hex[:6]}"
+    csv_body = (
+        "name,sku,category,cost_price,sale_price,stock\n"
+        f"Camiseta,{prefix}-1,Roupas,10,25,7\n"
+        f"Calca,{prefix}-2,Roupas,abc,50,1\n"
+        f'"Vestido, longo",{prefix}-3,Roupas,30,80,\n'
+    )
+    client = TestClient(app)
+
+    resp = client.post("/products/import", params={"format": "csv", "chunk_size": 2}, content=csv_body.encode())
+    assert resp.status_code == 200
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert lines[-1]["done"] is True
+    assert lines[-1]["processed"] == 3 and lines[-1]["upserted"] == 2 and lines[-1]["failed"] == 1
+    errors = [e for line in lines for e in line["errors"]]
+    assert errors[0]["line"] == 3 and errors[0]["sku"] == f"{prefix}-2" and "cost_price" in errors[0]["error"]
+
+    first = _product(f"{prefix}-1")
+    assert (first.stock, first.margin) == (7, Decimal("15.00"))
+    assert _product(f"{prefix}-3").name == "Vestido, longo"
+
+    # price-only update: margin recomputed in SQL, stock left alone
+    update = f"name,sku,category,cost_price,sale_price\nCamiseta,{prefix}-1,Roupas,12,30\n"
+    client.post("/products/import", content=update.encode())
+    first = _product(f"{prefix}-1")
+    assert (first.stock, first.cost_price, first.margin) == (7, Decimal("12.00"), Decimal("18.00"))
+
+
+def test_jsonl_records_and_parse_errors():
+    init_db()
+    sku = f"IMP-{uuid.uuid4().hex[:6]}"
+    body = (
+        json.dumps({"name": "Bone", "sku": sku, "category": "Acessorios", "cost_price": 5, "sale_price": 12,
+                    "extra_attributes": {"cor": ["azul"]}})
+        + "\n\nnot json\n[1, 2]\n"
+    )
+    db = SessionLocal()
+    try:
+        progress = list(import_products(db, iter_records(io.BytesIO(body.encode()), "jsonl")))
+    finally:
+        db.close()
+
+    final = progress[-1]
+    assert (final["processed"], final["upserted"], final["failed"]) == (3, 1, 2)
+    assert [e["line"] for e in final["errors"]] == [3, 4]
+    assert _product(sku).extra_attributes == {"cor": ["azul"]}
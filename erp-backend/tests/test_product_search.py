@@ -0,0 +1,28 @@
+import uuid
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+
+from app import models
+from app.database import SessionLocal, init_db
+from app.main import app
+
+
+def test_search_matches_name_substring_and_sku_prefix_only():
+    init_db()
+    tag = uuid.uuid4().hex[:6]
+    db = SessionLocal()
+    try:
+        for name, sku in [(f"Camiseta 100% {tag}", f"S{tag}-1"), (f"Bermuda {tag}", f"X{tag}-2"), ("Outro", f"Z-S{tag}")]:
+            db.add(models.Product(name=name, sku=sku, category="Test", cost_price=Decimal("1"), sale_price=Decimal("3"), stock=2, margin=Decimal("2")))
+        db.commit()
+    finally:
+        db.close()
+    client = TestClient(app)
+
+    by_name = client.get("/products/search", params={"q": f"100% {tag}"}).json()
+    assert [p["sku"] for p in by_name] == [f"S{tag}-1"]
+    assert set(by_name[0]) == {"id", "name", "sku", "sale_price", "stock"}
+
+    by_sku = client.get("/products/search", params={"q": f"s{tag}"}).json()
+    assert [p["sku"] for p in by_sku] == [f"S{tag}-1"]
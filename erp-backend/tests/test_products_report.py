@@ -0,0 +1,56 @@
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from app import crud, models
+from app.database import SessionLocal, init_db
+
+
+@pytest.fixture(scope="function")
+def db():
+    init_db()
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def create_product(db, category, cost, price, stock):
+    product = models.Product(
+        name="Produto Relatorio",
+        sku=f"REP-{uuid.uuid4().hex[:8]}",
+        category=category,
+        cost_price=Decimal(cost),
+        sale_price=Decimal(price),
+        stock=stock,
+        margin=Decimal(price) - Decimal(cost),
+    )
+    db.add(product)
+    db.commit()
+    db.refresh(product)
+    return product
+
+
+def sell(db, product, quantity, status=models.SaleStatus.COMPLETED):
+    line_total = product.sale_price * quantity
+    sale = models.Sale(status=status, total_amount=line_total)
+    sale.items.append(models.SaleItem(product_id=product.id, quantity=quantity, unit_price=product.sale_price, line_total=line_total))
+    sale.payments.append(models.SalePayment(method=models.PaymentMethod.PIX, amount=line_total))
+    db.add(sale)
+    db.commit()
+
+
+def test_report_totals_cover_all_matches_and_sold_covers_page(db):
+    category = f"Cat-{uuid.uuid4().hex[:6]}"
+    first = create_product(db, category, "2.50", "5.00", 4)
+    second = create_product(db, category, "10.00", "15.00", 3)
+    sell(db, first, 2)
+    sell(db, first, 1, status=models.SaleStatus.CANCELLED)
+
+    report = crud.list_products_report(db, category=category, limit=1)
+
+    assert report["totals"] == {"total_products": 2, "total_cost": 40.0, "total_sale": 65.0}
+    assert len(report["products"]) == 1
+    page = crud.list_products_report(db, category=category, limit=10)["products"]
+    sold = {p["id"]: p["total_sold"] for p in page}
+    assert sold == {first.id: 10.0, second.id: 0.0}
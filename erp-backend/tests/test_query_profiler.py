@@ -0,0 +1,45 @@
+import logging
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import query_profiler
+
+
+def test_profiler_reports_statements_per_request(monkeypatch, caplog):
+    monkeypatch.setattr(query_profiler.settings, "enabled", True)
+    monkeypatch.setattr(query_profiler.settings, "stack_threshold", 1)
+    name = f"Perfil {uuid.uuid4().hex[:8]}"
+
+    with TestClient(app) as client, caplog.at_level(logging.WARNING, logger=query_profiler.__name__):
+        # sync route: lookup by name + INSERT ... RETURNING
+        created = client.post("/categories", json={"name": name})
+        assert created.status_code == 201, created.text
+        timing = created.headers["server-timing"]
+        assert timing.startswith('db;desc="2 queries";dur=') and ", total;dur=" in timing
+
+        # async route
+        listed = client.get("/customers", params={"limit": 5})
+        assert listed.status_code == 200
+        assert 'queries";dur=' in listed.headers["server-timing"]
+
+        profiles = client.get("/debug/profile", params={"limit": 2}).json()
+
+    assert [p["path"] for p in profiles] == ["/customers", "/categories"]
+    category = profiles[1]
+    assert category["method"] == "POST" and category["status"] == 201 and category["queries"] == 2
+    assert len(category["slowest"]) == 2
+    assert any(entry["sql"].startswith("INSERT INTO categories") for entry in category["slowest"])
+
+    logged = "\n".join(record.getMessage() for record in caplog.records)
+    assert "POST /categories ran 2 statements" in logged
+    assert "create_category" in logged
+
+
+def test_profiler_is_off_by_default(monkeypatch):
+    monkeypatch.setattr(query_profiler.settings, "enabled", False)
+    with TestClient(app) as client:
+        resp = client.get("/categories")
+        assert "server-timing" not in resp.headers
+        assert client.get("/debug/profile").status_code == 404
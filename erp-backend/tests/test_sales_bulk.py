@@ -0,0 +1,133 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+
+from app import crud, models, schemas
+from app.database import SessionLocal, init_db
+from app.main import app
+
+
+def _setup(stock):
+    init_db()
+    db = SessionLocal()
+    try:
+        customer = models.Customer(name="Cliente Offline", phone=f"11{uuid.uuid4().hex[:9]}")
+        product = models.Product(
+            name="Produto Offline",
+            sku=f"OFF-{uuid.uuid4().hex[:8]}",
+            category="Test",
+            cost_price=Decimal("4.00"),
+            sale_price=Decimal("10.00"),
+            stock=stock,
+            margin=Decimal("6.00"),
+        )
+        db.add_all([customer, product])
+        db.commit()
+        return customer.id, product.id
+    finally:
+        db.close()
+
+
+def _sale(key, product_id, quantity, method="dinheiro", customer_id=None, created_at=None):
+    payload = {
+        "idempotency_key": key,
+        "customer_id": customer_id,
+        "items": [{"product_id": product_id, "quantity": quantity}],
+        "payments": [{"method": method, "amount": 10 * quantity}],
+    }
+    if created_at:
+        payload["created_at"] = created_at
+    return payload
+
+
+def test_bulk_import_is_idempotent_and_reports_per_sale():
+    customer_id, product_id = _setup(stock=5)
+    prefix = uuid.uuid4().hex[:8]
+    batch = [
+        _sale(f"{prefix}-1", product_id, 2, created_at="2026-10-01T10:00:00+00:00"),
+        _sale(f"{prefix}-2", product_id, 4),  # would oversell after the first sale
+        _sale(f"{prefix}-3", product_id, 3, method="fiado", customer_id=customer_id),
+        _sale(f"{prefix}-1", product_id, 1),  # repeated key in the same batch
+    ]
+    client = TestClient(app)
+
+    first = client.post("/sales/bulk", json={"sales": batch})
+    assert first.status_code == 200, first.text
+    body = first.json()
+    assert (body["created"], body["duplicates"], body["errors"]) == (2, 1, 1)
+    statuses = [r["status"] for r in body["results"]]
+    assert statuses == ["created", "error", "created", "duplicate"]
+    assert "Estoque insuficiente" in body["results"][1]["detail"]
+
+    replay = client.post("/sales/bulk", json={"sales": batch[:1] + batch[2:3]}).json()
+    assert [r["status"] for r in replay["results"]] == ["duplicate", "duplicate"]
+    assert [r["sale_id"] for r in replay["results"]] == [body["results"][0]["sale_id"], body["results"][2]["sale_id"]]
+
+    db = SessionLocal()
+    try:
+        assert db.get(models.Product, product_id).stock == 0
+        offline = crud.get_sale(db, body["results"][0]["sale_id"])
+        assert offline.created_at.replace(tzinfo=timezone.utc) == datetime(2026, 10, 1, 10, tzinfo=timezone.utc)
+        assert [(i.quantity, float(i.line_total)) for i in offline.items] == [(2, 20.0)]
+        assert crud.get_customer_balance(db, customer_id) == 30.0
+        assert crud.rebuild_fiado_ledger(db) == 0
+    finally:
+        db.close()
+
+
+def test_bulk_rejects_unknown_products_and_customers():
+    _, product_id = _setup(stock=1)
+    prefix = uuid.uuid4().hex[:8]
+    db = SessionLocal()
+    try:
+        results = crud.create_sales_bulk(
+            db,
+            [
+                schemas.SaleBulkItem(**_sale(f"{prefix}-a", 999999, 1)),
+                schemas.SaleBulkItem(**_sale(f"{prefix}-b", product_id, 1, customer_id=999999)),
+            ],
+        )
+    finally:
+        db.close()
+    assert [r["status"] for r in results] == ["error", "error"]
+    assert results[0]["detail"] == "Produto 999999 nao encontrado."
+    assert results[1]["detail"] == "Cliente informado nao existe."
+
+
+def test_bulk_replay_into_a_closed_cashbox():
+    _, product_id = _setup(stock=10)
+    prefix = uuid.uuid4().hex[:8]
+    db = SessionLocal()
+    try:
+        closed = crud.create_cashbox(db, name="Caixa Offline", initial_amount=0.0)
+        crud.open_cashbox(db, closed.id)
+        crud.close_cashbox(db, closed.id, closed_amount=0.0)
+        # yesterday's session
+        now = datetime.now(timezone.utc)
+        closed.opened_at, closed.closed_at = now - timedelta(days=1, hours=8), now - timedelta(days=1)
+        db.commit()
+        current = crud.create_cashbox(db, name="Caixa Atual", initial_amount=0.0)
+        crud.open_cashbox(db, current.id)
+
+        during = schemas.SaleBulkItem(
+            **_sale(f"{prefix}-a", product_id, 1, created_at=(now - timedelta(days=1, hours=2)).isoformat()), cashbox_id=closed.id
+        )
+        after = schemas.SaleBulkItem(**_sale(f"{prefix}-b", product_id, 2, created_at=now.isoformat()), cashbox_id=closed.id)
+        unknown = schemas.SaleBulkItem(**_sale(f"{prefix}-c", product_id, 1), cashbox_id=999999)
+        results = crud.create_sales_bulk(db, [during, after, unknown])
+
+        assert [r["status"] for r in results] == ["created", "created", "error"]
+        assert results[0]["detail"] is None
+        assert "caixa aberto" in results[1]["detail"]
+        assert results[2]["detail"] == "Caixa informado nao existe."
+        assert [p.cashbox_id for p in crud.get_sale(db, results[0]["sale_id"]).payments] == [closed.id]
+        assert [p.cashbox_id for p in crud.get_sale(db, results[1]["sale_id"]).payments] == [current.id]
+
+        report = crud.cashbox_report(db, closed.id)
+        assert report["payments"] == [{"method": "dinheiro", "amount": 10.0}]
+        assert report["cash_balance"] == report["expected_cash"] == 10.0
+        assert crud.cashbox_report(db, current.id)["cash_balance"] == 20.0
+    finally:
+        db.close()
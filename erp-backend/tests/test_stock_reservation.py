@@ -0,0 +1,100 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+
+from app import crud, models, schemas
+from app.database import SessionLocal, init_db
+
+
+@pytest.fixture(scope="function")
+def db():
+    init_db()
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def create_product(db, stock):
+    product = models.Product(
+        name="Produto Estoque",
+        sku=f"STK-{uuid.uuid4().hex[:8]}",
+        category="Test",
+        cost_price=Decimal("5.00"),
+        sale_price=Decimal("10.00"),
+        stock=stock,
+        margin=Decimal("5.00"),
+    )
+    db.add(product)
+    db.commit()
+    db.refresh(product)
+    return product
+
+
+def sale_payload(*lines):
+    total = sum(Decimal("10.00") * qty for _, qty in lines)
+    return schemas.SaleCreate(
+        items=[schemas.SaleItemCreate(product_id=pid, quantity=qty) for pid, qty in lines],
+        payments=[schemas.SalePaymentCreate(method=schemas.PaymentMethod.DINHEIRO, amount=total)],
+    )
+
+
+def current_stock(product_id):
+    session = SessionLocal()
+    try:
+        return session.get(models.Product, product_id).stock
+    finally:
+        session.close()
+
+
+def test_sale_decrements_and_cancel_restores(db):
+    product = create_product(db, stock=5)
+
+    sale = crud.create_sale(db, sale_payload((product.id, 2), (product.id, 1)))
+    assert current_stock(product.id) == 2
+
+    crud.cancel_sale(db, sale)
+    assert current_stock(product.id) == 5
+
+
+def test_oversell_is_rejected_without_touching_stock(db):
+    first = create_product(db, stock=5)
+    second = create_product(db, stock=1)
+
+    with pytest.raises(ValueError, match="Estoque insuficiente"):
+        crud.create_sale(db, sale_payload((first.id, 3), (second.id, 1), (second.id, 1)))
+
+    assert current_stock(first.id) == 5
+    assert current_stock(second.id) == 1
+
+
+def test_update_sale_moves_stock_between_products(db):
+    first = create_product(db, stock=5)
+    second = create_product(db, stock=5)
+    sale = crud.create_sale(db, sale_payload((first.id, 3)))
+
+    update = sale_payload((second.id, 1))
+    crud.update_sale(db, sale, schemas.SaleUpdate(items=update.items, payments=update.payments))
+
+    assert current_stock(first.id) == 5
+    assert current_stock(second.id) == 4
+
+
+def test_concurrent_checkouts_cannot_both_take_last_unit(db):
+    product = create_product(db, stock=1)
+
+    def checkout(_):
+        session = SessionLocal()
+        try:
+            return crud.create_sale(session, sale_payload((product.id, 1))).id
+        except ValueError as exc:
+            return exc
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(checkout, range(4)))
+
+    assert len([r for r in results if isinstance(r, int)]) == 1
+    assert current_stock(product.id) == 0
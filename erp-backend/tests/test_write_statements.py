@@ -0,0 +1,86 @@
+import uuid
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+
+from app import crud, models, schemas
+from app.database import SessionLocal, engine, init_db
+
+
+@pytest.fixture(scope="function")
+def db():
+    init_db()
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def statements():
+    recorded: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        recorded.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield recorded
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def serialize_sale(sale):
+    return schemas.Sale.model_validate(sale).model_dump()
+
+
+def test_sale_writes_serialize_without_reloading(db, statements):
+    product = crud.create_product(
+        db,
+        schemas.ProductCreate(
+            name="Produto RETURNING", sku=f"RET-{uuid.uuid4().hex[:8]}", category="Test",
+            cost_price=Decimal("4.00"), sale_price=Decimal("10.00"), stock=10,
+        ),
+    )
+    assert product.created_at is not None and product.margin == Decimal("6.00")
+    customers = [crud.create_customer(db, schemas.CustomerCreate(name=f"Cliente {i}")) for i in range(2)]
+
+    sale = crud.create_sale(
+        db,
+        schemas.SaleCreate(
+            customer_id=customers[0].id,
+            items=[schemas.SaleItemCreate(product_id=product.id, quantity=3)],
+            payments=[schemas.SalePaymentCreate(method=schemas.PaymentMethod.PIX, amount=Decimal("30.00"))],
+        ),
+    )
+    statements.clear()
+    body = serialize_sale(sale)
+    assert statements == []
+    assert body["created_at"] is not None and body["payments"][0]["id"]
+    assert body["customer"]["id"] == customers[0].id
+    # the in-memory product follows the relative stock UPDATE
+    assert body["items"][0]["product"]["stock"] == 7
+
+    sale = crud.update_sale(
+        db,
+        sale,
+        schemas.SaleUpdate(
+            customer_id=customers[1].id,
+            items=[schemas.SaleItemCreate(product_id=product.id, quantity=1)],
+            payments=[schemas.SalePaymentCreate(method=schemas.PaymentMethod.PIX, amount=Decimal("10.00"))],
+        ),
+    )
+    statements.clear()
+    body = serialize_sale(sale)
+    assert statements == []
+    assert body["customer"]["id"] == customers[1].id
+    assert body["items"][0]["product"]["stock"] == 9
+
+    sale = crud.cancel_sale(db, sale)
+    statements.clear()
+    assert serialize_sale(sale)["items"][0]["product"]["stock"] == 10
+    assert statements == []
+
+    fresh = SessionLocal()
+    try:
+        assert fresh.get(models.Product, product.id).stock == 10
+    finally:
+        fresh.close()
@@ -191,6 +191,17 @@ export default function CashboxModal({ onClose, onUpdated }) {
                 ))}
               </ul>
 
+              {(report.settlements || []).length > 0 && (
+                <>
+                  <p className="mt-2"><strong>Recebimentos de fiado</strong></p>
+                  <ul>
+                    {report.settlements.map((p) => (
+                      <li key={p.method}>{p.method}: R$ {Number(p.amount).toFixed(2)}</li>
+                    ))}
+                  </ul>
+                </>
+              )}
+
               <p className="mt-2"><strong>Ajustes & Entradas/Lançamentos</strong></p>
               <ul>
                 {(report.entries || []).map((e, idx) => (
@@ -262,7 +262,8 @@ export default function ProductsView({ products, loading, onCreate = () => {}, o
     </thead>
     <tbody className="text-sm">
       {filtered.map((product) => {
-        const photo = product.photos?.[0] || "";
+        // 128px derivative for the grid thumbnail; full-size original only as a fallback
+        const photo = product.photo_variants?.[0]?.["128"] || product.photos?.[0] || "";
         const photoUrl = photo ? resolveMediaUrl(photo) : "";
         const placeholderInitial = product.name?.charAt(0)?.toUpperCase() || "P";
         // Prefer backend-provided stock when available, otherwise fallback to local heuristic
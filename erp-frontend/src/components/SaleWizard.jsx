@@ -1226,7 +1226,7 @@ function ProductPickerModal({ products, search, onSearchChange, onClose, onAdd }
                     <td className="px-4 py-3">
                       {product.photos && product.photos.length ? (
                         <button onClick={() => setPreviewUrl(resolveMediaUrl(product.photos[0]))} className="rounded overflow-hidden focus:outline-none">
-                          <img src={resolveMediaUrl(product.photos[0])} alt={product.name} className="h-10 w-10 rounded object-cover cursor-pointer" />
+                          <img src={resolveMediaUrl(product.photo_variants?.[0]?.["128"] || product.photos[0])} alt={product.name} className="h-10 w-10 rounded object-cover cursor-pointer" />
                         </button>
                       ) : (
                         <div className="h-10 w-10 rounded bg-neutral-100 dark:bg-white/5" />
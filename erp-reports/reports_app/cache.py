@@ -0,0 +1,173 @@
+"""Result cache for reports (curated templates and non-streamed ad-hoc queries).
+
+Keys cover entity, template or columns, filters, limit and tenant. Two tiers:
+
+- an in-process LRU (REPORTS_CACHE_MAX_ENTRIES, default 256);
+- optionally a SQLite file shared by every worker on the host (REPORTS_CACHE_SQLITE_PATH).
+
+Entries live for REPORTS_CACHE_TTL seconds (default 300) and are only served while the data
+watermark they were computed under is still current, so a sale, a financial entry or a product
+change is visible on the next request. The TTL bounds what the watermark cannot see (row deletes).
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+# shared-tier rows past their TTL are purged every this many writes
+_PURGE_EVERY = 200
+
+
+def data_watermark(cursor):
+    """High-water mark of the tables reports read; each part is an index-only max() lookup."""
+    cursor.execute(
+        "SELECT (SELECT max(id) FROM sales), (SELECT max(updated_at) FROM sales), "
+        "(SELECT max(updated_at) FROM financial_entries), (SELECT max(updated_at) FROM products)"
+    )
+    return '|'.join('' if v is None else str(v) for v in cursor.fetchone())
+
+
+def make_key(*parts):
+    raw = json.dumps(parts, sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class _LRUTier:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, max_entries):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class _SQLiteTier:
+    """Cache rows in a SQLite file; payloads are stored as the JSON the client receives."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS report_cache ('
+                'key TEXT PRIMARY KEY, watermark TEXT NOT NULL, expires_at REAL NOT NULL, payload TEXT NOT NULL)'
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            'SELECT expires_at, watermark, payload FROM report_cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def set(self, key, entry):
+        expires_at, watermark, payload = entry
+        conn = self._conn()
+        conn.execute(
+            'INSERT OR REPLACE INTO report_cache (key, watermark, expires_at, payload) VALUES (?, ?, ?, ?)',
+            (key, watermark, expires_at, json.dumps(payload, cls=DjangoJSONEncoder)),
+        )
+        self._writes += 1
+        if self._writes % _PURGE_EVERY == 0:
+            conn.execute('DELETE FROM report_cache WHERE expires_at < ?', (time.time(),))
+
+    def delete(self, key):
+        self._conn().execute('DELETE FROM report_cache WHERE key = ?', (key,))
+
+    def clear(self):
+        self._conn().execute('DELETE FROM report_cache')
+
+
+class ReportCache:
+    def __init__(self):
+        self._lru = _LRUTier()
+        self._shared = None
+        self._shared_path = None
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'REPORTS_CACHE_TTL', 300)
+
+    @property
+    def max_entries(self):
+        return getattr(settings, 'REPORTS_CACHE_MAX_ENTRIES', 256)
+
+    def _shared_tier(self):
+        path = getattr(settings, 'REPORTS_CACHE_SQLITE_PATH', None)
+        if path != self._shared_path:
+            self._shared = _SQLiteTier(path) if path else None
+            self._shared_path = path
+        return self._shared
+
+    @staticmethod
+    def _fresh(entry, watermark):
+        # wall-clock expiry so entries written by other processes compare correctly
+        return entry is not None and entry[0] >= time.time() and entry[1] == watermark
+
+    def get(self, key, watermark):
+        entry = self._lru.get(key)
+        if self._fresh(entry, watermark):
+            return entry[2]
+        if entry is not None:
+            self._lru.delete(key)
+        shared = self._shared_tier()
+        if shared is None:
+            return None
+        entry = shared.get(key)
+        if not self._fresh(entry, watermark):
+            if entry is not None:
+                shared.delete(key)
+            return None
+        self._lru.set(key, entry, self.max_entries)
+        return entry[2]
+
+    def set(self, key, watermark, payload):
+        if self.ttl <= 0:
+            return
+        entry = (time.time() + self.ttl, watermark, payload)
+        self._lru.set(key, entry, self.max_entries)
+        shared = self._shared_tier()
+        if shared is not None:
+            shared.set(key, entry)
+
+    def clear(self):
+        self._lru.clear()
+        shared = self._shared_tier()
+        if shared is not None:
+            shared.clear()
+
+
+report_cache = ReportCache()
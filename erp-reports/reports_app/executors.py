@@ -0,0 +1,128 @@
+"""Executors for the curated report templates.
+
+Each entry of metadata.REPORTS[entity]['templates'] names its executor through the 'executor' key.
+An executor declares the parameters it accepts, builds its SQL and post-processes the rows; the SQL
+runs as a prepared statement (see sql.execute_prepared).
+"""
+from datetime import date
+from decimal import Decimal
+
+from .sql import date_range_clause, execute_prepared
+
+EXECUTORS = {}
+
+MAX_TOP_N = 5000
+
+
+def register(name):
+    def decorator(cls):
+        EXECUTORS[name] = cls
+        return cls
+    return decorator
+
+
+def get_executor(name):
+    cls = EXECUTORS.get(name)
+    return cls() if cls else None
+
+
+class TemplateExecutor:
+    # name -> (type, default); type is 'date' or 'int'
+    params = {}
+
+    def clean(self, raw):
+        """Validated parameters, defaults applied; raises ValueError with a message for the client."""
+        cleaned = {}
+        for name, (kind, default) in self.params.items():
+            value = raw.get(name)
+            if value in (None, ''):
+                cleaned[name] = default
+            elif kind == 'date':
+                try:
+                    cleaned[name] = date.fromisoformat(str(value)[:10])
+                except ValueError:
+                    raise ValueError(f'{name} must be YYYY-MM-DD')
+            elif kind == 'int':
+                try:
+                    cleaned[name] = int(value)
+                except (TypeError, ValueError):
+                    raise ValueError(f'{name} must be an integer')
+        return cleaned
+
+    def build(self, params):
+        """(sql, params) for the cleaned parameters."""
+        raise NotImplementedError
+
+    def postprocess(self, columns, rows):
+        return columns, rows
+
+    def run(self, cursor, connection, params):
+        sql, sql_params = self.build(params)
+        execute_prepared(cursor, connection, sql, sql_params)
+        columns = [col[0] for col in cursor.description] if cursor.description else []
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        return self.postprocess(columns, rows)
+
+
+class ProductRollupExecutor(TemplateExecutor):
+    """Per-product totals over the daily_product_sales rollup (completed sales only)."""
+
+    params = {'from_date': ('date', None), 'to_date': ('date', None), 'top_n': ('int', 100)}
+    select = ''
+    order_by = ''
+
+    def clean(self, raw):
+        cleaned = super().clean(raw)
+        if not 1 <= cleaned['top_n'] <= MAX_TOP_N:
+            raise ValueError(f'top_n must be between 1 and {MAX_TOP_N}')
+        return cleaned
+
+    def build(self, params):
+        day_filter, day_params = date_range_clause('d.day', params['from_date'], params['to_date'])
+        sql = f"""
+            SELECT p.id AS product_id, p.name AS product_name, {self.select}
+            FROM daily_product_sales d
+            JOIN products p ON p.id = d.product_id
+            WHERE {day_filter}
+            GROUP BY p.id, p.name
+            ORDER BY {self.order_by}
+            LIMIT %s
+        """
+        return sql, [*day_params, params['top_n']]
+
+
+@register('abc_curve')
+class AbcCurveExecutor(ProductRollupExecutor):
+    # total_revenue is taken over every product (window runs before LIMIT) for the shares below
+    select = (
+        "SUM(d.revenue)::numeric AS revenue, SUM(d.quantity) AS sold_qty, "
+        "SUM(SUM(d.revenue)) OVER ()::numeric AS total_revenue"
+    )
+    order_by = 'revenue DESC'
+
+    def postprocess(self, columns, rows):
+        cumulative = Decimal('0')
+        for row in rows:
+            total = row.pop('total_revenue') or 0
+            revenue = row['revenue'] or 0
+            cumulative += revenue
+            row['revenue_share'] = round(revenue * 100 / total, 2) if total else 0
+            row['cumulative_share'] = round(cumulative * 100 / total, 2) if total else 0
+            row['abc_class'] = 'A' if row['cumulative_share'] <= 80 else 'B' if row['cumulative_share'] <= 95 else 'C'
+        columns = [c for c in columns if c != 'total_revenue'] + ['revenue_share', 'cumulative_share', 'abc_class']
+        return columns, rows
+
+
+@register('cmv')
+class CmvExecutor(ProductRollupExecutor):
+    select = 'SUM(d.cost)::numeric AS total_cost, SUM(d.quantity) AS sold_qty'
+    order_by = 'total_cost DESC'
+
+
+@register('contribution_margin')
+class ContributionMarginExecutor(ProductRollupExecutor):
+    select = """SUM(d.revenue)::numeric AS revenue,
+                SUM(d.cost)::numeric AS cost,
+                (SUM(d.revenue) - SUM(d.cost))::numeric AS margin,
+                CASE WHEN SUM(d.revenue) = 0 THEN 0 ELSE ((SUM(d.revenue) - SUM(d.cost)) / NULLIF(SUM(d.revenue),0) * 100) END AS margin_pct"""
+    order_by = 'margin DESC'
@@ -2,6 +2,12 @@ REPORTS = {
     'pedido': {
         'verbose': 'Pedidos de Venda',
         'table': 'sales',
+        # logical column -> physical column on the base table
+        'columns': {'data_pedido': 'created_at', 'valor_total': 'total_amount'},
+        # joinable relations, keyed by the dotted path prefix used in field paths
+        'relations': {
+            'cliente': {'table': 'customers', 'local': 'customer_id', 'remote': 'id', 'columns': {'nome': 'name'}},
+        },
         'default_columns': ['id','data_pedido','cliente.nome','valor_total'],
         'fields': {
             'id': {'label': 'Número do Pedido', 'path': 'id', 'type': 'int'},
@@ -16,7 +22,8 @@ REPORTS = {
             'valor_min': {'field': 'valor_total', 'lookup': 'gte', 'type': 'currency'}
         },
         'groupings': {
-            'cliente': {'path': 'cliente.nome', 'label': 'Por Cliente'},
+            # grouped on the customer id as well: customers sharing a name are separate rows
+            'cliente': {'path': 'cliente.nome', 'key': 'customer_id', 'label': 'Por Cliente'},
             'mes': {'path': 'data_pedido', 'label': 'Por Mês', 'transform':'date_trunc_month'}
         }
     }
@@ -25,6 +32,7 @@ REPORTS = {
     'produto': {
         'verbose': 'Produtos',
         'table': 'products',
+        'columns': {'price': 'sale_price', 'cost': 'cost_price'},
         'default_columns': ['id','sku','name','category','stock','price','cost'],
         'fields': {
             'id': {'label': 'ID do Produto', 'path': 'id', 'type': 'int'},
@@ -0,0 +1,261 @@
+"""Compiles ad-hoc report requests over metadata.REPORTS into a single parametrized SELECT.
+
+Field paths are logical ('cliente.nome'): every dotted prefix names a relation declared in the
+entity's 'relations' and is LEFT JOINed once, only when a selected column, filter, grouping or
+ordering needs it. 'columns' maps logical column names to physical ones, on the base table and on
+each relation. Identifiers come from metadata only; request values always travel as parameters.
+"""
+from collections import namedtuple
+
+from .sql import date_range_clause
+
+# grouping transforms, applied SQL-side
+TRANSFORMS = {
+    'date_trunc_month': "date_trunc('month', {})::date",
+}
+AGGREGATES = ('count', 'sum', 'avg', 'min', 'max')
+NUMERIC_TYPES = ('int', 'currency')
+COMPARISONS = {'exact': '=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+
+class CompileError(ValueError):
+    """The request references something the entity metadata does not allow."""
+
+
+# one ORDER BY entry: how it is rendered, the expression it sorts on (for keyset predicates) and
+# whether that expression can be NULL
+_SortKey = namedtuple('_SortKey', 'item expr descending nullable')
+
+
+def _keyset_clause(sort, after):
+    """Predicate selecting the rows that sort strictly after the key values `after`, as (sql, params).
+
+    Expanded to (a > x) OR (a = x AND b > y) ... so mixed directions work; NULLs follow Postgres'
+    defaults (last ascending, first descending).
+    """
+    if not isinstance(after, (list, tuple)) or len(after) != len(sort):
+        raise CompileError('continuation does not match the ordering')
+    alternatives, params = [], []
+    equal, equal_params = [], []
+    for key, value in zip(sort, after):
+        if value is None:
+            beyond, beyond_params = (f'{key.expr} IS NOT NULL' if key.descending else 'FALSE'), []
+            same, same_params = f'{key.expr} IS NULL', []
+        else:
+            beyond = f"{key.expr} {'<' if key.descending else '>'} %s"
+            if key.nullable and not key.descending:
+                beyond = f'({beyond} OR {key.expr} IS NULL)'
+            beyond_params = [value]
+            same, same_params = f'{key.expr} = %s', [value]
+        alternatives.append(' AND '.join([*equal, beyond]))
+        params.extend([*equal_params, *beyond_params])
+        equal.append(same)
+        equal_params.extend(same_params)
+    return '(' + ' OR '.join(f'({alt})' for alt in alternatives) + ')', params
+
+
+def _list_of(value, kind, name):
+    """`value` as a list whose items are all `kind`; raises CompileError for any other shape."""
+    if value is None:
+        return []
+    if not isinstance(value, (list, tuple)) or not all(isinstance(item, kind) for item in value):
+        raise CompileError(f"{name} must be a list of {'objects' if kind is dict else 'strings'}")
+    return list(value)
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class _JoinGraph:
+    def __init__(self, meta):
+        self.meta = meta
+        # relation prefix -> JOIN clause, parents before children (insertion order)
+        self.joins = {}
+
+    def column(self, path):
+        """SQL expression for a logical path, registering the joins it needs."""
+        *prefix, name = path.split('.')
+        alias = 't'
+        columns = self.meta.get('columns', {})
+        for depth in range(1, len(prefix) + 1):
+            key = '.'.join(prefix[:depth])
+            relation = self.meta.get('relations', {}).get(key)
+            if relation is None:
+                raise CompileError(f'field path {path} needs relation {key}, which is not available')
+            rel_alias = key.replace('.', '__')
+            if key not in self.joins:
+                self.joins[key] = (
+                    f"LEFT JOIN {relation['table']} {rel_alias} "
+                    f"ON {rel_alias}.{relation['remote']} = {alias}.{relation['local']}"
+                )
+            alias = rel_alias
+            columns = relation.get('columns', {})
+        return f'{alias}.{columns.get(name, name)}'
+
+    def from_clause(self, table):
+        return ' '.join([f'{table} t', *self.joins.values()])
+
+
+def _filter_clauses(meta, graph, filters):
+    fields = meta.get('fields', {})
+    clauses, params = [], []
+    for f in filters:
+        fname = f.get('filter') or f.get('field')
+        fmeta = meta.get('filters', {}).get(fname) if isinstance(fname, str) else None
+        if fmeta is None:
+            raise CompileError(f'unknown filter: {fname}')
+        target = fmeta['field']
+        expr = graph.column(fields.get(target, {}).get('path', target))
+        lookup = fmeta.get('lookup')
+        val = f.get('value')
+        if lookup == 'between':
+            if not isinstance(val, (list, tuple)) or len(val) != 2:
+                raise CompileError(f'filter {fname} expects two values (start,end)')
+            if fmeta.get('type') == 'date':
+                # whole days: [start, end + 1 day), so timestamps on the end date are included
+                try:
+                    clause, clause_params = date_range_clause(expr, val[0], val[1])
+                except ValueError:
+                    raise CompileError(f'filter {fname} expects YYYY-MM-DD dates')
+                clauses.append(clause)
+                params.extend(clause_params)
+            else:
+                clauses.append(f'{expr} BETWEEN %s AND %s')
+                params.extend([val[0], val[1]])
+        elif lookup in COMPARISONS:
+            clauses.append(f'{expr} {COMPARISONS[lookup]} %s')
+            params.append(val)
+        else:
+            raise CompileError(f'unsupported lookup {lookup} for filter {fname}')
+    return clauses, params
+
+
+def compile_report(
+    meta, columns, filters=(), group_by=(), aggregates=None, order_by=None, limit=500, stable=False, after=None
+):
+    """Build (sql, params, output column names) for an ad-hoc report on one entity.
+
+    Without `group_by` the requested `columns` are selected row by row. With `group_by` (keys of the
+    entity's 'groupings') rows are aggregated in the database: one output column per grouping plus
+    one per aggregate ({'column': ..., 'fn': 'sum'}; fn in AGGREGATES, column optional for count).
+    When no aggregates are given, count(*) and the sum of every requested currency column are used.
+    A grouping with a 'key' path is grouped on that key too, so distinct records sharing the displayed
+    value (two customers with the same name) stay apart.
+    `order_by` is a list of {'column': <output column>, 'dir': 'asc'|'desc'}.
+
+    `stable` appends a unique tiebreaker to the ordering (the base table's id, or the grouping keys)
+    and selects the full sort key after the output columns, so each row ends with its sort key
+    values. Passing the last row's values back as `after` returns the rows that follow it (keyset
+    pagination: an index range, no OFFSET re-scan, no shifting when rows change in between).
+    """
+    stable = stable or after is not None
+    columns = _list_of(columns, str, 'columns')
+    filters = _list_of(filters, dict, 'filters')
+    group_by = _list_of(group_by, str, 'group_by')
+    aggregates = _list_of(aggregates, dict, 'aggregates')
+    order_by = _list_of(order_by, dict, 'order_by')
+    fields = meta.get('fields', {})
+    graph = _JoinGraph(meta)
+
+    def field_info(key):
+        info = fields.get(key) if isinstance(key, str) else None
+        if not info:
+            raise CompileError(f'column not allowed: {key}')
+        return info
+
+    select, output, group_exprs = [], [], []
+    # output column -> expression, for sort keys
+    exprs = {}
+    # default ordering of a grouped report: each grouping, then its key
+    group_sort = []
+    if group_by:
+        for key in group_by:
+            grouping = meta.get('groupings', {}).get(key)
+            if grouping is None:
+                raise CompileError(f'unknown grouping: {key}')
+            expr = graph.column(grouping['path'])
+            transform = grouping.get('transform')
+            if transform:
+                if transform not in TRANSFORMS:
+                    raise CompileError(f'unsupported transform {transform} for grouping {key}')
+                expr = TRANSFORMS[transform].format(expr)
+            select.append(f'{expr} AS {_quote(key)}')
+            output.append(key)
+            exprs[key] = expr
+            group_exprs.append(expr)
+            group_sort.append(_SortKey(_quote(key), expr, False, True))
+            if grouping.get('key'):
+                key_expr = graph.column(grouping['key'])
+                group_exprs.append(key_expr)
+                group_sort.append(_SortKey(key_expr, key_expr, False, True))
+        if not aggregates:
+            aggregates = [{'fn': 'count'}] + [
+                {'column': key, 'fn': 'sum'} for key in columns if field_info(key).get('type') == 'currency'
+            ]
+        for agg in aggregates:
+            fn = str(agg.get('fn') or '').lower()
+            column = agg.get('column')
+            if fn not in AGGREGATES:
+                raise CompileError(f'unsupported aggregate {fn}')
+            if column is None:
+                if fn != 'count':
+                    raise CompileError(f'aggregate {fn} needs a column')
+                select.append('COUNT(*) AS "count"')
+                output.append('count')
+                exprs['count'] = 'COUNT(*)'
+                continue
+            info = field_info(column)
+            if fn in ('sum', 'avg') and info.get('type') not in NUMERIC_TYPES:
+                raise CompileError(f'aggregate {fn} needs a numeric column: {column}')
+            alias = f'{fn}_{column}'
+            expr = f'{fn.upper()}({graph.column(info["path"])})'
+            select.append(f'{expr} AS {_quote(alias)}')
+            output.append(alias)
+            exprs[alias] = expr
+    else:
+        for key in columns:
+            expr = graph.column(field_info(key)['path'])
+            select.append(f'{expr} AS {_quote(key)}')
+            output.append(key)
+            exprs[key] = expr
+
+    where, params = _filter_clauses(meta, graph, filters)
+
+    sort = []
+    for ob in order_by:
+        ob_col = ob.get('column')
+        if ob_col not in output:
+            raise CompileError(f'order_by column not in selected columns: {ob_col}')
+        descending = str(ob.get('dir', 'asc')).lower() == 'desc'
+        sort.append(_SortKey(f"{_quote(ob_col)} {'DESC' if descending else 'ASC'}", exprs[ob_col], descending, True))
+    if not sort and group_exprs:
+        sort = list(group_sort)
+    elif stable:
+        pk = f"t.{meta.get('pk', 'id')}"
+        sort += group_sort if group_exprs else [_SortKey(pk, pk, False, False)]
+
+    if stable:
+        select += [f'{key.expr} AS {_quote(f"_key{i}")}' for i, key in enumerate(sort)]
+    having, having_params = [], []
+    if after is not None:
+        clause, clause_params = _keyset_clause(sort, after)
+        if group_exprs:
+            having, having_params = [clause], clause_params
+        else:
+            where.append(clause)
+            params.extend(clause_params)
+
+    sql = f"SELECT {', '.join(select)} FROM {graph.from_clause(meta['table'])}"
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    if group_exprs:
+        sql += ' GROUP BY ' + ', '.join(group_exprs)
+    if having:
+        sql += ' HAVING ' + ' AND '.join(having)
+        params.extend(having_params)
+    if sort:
+        sql += ' ORDER BY ' + ', '.join(key.item for key in sort)
+    sql += ' LIMIT %s'
+    params.append(limit)
+    return sql, params, output
@@ -0,0 +1,59 @@
+"""SQL helpers shared by the report executors and the ad-hoc report builder."""
+import hashlib
+from datetime import date, timedelta
+
+from django.conf import settings
+
+
+def date_range_clause(column, from_date, to_date):
+    """Half-open range predicate `column >= from AND column < to + 1 day`, as (sql, params).
+
+    A missing bound leaves its comparison out (instead of `%s IS NULL OR ...`) and the column is not
+    cast, so Postgres can use an index on it for both date and timestamp columns. Raises ValueError
+    on dates that are not YYYY-MM-DD.
+    """
+    clauses, params = [], []
+    if from_date:
+        clauses.append(f"{column} >= %s")
+        params.append(date.fromisoformat(str(from_date)[:10]))
+    if to_date:
+        clauses.append(f"{column} < %s")
+        params.append(date.fromisoformat(str(to_date)[:10]) + timedelta(days=1))
+    return ' AND '.join(clauses) or 'TRUE', params
+
+
+def _numbered(sql):
+    # %s placeholders -> $1, $2, ... for PREPARE
+    parts = sql.split('%s')
+    return ''.join(part + (f'${i}' if i < len(parts) else '') for i, part in enumerate(parts, start=1))
+
+
+def _prepared_names(connection):
+    # statement names prepared on the current server connection; a reconnect starts a new set
+    raw = connection.connection
+    state = getattr(connection, '_report_prepared', None)
+    if state is None or state[0] is not raw:
+        state = (raw, set())
+        connection._report_prepared = state
+    return state[1]
+
+
+def execute_prepared(cursor, connection, sql, params):
+    """Run `sql` (with %s placeholders) as a server-side prepared statement.
+
+    The statement is PREPAREd the first time its text is seen on a connection and EXECUTEd from then
+    on, so Postgres parses and plans it once per connection. Set REPORTS_PREPARED_STATEMENTS = False
+    behind a transaction-pooling PgBouncer, where server connections are shared between clients.
+    """
+    if not getattr(settings, 'REPORTS_PREPARED_STATEMENTS', True):
+        cursor.execute(sql, params)
+        return
+    prepared = _prepared_names(connection)
+    name = 'rpt_' + hashlib.sha1(sql.encode('utf-8')).hexdigest()[:16]
+    if name not in prepared:
+        cursor.execute(f'PREPARE {name} AS {_numbered(sql)}')
+        prepared.add(name)
+    if params:
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cursor.execute(f'EXECUTE {name}')
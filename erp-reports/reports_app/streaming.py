@@ -0,0 +1,144 @@
+"""Streamed ad-hoc report results.
+
+Rows are read through a server-side (named) cursor and written out as they arrive, in a columnar
+shape: the column names once, then each row as a plain JSON array.
+
+- 'ndjson': {"columns": [...]} / one [..] line per row / {"count": n, "next": token}
+- 'json':   {"columns": [...], "rows": [[...], ...], "count": n, "next": token}, sent in chunks
+
+A query failing after the response started is reported in-band: a final {"error", "detail"} line,
+or "error"/"detail" members in place of "next".
+
+`next` is a signed continuation token (None on the last page) holding the sort key of the page's
+last row. Sending it back with the same request body returns the rows after that key (a keyset
+predicate, see query_compiler.compile_report), so exports can go past the per-request row cap.
+"""
+import hashlib
+import json
+from datetime import date, time
+from decimal import Decimal
+from uuid import UUID
+
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.http import StreamingHttpResponse
+
+STREAM_FORMATS = ('ndjson', 'json')
+STREAM_MAX_LIMIT = 50000
+# rows pulled per round trip from the named cursor / serialized per yielded chunk
+FETCH_SIZE = 2000
+
+_TOKEN_SALT = 'reports_app.streaming'
+# request keys that define a result; a token is only valid for the same values
+_SPEC_KEYS = ('entity', 'columns', 'filters', 'group_by', 'aggregates', 'order_by', 'limit')
+
+
+class ContinuationError(ValueError):
+    """The continuation token is invalid or belongs to another request."""
+
+
+def _fingerprint(body):
+    spec = json.dumps({k: body.get(k) for k in _SPEC_KEYS}, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha1(spec.encode('utf-8')).hexdigest()
+
+
+def _key_value(value):
+    # full precision (DjangoJSONEncoder drops microseconds); sent back as a parameter Postgres casts
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+def make_token(body, key):
+    """Signed token resuming `body` after the row whose sort key values are `key`."""
+    return signing.dumps({'k': [_key_value(v) for v in key], 'q': _fingerprint(body)}, salt=_TOKEN_SALT)
+
+
+def read_token(body, token):
+    """Sort key values encoded in `token`; raises ContinuationError when it does not match `body`."""
+    try:
+        data = signing.loads(token, salt=_TOKEN_SALT)
+    except signing.BadSignature:
+        raise ContinuationError('invalid continuation token')
+    if data.get('q') != _fingerprint(body) or not isinstance(data.get('k'), list):
+        raise ContinuationError('continuation token does not match this request')
+    return data['k']
+
+
+def _dumps(value):
+    return json.dumps(value, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def _pages(sql, params, limit):
+    """Yield batches of at most `limit` rows in total, then a final bool: was there a row beyond it."""
+    seen = 0
+    # named cursors need a transaction; it also scopes the statement timeout to this query
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL statement_timeout = %s", [30000])
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(sql, params)
+            while True:
+                batch = cursor.fetchmany(FETCH_SIZE)
+                if not batch:
+                    yield False
+                    return
+                keep = batch[:limit - seen]
+                seen += len(batch)
+                if keep:
+                    yield keep
+                if seen > limit:
+                    yield True
+                    return
+
+
+def stream_report(sql, params, columns, fmt, body, limit):
+    """StreamingHttpResponse for a query compiled with `stable` and LIMIT limit + 1 (the extra row flags a next page).
+
+    Each row carries its sort key after the `columns` values; only the columns are written out and the
+    key of the last row written goes into the continuation token.
+    """
+    width = len(columns)
+
+    def ndjson():
+        yield _dumps({'columns': columns}) + '\n'
+        count, last = 0, None
+        try:
+            for item in _pages(sql, params, limit):
+                if isinstance(item, bool):
+                    more = item
+                    break
+                count += len(item)
+                last = item[-1]
+                yield ''.join(_dumps(list(row[:width])) + '\n' for row in item)
+        except Exception as exc:
+            # the status line is already sent; report the failure in-band
+            yield _dumps({'error': 'query failed', 'detail': str(exc)}) + '\n'
+            return
+        yield _dumps({'count': count, 'next': make_token(body, last[width:]) if more else None}) + '\n'
+
+    def chunked_json():
+        yield '{"columns": ' + _dumps(columns) + ', "rows": ['
+        count, last = 0, None
+        try:
+            for item in _pages(sql, params, limit):
+                if isinstance(item, bool):
+                    more = item
+                    break
+                yield (',' if count else '') + ','.join(_dumps(list(row[:width])) for row in item)
+                count += len(item)
+                last = item[-1]
+        except Exception as exc:
+            # the status line is already sent; close the document with the failure instead of `next`
+            yield '], "count": ' + str(count) + ', "error": "query failed", "detail": ' + _dumps(str(exc)) + '}'
+            return
+        token = make_token(body, last[width:]) if more else None
+        yield '], "count": ' + str(count) + ', "next": ' + _dumps(token) + '}'
+
+    return StreamingHttpResponse(
+        ndjson() if fmt == 'ndjson' else chunked_json(),
+        content_type='application/x-ndjson' if fmt == 'ndjson' else 'application/json',
+    )
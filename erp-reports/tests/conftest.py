@@ -0,0 +1,15 @@
+import sys
+from pathlib import Path
+
+import django
+from django.conf import settings
+
+# Ensure erp-reports is on sys.path when pytest runs from the repository root
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent))
+
+# The compiler, executors, streaming tokens and cache only need configured settings, not a
+# project or a database
+if not settings.configured:
+    settings.configure(SECRET_KEY='test-secret', USE_TZ=True, DATABASES={})
+    django.setup()
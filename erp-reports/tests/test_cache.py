@@ -0,0 +1,75 @@
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+from django.test import override_settings
+
+from reports_app.cache import ReportCache, data_watermark, make_key
+
+
+@pytest.fixture
+def cache():
+    return ReportCache()
+
+
+def test_hit_needs_the_same_key_and_watermark(cache):
+    key = make_key('produto', 'template', 'cmv', {'top_n': 10}, 'tenant-a')
+    cache.set(key, 'w1', {'rows': [{'total_cost': Decimal('4.00')}]})
+
+    assert cache.get(key, 'w1') == {'rows': [{'total_cost': Decimal('4.00')}]}
+    assert cache.get(make_key('produto', 'template', 'cmv', {'top_n': 11}, 'tenant-a'), 'w1') is None
+
+
+def test_advanced_watermark_misses_and_drops_the_entry(cache):
+    cache.set('k', 'w1', {'rows': []})
+
+    assert cache.get('k', 'w2') is None
+    # the stale entry is gone even for a reader still on the old watermark
+    assert cache.get('k', 'w1') is None
+
+
+def test_watermark_reads_every_source_table():
+    cursor = mock.MagicMock()
+    cursor.fetchone.return_value = (41, '2026-10-17 10:00:00', None, '2026-10-16 08:00:00')
+
+    assert data_watermark(cursor) == '41|2026-10-17 10:00:00||2026-10-16 08:00:00'
+    sql = cursor.execute.call_args.args[0]
+    assert all(table in sql for table in ('FROM sales', 'FROM financial_entries', 'FROM products'))
+
+
+def test_keys_are_isolated_per_tenant():
+    parts = ('pedido', 'adhoc', ['id'], None, [], None, None, 500)
+    assert make_key(*parts, 'tenant-a') == make_key(*parts, 'tenant-a')
+    assert make_key(*parts, 'tenant-a') != make_key(*parts, 'tenant-b')
+    assert make_key(*parts, 'tenant-a') != make_key(*parts, None)
+
+
+@override_settings(REPORTS_CACHE_MAX_ENTRIES=2)
+def test_lru_evicts_the_least_recently_used_entry(cache):
+    cache.set('a', 'w', 1)
+    cache.set('b', 'w', 2)
+    assert cache.get('a', 'w') == 1  # 'b' is now the least recently used
+    cache.set('c', 'w', 3)
+
+    assert [cache.get(key, 'w') for key in ('a', 'b', 'c')] == [1, None, 3]
+
+
+@override_settings(REPORTS_CACHE_TTL=0)
+def test_zero_ttl_disables_caching(cache):
+    cache.set('k', 'w', 1)
+    assert cache.get('k', 'w') is None
+
+
+def test_shared_tier_serves_other_workers_and_promotes_to_lru(tmp_path):
+    with override_settings(REPORTS_CACHE_SQLITE_PATH=str(tmp_path / 'reports-cache.sqlite3')):
+        writer, reader = ReportCache(), ReportCache()
+        writer.set('k', 'w1', {'rows': [{'revenue': Decimal('12.50')}]})
+
+        assert reader._lru.get('k') is None
+        # JSON round trip through SQLite, as the client would receive it
+        assert reader.get('k', 'w1') == {'rows': [{'revenue': '12.50'}]}
+        assert reader._lru.get('k') is not None
+
+        # a newer watermark invalidates the shared row too
+        assert reader.get('k', 'w2') is None
+        assert ReportCache().get('k', 'w1') is None
@@ -0,0 +1,87 @@
+from datetime import date
+from unittest import mock
+
+import pytest
+from django.test import override_settings
+
+from reports_app import executors, metadata, sql
+
+
+def test_every_template_resolves_to_an_executor_accepting_its_params():
+    for entity, meta in metadata.REPORTS.items():
+        for template in meta.get('templates', []):
+            executor = executors.get_executor(template.get('executor', template['id']))
+            assert executor is not None, (entity, template['id'])
+            assert {p['name'] for p in template.get('params', [])} <= set(executor.params), template['id']
+
+
+def test_params_are_coerced_and_defaulted():
+    executor = executors.get_executor('abc_curve')
+    assert executor.clean({'from_date': '2026-10-01T08:00:00', 'top_n': '10'}) == {
+        'from_date': date(2026, 10, 1), 'to_date': None, 'top_n': 10,
+    }
+    assert executor.clean({})['top_n'] == 100
+
+
+@pytest.mark.parametrize('raw, message', [
+    ({'from_date': '01/10/2026'}, 'from_date must be YYYY-MM-DD'),
+    ({'top_n': 'dez'}, 'top_n must be an integer'),
+    ({'top_n': 0}, f'top_n must be between 1 and {executors.MAX_TOP_N}'),
+    ({'top_n': executors.MAX_TOP_N + 1}, f'top_n must be between 1 and {executors.MAX_TOP_N}'),
+])
+def test_invalid_params_are_rejected(raw, message):
+    with pytest.raises(ValueError, match=message):
+        executors.get_executor('cmv').clean(raw)
+
+
+def test_build_uses_half_open_day_range_and_limit():
+    executor = executors.get_executor('cmv')
+    query, params = executor.build(executor.clean({'from_date': '2026-10-01', 'to_date': '2026-10-31', 'top_n': 5}))
+    assert 'd.day >= %s AND d.day < %s' in query
+    assert params == [date(2026, 10, 1), date(2026, 11, 1), 5]
+
+
+class FakeConnection:
+    def __init__(self):
+        self.connection = object()
+
+
+def test_statement_is_prepared_once_per_connection():
+    cursor, connection = mock.MagicMock(), FakeConnection()
+    query = 'SELECT * FROM products WHERE id = %s AND stock < %s'
+
+    sql.execute_prepared(cursor, connection, query, [1, 5])
+    sql.execute_prepared(cursor, connection, query, [2, 6])
+    calls = [c.args for c in cursor.execute.call_args_list]
+    name = calls[0][0].split()[1]
+    assert calls == [
+        (f'PREPARE {name} AS SELECT * FROM products WHERE id = $1 AND stock < $2',),
+        (f'EXECUTE {name} (%s, %s)', [1, 5]),
+        (f'EXECUTE {name} (%s, %s)', [2, 6]),
+    ]
+
+    # a reconnect gets a new server session without the prepared statement
+    cursor.reset_mock()
+    connection.connection = object()
+    sql.execute_prepared(cursor, connection, query, [3, 7])
+    assert [c.args[0].split()[0] for c in cursor.execute.call_args_list] == ['PREPARE', 'EXECUTE']
+
+
+@override_settings(REPORTS_PREPARED_STATEMENTS=False)
+def test_prepared_statements_can_be_turned_off():
+    cursor = mock.MagicMock()
+    sql.execute_prepared(cursor, FakeConnection(), 'SELECT %s', [1])
+    cursor.execute.assert_called_once_with('SELECT %s', [1])
+
+
+def test_run_executes_prepared_and_postprocesses_rows():
+    cursor, connection = mock.MagicMock(), FakeConnection()
+    cursor.description = [('product_id',), ('product_name',), ('revenue',), ('sold_qty',), ('total_revenue',)]
+    cursor.fetchall.return_value = [(1, 'A', 80, 8, 100), (2, 'B', 20, 2, 100)]
+    executor = executors.get_executor('abc_curve')
+
+    columns, rows = executor.run(cursor, connection, executor.clean({}))
+
+    assert cursor.execute.call_args_list[0].args[0].startswith('PREPARE rpt_')
+    assert columns == ['product_id', 'product_name', 'revenue', 'sold_qty', 'revenue_share', 'cumulative_share', 'abc_class']
+    assert [(r['revenue_share'], r['cumulative_share'], r['abc_class']) for r in rows] == [(80, 80, 'A'), (20, 100, 'C')]
@@ -0,0 +1,158 @@
+from datetime import date
+
+import pytest
+
+from reports_app import metadata
+from reports_app.query_compiler import CompileError, compile_report
+
+PEDIDO = metadata.REPORTS['pedido']
+PRODUTO = metadata.REPORTS['produto']
+
+
+def test_plain_columns_map_to_physical_names_without_joins():
+    sql, params, output = compile_report(PRODUTO, ['id', 'price'], filters=[{'filter': 'stock_lt', 'value': 5}])
+    assert sql == 'SELECT t.id AS "id", t.sale_price AS "price" FROM products t WHERE t.stock < %s LIMIT %s'
+    assert params == [5, 500]
+    assert output == ['id', 'price']
+
+
+def test_dotted_path_joins_its_relation_once():
+    sql, _, _ = compile_report(PEDIDO, ['id', 'cliente.nome'], order_by=[{'column': 'cliente.nome', 'dir': 'desc'}])
+    assert sql.count('LEFT JOIN') == 1
+    assert 'FROM sales t LEFT JOIN customers cliente ON cliente.id = t.customer_id' in sql
+    assert 'cliente.name AS "cliente.nome"' in sql
+    assert sql.endswith('ORDER BY "cliente.nome" DESC LIMIT %s')
+
+    grouped, _, _ = compile_report(PEDIDO, ['cliente.nome'], group_by=['cliente'])
+    assert grouped.count('LEFT JOIN customers cliente') == 1
+
+
+def test_month_grouping_truncates_in_sql_with_default_aggregates():
+    sql, params, output = compile_report(
+        PEDIDO, ['id', 'valor_total'], filters=[{'filter': 'data_range', 'value': ['2026-10-01', '2026-10-31']}],
+        group_by=['mes'],
+    )
+    month = "date_trunc('month', t.created_at)::date"
+    assert sql == (
+        f'SELECT {month} AS "mes", COUNT(*) AS "count", SUM(t.total_amount) AS "sum_valor_total" FROM sales t '
+        f'WHERE t.created_at >= %s AND t.created_at < %s GROUP BY {month} ORDER BY "mes" LIMIT %s'
+    )
+    assert params == [date(2026, 10, 1), date(2026, 11, 1), 500]
+    assert output == ['mes', 'count', 'sum_valor_total']
+
+
+def test_explicit_aggregates_replace_the_defaults():
+    sql, _, output = compile_report(
+        PEDIDO, ['valor_total'], group_by=['mes'], aggregates=[{'fn': 'MAX', 'column': 'valor_total'}],
+    )
+    assert 'MAX(t.total_amount) AS "max_valor_total"' in sql and 'COUNT' not in sql
+    assert output == ['mes', 'max_valor_total']
+
+
+def test_stable_ordering_appends_a_unique_tiebreaker():
+    rows_sql, _, _ = compile_report(PEDIDO, ['id', 'valor_total'], order_by=[{'column': 'valor_total'}], stable=True)
+    assert rows_sql.endswith('ORDER BY "valor_total" ASC, t.id LIMIT %s')
+
+    grouped_sql, _, _ = compile_report(PEDIDO, ['valor_total'], group_by=['mes'], order_by=[{'column': 'count', 'dir': 'desc'}], stable=True)
+    assert grouped_sql.endswith('ORDER BY "count" DESC, "mes" LIMIT %s')
+
+    unstable_sql, _, _ = compile_report(PEDIDO, ['id'])
+    assert 'ORDER BY' not in unstable_sql
+
+
+def test_unused_relations_are_not_joined():
+    sql, _, _ = compile_report(PEDIDO, ['id', 'valor_total'], filters=[{'filter': 'valor_min', 'value': 10}])
+    assert 'JOIN' not in sql
+
+
+CUSTOM = {
+    'table': 'things',
+    'fields': {'name': {'path': 'name', 'type': 'string'}},
+    'filters': {'name_like': {'field': 'name', 'lookup': 'icontains'}},
+    'groupings': {'odd': {'path': 'name', 'transform': 'soundex'}},
+}
+
+
+@pytest.mark.parametrize('meta, columns, kwargs, message', [
+    (PEDIDO, ['cliente.endereco.cidade'], {}, 'needs relation cliente.endereco, which is not available'),
+    (PEDIDO, ['status'], {}, 'column not allowed: status'),
+    (PEDIDO, ['id'], {'filters': [{'filter': 'nope', 'value': 1}]}, 'unknown filter: nope'),
+    (PEDIDO, ['id'], {'filters': [{'filter': 'data_range', 'value': '2026-10-01'}]}, 'expects two values'),
+    (PEDIDO, ['id'], {'filters': [{'filter': 'data_range', 'value': ['01/10/2026', '']}]}, 'expects YYYY-MM-DD'),
+    (CUSTOM, ['name'], {'filters': [{'filter': 'name_like', 'value': 'a'}]}, 'unsupported lookup icontains'),
+    (PEDIDO, ['id'], {'group_by': ['dia']}, 'unknown grouping: dia'),
+    (CUSTOM, ['name'], {'group_by': ['odd']}, 'unsupported transform soundex'),
+    (PEDIDO, ['id'], {'group_by': ['mes'], 'aggregates': [{'fn': 'median', 'column': 'valor_total'}]}, 'unsupported aggregate median'),
+    (PEDIDO, ['id'], {'group_by': ['mes'], 'aggregates': [{'fn': 'sum'}]}, 'aggregate sum needs a column'),
+    (PEDIDO, ['id'], {'group_by': ['mes'], 'aggregates': [{'fn': 'avg', 'column': 'cliente.nome'}]}, 'needs a numeric column'),
+    (PEDIDO, ['id'], {'order_by': [{'column': 'valor_total'}]}, 'order_by column not in selected columns'),
+])
+def test_compile_errors(meta, columns, kwargs, message):
+    with pytest.raises(CompileError, match=message):
+        compile_report(meta, columns, **kwargs)
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'aggregates': ['sum']},
+    {'order_by': ['id']},
+    {'order_by': 'id'},
+    {'filters': ['status']},
+    {'group_by': [{'cliente': 1}]},
+    {'aggregates': [{'fn': ['sum'], 'column': 'valor_total'}]},
+    {'aggregates': [{'fn': 'sum', 'column': ['valor_total']}]},
+    {'filters': [{'filter': ['status'], 'value': 'completed'}]},
+])
+def test_malformed_request_shapes_are_compile_errors(kwargs):
+    request = {'columns': ['id'], 'group_by': ['mes'] if 'aggregates' in kwargs else (), **kwargs}
+    with pytest.raises(CompileError):
+        compile_report(PEDIDO, request.pop('columns'), **request)
+
+
+def test_columns_must_be_a_list_of_names():
+    with pytest.raises(CompileError, match='columns must be a list of strings'):
+        compile_report(PEDIDO, 'id')
+
+
+def test_customer_grouping_groups_on_the_customer_key():
+    sql, _, output = compile_report(PEDIDO, ['valor_total'], group_by=['cliente'])
+    assert output == ['cliente', 'count', 'sum_valor_total']
+    assert 'SELECT cliente.name AS "cliente", ' in sql
+    assert ' GROUP BY cliente.name, t.customer_id ORDER BY "cliente", t.customer_id ' in sql
+
+
+def test_stable_reports_end_rows_with_their_sort_key():
+    sql, _, output = compile_report(PEDIDO, ['id', 'valor_total'], order_by=[{'column': 'valor_total', 'dir': 'desc'}], stable=True)
+    assert output == ['id', 'valor_total']
+    assert sql.startswith('SELECT t.id AS "id", t.total_amount AS "valor_total", t.total_amount AS "_key0", t.id AS "_key1" FROM')
+
+
+def test_after_resumes_with_a_keyset_predicate_instead_of_offset():
+    sql, params, _ = compile_report(PRODUTO, ['id'], filters=[{'filter': 'stock_lt', 'value': 5}], limit=11, after=[120])
+    assert ' WHERE t.stock < %s AND ((t.id > %s)) ORDER BY t.id LIMIT %s' in sql
+    assert 'OFFSET' not in sql
+    assert params == [5, 120, 11]
+
+
+def test_keyset_predicate_follows_directions_and_nulls():
+    order = [{'column': 'valor_total', 'dir': 'desc'}]
+    sql, params, _ = compile_report(PEDIDO, ['id', 'valor_total'], order_by=order, after=['10.00', 5])
+    assert '((t.total_amount < %s) OR (t.total_amount = %s AND t.id > %s))' in sql
+    assert params == ['10.00', '10.00', 5, 500]
+
+    # ascending NULLs sort last: after a non-null name come larger names and the NULL group
+    sql, params, _ = compile_report(PEDIDO, ['valor_total'], group_by=['cliente'], after=['Ana', 3])
+    assert (
+        ' GROUP BY cliente.name, t.customer_id HAVING (((cliente.name > %s OR cliente.name IS NULL)) '
+        'OR (cliente.name = %s AND (t.customer_id > %s OR t.customer_id IS NULL))) ORDER BY "cliente", t.customer_id '
+    ) in sql
+    assert params == ['Ana', 'Ana', 3, 500]
+
+    # after the NULL customer group only a later NULL key could follow
+    sql, params, _ = compile_report(PEDIDO, ['valor_total'], group_by=['cliente'], after=[None, None])
+    assert 'HAVING ((FALSE) OR (cliente.name IS NULL AND FALSE))' in sql
+    assert params == [500]
+
+
+def test_after_must_match_the_sort_key():
+    with pytest.raises(CompileError, match='continuation does not match the ordering'):
+        compile_report(PEDIDO, ['id'], after=[1, 2])
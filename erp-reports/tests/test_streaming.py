@@ -0,0 +1,68 @@
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from reports_app import streaming
+
+
+def body_of(response):
+    return b''.join(response.streaming_content).decode('utf-8')
+
+
+@pytest.fixture
+def failing_pages(monkeypatch):
+    def pages(sql, params, limit):
+        yield [(1, 'a'), (2, 'b')]
+        raise RuntimeError('canceling statement due to statement timeout')
+
+    monkeypatch.setattr(streaming, '_pages', pages)
+
+
+def test_json_stream_reports_a_failure_in_a_parseable_document(failing_pages):
+    response = streaming.stream_report('SELECT', [], ['id', 'name'], 'json', {'entity': 'pedido'}, 10)
+
+    document = json.loads(body_of(response))
+
+    assert document['rows'] == [[1, 'a'], [2, 'b']]
+    assert document['count'] == 2
+    assert document['error'] == 'query failed'
+    assert 'statement timeout' in document['detail']
+    assert 'next' not in document
+
+
+def test_ndjson_stream_reports_a_failure_on_its_last_line(failing_pages):
+    response = streaming.stream_report('SELECT', [], ['id', 'name'], 'ndjson', {'entity': 'pedido'}, 10)
+
+    lines = [json.loads(line) for line in body_of(response).splitlines()]
+
+    assert lines[:3] == [{'columns': ['id', 'name']}, [1, 'a'], [2, 'b']]
+    assert lines[-1]['error'] == 'query failed'
+
+
+def test_pages_write_the_columns_and_sign_the_last_sort_key(monkeypatch):
+    def pages(sql, params, limit):
+        # rows end with their sort key (valor_total, t.id); one row beyond the page flags `next`
+        yield [(7, Decimal('10.50'), Decimal('10.50'), 7), (9, Decimal('12.00'), Decimal('12.00'), 9)]
+        yield True
+
+    monkeypatch.setattr(streaming, '_pages', pages)
+    body = {'entity': 'pedido', 'columns': ['id', 'valor_total'], 'stream': 'json'}
+
+    document = json.loads(body_of(streaming.stream_report('SELECT', [], ['id', 'valor_total'], 'json', body, 2)))
+
+    assert document['rows'] == [[7, '10.50'], [9, '12.00']]
+    assert streaming.read_token(body, document['next']) == ['12.00', 9]
+
+
+def test_token_keeps_timestamps_exact_and_belongs_to_its_request():
+    body = {'entity': 'pedido', 'columns': ['data_pedido']}
+    created = datetime(2026, 10, 17, 9, 30, 0, 123456, tzinfo=timezone.utc)
+    token = streaming.make_token(body, [created, 42])
+
+    assert streaming.read_token(body, token) == ['2026-10-17T09:30:00.123456+00:00', 42]
+    with pytest.raises(streaming.ContinuationError, match='does not match'):
+        streaming.read_token({**body, 'limit': 10}, token)
+    with pytest.raises(streaming.ContinuationError, match='invalid'):
+        streaming.read_token(body, token + 'x')